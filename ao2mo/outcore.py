@@ -266,48 +266,63 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
 
     time_1pass = log.timer('AO->MO eri transformation 1 pass', *time_0pass)
 
-    e2buflen = min(int(max_memory*1e6/8)//nao_pair,
+# Two load buffers and two output buffers are held by the pipeline: the next
+# block is read from fswap and the previous block is written to feri in
+# background threads while the current block is transformed.
+    e2buflen = min(int(max_memory*1e6/8)//(2*(nao_pair+nkl_pair)),
                    int(ioblk_size*1e6/8)//nkl_pair, nij_pair)
+    e2buflen = max(e2buflen, 1)
     log.debug('step2: kl-pair (ao %d, mo %d), mem cache %.8g MB, ioblock %.8g MB', \
               nao_pair, nkl_pair,
-              e2buflen*nao_pair*8/1e6, e2buflen*nkl_pair*8/1e6)
+              2*e2buflen*nao_pair*8/1e6, e2buflen*nkl_pair*8/1e6)
 
     fswap = h5py.File(swapfile.name, 'r')
     klaoblks = len(fswap['0'])
-    ijmoblks = int(numpy.ceil(float(nij_pair)/e2buflen)) * comp
-    ti0 = time_1pass
-    buf = numpy.empty((e2buflen, nao_pair))
-    istep = 0
-    for row0, row1 in prange(0, nij_pair, e2buflen):
-        nrow = row1 - row0
+    tasks = [(icomp, row0, row1)
+             for row0, row1 in prange(0, nij_pair, e2buflen)
+             for icomp in range(comp)]
+    ijmoblks = len(tasks)
+    def load(icomp, row0, row1, buf):
+        col0 = 0
+        for ic in range(klaoblks):
+            dat = fswap['%d/%d'%(icomp,ic)]
+            col1 = col0 + dat.shape[1]
+            buf[:row1-row0,col0:col1] = dat[row0:row1]
+            col0 = col1
+        return buf[:row1-row0]
+    def save(icomp, row0, row1, pbuf):
+        if comp == 1:
+            h5d_eri[row0:row1] = pbuf
+        else:
+            h5d_eri[icomp,row0:row1] = pbuf
 
-        for icomp in range(comp):
-            istep += 1
-            tioi = 0
-            log.debug('step 2 [%d/%d], [%d,%d:%d], row = %d', \
-                      istep, ijmoblks, icomp, row0, row1, nrow)
-
-            col0 = 0
-            for ic in range(klaoblks):
-                dat = fswap['%d/%d'%(icomp,ic)]
-                col1 = col0 + dat.shape[1]
-                buf[:nrow,col0:col1] = dat[row0:row1]
-                col0 = col1
-            ti2 = log.timer('step 2 [%d/%d], load buf'%(istep,ijmoblks), *ti0)
-            tioi += ti2[1]-ti0[1]
-            pbuf = _ao2mo.nr_e2_(buf[:nrow], mokl, klshape, aosym, klmosym)
-
-            tw1 = time.time()
-            if comp == 1:
-                h5d_eri[row0:row1] = pbuf
-            else:
-                h5d_eri[icomp,row0:row1] = pbuf
-            tioi += time.time()-tw1
-
-            ti1 = (time.clock(), time.time())
-            log.debug('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f, I/O time: %9.2f', \
-                      istep, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1], tioi)
-            ti0 = ti1
+    ti0 = time_1pass
+    bufs = (numpy.empty((e2buflen, nao_pair)), numpy.empty((e2buflen, nao_pair)))
+    prefetch = pyscf.lib.background_call(load, *(tasks[0]+(bufs[0],)))
+    writer = None
+    for istep, task in enumerate(tasks):
+        icomp, row0, row1 = task
+        log.debug('step 2 [%d/%d], [%d,%d:%d], row = %d', \
+                  istep+1, ijmoblks, icomp, row0, row1, row1-row0)
+        tw0 = time.time()
+        buf = prefetch.get()
+        tioi = time.time() - tw0
+        if istep+1 < ijmoblks:
+            prefetch = pyscf.lib.background_call(load, *(tasks[istep+1] +
+                                                         (bufs[(istep+1)%2],)))
+        pbuf = _ao2mo.nr_e2_(buf, mokl, klshape, aosym, klmosym)
+
+        tw0 = time.time()
+        if writer is not None:
+            writer.get()
+        tioi += time.time() - tw0
+        writer = pyscf.lib.background_call(save, icomp, row0, row1, pbuf)
+
+        ti1 = (time.clock(), time.time())
+        log.debug('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f, I/O wait: %9.2f', \
+                  istep+1, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1], tioi)
+        ti0 = ti1
+    writer.get()
     feri.close()
     fswap.close()
 
@@ -402,8 +417,10 @@ def half_e1(mol, mo_coeffs, swapfile,
                            order='F', copy=False)
         ijshape = (0, nmoi, nmoi, nmoj)
 
+# Half of the memory for the block being computed, the other half for the block
+# being written to swapfile in the background
     e1buflen, e2buflen = \
-            info_swap_block(max_memory, ioblk_size, nij_pair, nao_pair, comp)
+            info_swap_block(max_memory*.5, ioblk_size, nij_pair, nao_pair, comp)
     shranges = info_shell_ranges(mol, e1buflen, aosym)
     e1buflen = max([x[2] for x in shranges])
     if ao2mopt is None:
@@ -423,8 +440,16 @@ def half_e1(mol, mo_coeffs, swapfile,
     for icomp in range(comp):
         fswap.create_group(str(icomp)) # for h5py old version
 
+    def save(istep, buf):
+        for icomp in range(comp):
+            dset = fswap.create_dataset('%d/%d'%(icomp,istep),
+                                        (nij_pair,buf.shape[1]), 'f8')
+            for col0, col1 in prange(0, nij_pair, e2buflen):
+                dset[col0:col1] = pyscf.lib.transpose(buf[icomp,:,col0:col1])
+
     # transform e1
     ti0 = log.timer('Initializing ao2mo.outcore.half_e1', *time0)
+    writer = None
     for istep,sh_range in enumerate(shranges):
         log.debug('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
                   istep+1, len(shranges), *sh_range)
@@ -433,14 +458,16 @@ def half_e1(mol, mo_coeffs, swapfile,
                             aosym, ijmosym, comp, ao2mopt)
         ti2 = log.timer('gen AO/transform MO [%d/%d]'%(istep+1,len(shranges)),
                         *ti0)
-        for icomp in range(comp):
-            dset = fswap.create_dataset('%d/%d'%(icomp,istep),
-                                        (nij_pair,buf.shape[1]), 'f8')
-            for col0, col1 in prange(0, nij_pair, e2buflen):
-                dset[col0:col1] = pyscf.lib.transpose(buf[icomp,:,col0:col1])
-        ti0 = log.timer('transposing to disk', *ti2)
+        # the previous block must be on disk before buf is handed to the writer
+        if writer is not None:
+            writer.get()
+        writer = pyscf.lib.background_call(save, istep, buf)
+        ti0 = log.timer('waiting for transposing to disk', *ti2)
         # release the memory of buf before allocating temporary data
         buf = None
+    if writer is not None:
+        writer.get()
+    fswap.close()
     return swapfile
 
 def full_iofree(mol, mo_coeff, intor='cint2e_sph', aosym='s4', comp=1,
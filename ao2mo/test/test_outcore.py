@@ -116,6 +116,16 @@ class KnowValues(unittest.TestCase):
         eri1 = eri1.reshape(nao,nao,nao,nao)
         self.assertTrue(numpy.allclose(eri1, eriref))
 
+    def test_nroutcore_small_blocks(self):
+        # many blocks go through the prefetching and writing threads
+        ftmp = tempfile.NamedTemporaryFile()
+        eri_ao = scf._vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+        eriref = ao2mo.incore.full(eri_ao, mo)
+        ao2mo.outcore.full(mol, mo, ftmp.name, max_memory=1, ioblk_size=.05)
+        feri = h5py.File(ftmp.name)
+        self.assertTrue(numpy.allclose(numpy.array(feri['eri_mo']), eriref))
+        feri.close()
+
 def s2ij_s1(symmetry, eri, norb):
     idx = numpy.tril_indices(norb)
     eri1 = numpy.empty((norb,norb,norb,norb))
@@ -1,5 +1,6 @@
 from pyscf.df import incore
 from pyscf.df import outcore
+from pyscf.df import cholesky
 from pyscf.df.incore import format_aux_basis
 from pyscf.df.addons import load_buf
 
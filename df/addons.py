@@ -14,7 +14,9 @@ from pyscf.scf import _vhf
 from pyscf.df import incore
 
 def load_buf(cderi_or_h5file, start_id, count=160, dataname='eri_mo'):
-    if isinstance(cderi_or_h5file, str):
+    if isinstance(cderi_or_h5file, load):
+        return cderi_or_h5file.load_buf(start_id, count)
+    elif isinstance(cderi_or_h5file, str):
         return _load_file(cderi_or_h5file, start_id, count, dataname)
     elif isinstance(cderi_or_h5file, numpy.ndarray):
         return _load_array(cderi_or_h5file, start_id, count)
@@ -64,3 +66,118 @@ def _load_array(cderi, start_id, count=160):
         end = min(nrow, start_id+count)
         return cderi[:,start_id:end]
 
+
+
+class load(object):
+    '''Persistent handle of the Cholesky decomposed 3-index integrals.
+
+    The HDF5 file is opened once and the column blocks (``eri_mo/0``,
+    ``eri_mo/1``, ...) are indexed at construction, so that the row blocks
+    can be read repeatedly (every SCF cycle, MP2, ...) without reopening the
+    file.  The numpy array of the incore integrals is wrapped by the same
+    interface.
+
+    Args:
+        cderi : str or ndarray
+            The filename of the integral file or the incore integral array.
+
+    Kwargs:
+        dataname : str
+            The dataset name in the HDF5 file.
+
+    Examples:
+
+    >>> feri = load(cderi_file)
+    >>> for b0, b1, eri1 in feri.loop(160):
+    ...     print(eri1.shape)
+    >>> feri.close()
+    '''
+    def __init__(self, cderi, dataname='eri_mo'):
+        self.cderi = cderi
+        self.dataname = dataname
+        self.feri = None
+        if isinstance(cderi, numpy.ndarray):
+            self.comp = None
+            if cderi.ndim == 2:
+                self.nrow, self.ncol = cderi.shape
+            else:
+                self.comp, self.nrow, self.ncol = cderi.shape
+            self.dtype = cderi.dtype
+            return
+
+        self.feri = h5py.File(cderi, 'r')
+        if ('%s/0/0'%dataname) in self.feri:
+            self.comp = len(self.feri[dataname])
+            nset = len(self.feri['%s/0'%dataname])
+            self._dats = [[self.feri['%s/%d/%d'%(dataname,icomp,i)]
+                           for i in range(nset)]
+                          for icomp in range(self.comp)]
+            dats = self._dats[0]
+        else:
+            self.comp = None
+            nset = len(self.feri[dataname])
+            dats = [self.feri['%s/%d'%(dataname,i)] for i in range(nset)]
+            self._dats = [dats]
+        self._col_loc = numpy.cumsum([0]+[dat.shape[-1] for dat in dats])
+        self.nrow = dats[0].shape[-2]
+        self.ncol = self._col_loc[-1]
+        self.dtype = dats[0].dtype
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self.feri is not None:
+            self.feri.close()
+            self.feri = None
+
+    def load_buf(self, start_id, count=160, out=None):
+        '''Read the rows [start_id:start_id+count] of the integrals'''
+        if self.feri is None:
+            return _load_array(self.cderi, start_id, count)
+
+        end = min(self.nrow, start_id+count)
+        nrow = end - start_id
+        if self.comp is None:
+            shape = (nrow,self.ncol)
+        else:
+            shape = (self.comp,nrow,self.ncol)
+        if out is None:
+            buf = numpy.empty(shape, dtype=self.dtype)
+        else:
+            buf = numpy.ndarray(shape, dtype=self.dtype, buffer=out)
+        col_loc = self._col_loc
+        for icomp, dats in enumerate(self._dats):
+            if self.comp is None:
+                bufc = buf
+            else:
+                bufc = buf[icomp]
+            if len(dats) == 1:
+                dats[0].read_direct(bufc, numpy.s_[start_id:end])
+            else:
+                for i, dat in enumerate(dats):
+                    bufc[:,col_loc[i]:col_loc[i+1]] = dat[start_id:end]
+        return buf
+
+    def loop(self, blksize=160):
+        '''Iterate over the row blocks.  The next block is read from disk in
+        a background thread while the current one is being used.'''
+        if self.feri is None:
+            for b0 in range(0, self.nrow, blksize):
+                b1 = min(b0+blksize, self.nrow)
+                yield b0, b1, _load_array(self.cderi, b0, blksize)
+            return
+
+        b1 = min(blksize, self.nrow)
+        buf = self.load_buf(0, blksize)
+        for b0 in range(0, self.nrow, blksize):
+            if b1 < self.nrow:
+                handler = pyscf.lib.background_call(self.load_buf, b1, blksize)
+            else:
+                handler = None
+            yield b0, b1, buf
+            if handler is not None:
+                buf = handler.get()
+                b1 = min(b1+blksize, self.nrow)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+#
+# Pivoted Cholesky decomposition of the ERI matrix
+#       (ij|kl) = sum_L (L|ij) (L|kl)
+# as a replacement of the auxiliary basis of density fitting.  The rows of
+# the ERI matrix are computed on the fly for the shell pair of the pivot,
+# and all the pivots of the shell pair are decomposed with the same rows.
+# The decomposition stops when the largest remaining diagonal is below the
+# threshold, which bounds the error of every (ij|ij).
+#
+
+import time
+import ctypes
+import numpy
+from pyscf.lib import logger
+from pyscf.df import incore
+
+libri = incore.libri
+
+# The span factor of the pivots of one shell pair: the pivots of the shell
+# pair are decomposed until their diagonals are smaller than SPAN times the
+# largest remaining diagonal.
+SPAN = 1e-2
+
+def eri_diag(mol):
+    '''Diagonal (ij|ij) of the ERI matrix, in the packed order of ij (i>=j)'''
+    nao = mol.nao_nr()
+    c_atm = numpy.array(mol._atm, dtype=numpy.int32)
+    c_bas = numpy.array(mol._bas, dtype=numpy.int32)
+    c_env = numpy.array(mol._env)
+    diag = numpy.empty(nao*(nao+1)//2)
+    libri.RInr_eri_diag(diag.ctypes.data_as(ctypes.c_void_p),
+                        c_atm.ctypes.data_as(ctypes.c_void_p),
+                        ctypes.c_int(mol.natm),
+                        c_bas.ctypes.data_as(ctypes.c_void_p),
+                        ctypes.c_int(mol.nbas),
+                        c_env.ctypes.data_as(ctypes.c_void_p))
+    return diag
+
+def eri_rows(mol, ksh, lsh):
+    '''The rows (kl|ij) of the AO pairs kl of shell pair (ksh,lsh), kl = l*dk+k.
+    The columns are in the packed order of ij (i>=j).'''
+    nao = mol.nao_nr()
+    dk = (mol.bas_angular(ksh)*2+1) * mol.bas_nctr(ksh)
+    dl = (mol.bas_angular(lsh)*2+1) * mol.bas_nctr(lsh)
+    c_atm = numpy.array(mol._atm, dtype=numpy.int32)
+    c_bas = numpy.array(mol._bas, dtype=numpy.int32)
+    c_env = numpy.array(mol._env)
+    eri = numpy.empty((dk*dl,nao*(nao+1)//2))
+    libri.RInr_eri_shellpair_rows(eri.ctypes.data_as(ctypes.c_void_p),
+                                  ctypes.c_int(ksh), ctypes.c_int(lsh),
+                                  c_atm.ctypes.data_as(ctypes.c_void_p),
+                                  ctypes.c_int(mol.natm),
+                                  c_bas.ctypes.data_as(ctypes.c_void_p),
+                                  ctypes.c_int(mol.nbas),
+                                  c_env.ctypes.data_as(ctypes.c_void_p))
+    return eri
+
+def cholesky_eri(mol, tol=1e-6, verbose=0, max_memory=None):
+    '''Pivoted Cholesky vectors of the ERI matrix
+
+    Kwargs:
+        tol : float
+            The decomposition stops when the largest residual diagonal
+            (ij|ij) is smaller than tol.  A smaller tol gives more vectors.
+        max_memory : float or None
+            Memory (in MB) available for the Cholesky vectors.  The vectors
+            are kept in memory; a warning is issued when they outgrow
+            max_memory.
+
+    Returns:
+        2D array of (naux,nao*(nao+1)/2) in C-contiguous, the same layout as
+        :func:`df.incore.cholesky_eri`
+    '''
+    t0 = (time.clock(), time.time())
+    if isinstance(verbose, logger.Logger):
+        log = verbose
+    else:
+        log = logger.Logger(mol.stdout, verbose)
+
+    nao = mol.nao_nr()
+    ao_loc = numpy.asarray(mol.ao_loc_nr())
+    ao2shl = numpy.repeat(numpy.arange(mol.nbas), ao_loc[1:]-ao_loc[:-1])
+    idxi, idxj = numpy.tril_indices(nao)
+
+    def fetch_rows(p):
+        ksh = ao2shl[idxi[p]]
+        lsh = ao2shl[idxj[p]]
+        k0, k1 = ao_loc[ksh], ao_loc[ksh+1]
+        l0, l1 = ao_loc[lsh], ao_loc[lsh+1]
+        kk = numpy.tile(numpy.arange(k0, k1), l1-l0)
+        ll = numpy.repeat(numpy.arange(l0, l1), k1-k0)
+        mask = kk >= ll
+        kl = kk[mask]*(kk[mask]+1)//2 + ll[mask]
+        return kl, eri_rows(mol, ksh, lsh)[mask]
+
+    diag = eri_diag(mol)
+    log.timer('ERI diagonal', *t0)
+    cderi = _pivoted_cholesky(diag, fetch_rows, tol, nao*2, max_memory, log)
+    log.debug('num. Cholesky vectors = %d, tol = %g', cderi.shape[0], tol)
+    log.timer('pivoted cholesky_eri', *t0)
+    return cderi
+
+def _pivoted_cholesky(diag, fetch_rows, tol, blksize, max_memory=None,
+                      log=None):
+    '''fetch_rows(p) returns the indices and the rows of the matrix of the
+    pivot block which contains the pivot p'''
+    diag = diag.copy()
+    warned = False
+    cderi = numpy.empty((blksize,diag.size))
+    nvec = 0
+    dmax = diag.max()
+    while dmax > tol:
+        kl, rows = fetch_rows(numpy.argmax(diag))
+        if nvec > 0:
+            rows -= numpy.dot(cderi[:nvec,kl].T, cderi[:nvec])
+        dmin = max(tol, dmax*SPAN)
+        while True:
+            q = numpy.argmax(diag[kl])
+            if diag[kl[q]] <= dmin:
+                break
+            if nvec == cderi.shape[0]:
+                mem = (nvec+blksize) * diag.size * 8e-6
+                if (not warned and max_memory is not None and log is not None
+                    and mem > max_memory):
+                    log.warn('Cholesky vectors (%d MB, %d vectors) exceed '
+                             'max_memory %d MB.  Increase cholesky_tol or '
+                             'use an auxiliary basis', mem, nvec, max_memory)
+                    warned = True
+                cderi = numpy.vstack((cderi, numpy.empty((blksize,diag.size))))
+            v = cderi[nvec] = rows[q] / numpy.sqrt(diag[kl[q]])
+            nvec += 1
+            rows -= numpy.einsum('i,j->ij', v[kl], v)
+            diag -= v**2
+            diag[kl[q]] = 0
+        dmax = diag.max()
+    return numpy.ascontiguousarray(cderi[:nvec])
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    from pyscf import ao2mo
+    from pyscf.scf import _vhf
+    mol = gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+                basis='ccpvdz')
+    cderi = cholesky_eri(mol, 1e-8)
+    eri0 = _vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+    eri0 = ao2mo.restore(4, eri0, mol.nao_nr())
+    print(cderi.shape, abs(numpy.dot(cderi.T, cderi) - eri0).max())
@@ -3,7 +3,11 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import os
 import time
+import json
+import hashlib
+import tempfile
 import ctypes
 import _ctypes
 import numpy
@@ -17,11 +21,115 @@ libri = pyscf.lib.load_library('libri')
 def _fpointer(name):
     return ctypes.c_void_p(_ctypes.dlsym(libri._handle, name))
 
+# Schwarz screening threshold of the 3-center Coulomb integrals (ij|L)
+SCREEN_CUTOFF = 1e-14
+def _screen_cutoff(intor):
+    '''The Schwarz inequality only bounds the Coulomb integrals'''
+    if intor == 'cint3c2e_sph':
+        return ctypes.c_double(SCREEN_CUTOFF)
+    else:
+        return ctypes.c_double(0)
+
+# Even-tempered auxiliary basis.  The exponents of the fitting functions of
+# angular momentum L span the products of the orbital primitives l1+l2 = L,
+# i.e. from emin(l1)+emin(l2) to emax(l1)+emax(l2) with the ratio ETB_BETA.
+# The generated basis is cached in ETB_CACHE_DIR, one file per element and
+# orbital basis.
+ETB_BETA = 2.0
+ETB_CACHE_DIR = os.environ.get('PYSCF_ETB_CACHE',
+                               os.path.join(os.path.expanduser('~'),
+                                            '.pyscf', 'etb_auxbasis'))
+
+def etb_auxbasis(basis, beta=ETB_BETA):
+    '''The even-tempered fitting shells of the orbital basis of one element
+
+    Args:
+        basis : list
+            The orbital basis of an element in the internal format
+
+    Returns:
+        A list of (l, n, alpha, beta) which can be passed to
+        :func:`gto.expand_etbs`
+    '''
+    emin = {}
+    emax = {}
+    for b in basis:
+        l = b[0]
+        if isinstance(b[1], int):  # kappa
+            es = [p[0] for p in b[2:]]
+        else:
+            es = [p[0] for p in b[1:]]
+        emin[l] = min(emin.get(l, es[0]), min(es))
+        emax[l] = max(emax.get(l, es[0]), max(es))
+
+    etbs = []
+    for l in range(max(emin)*2+1):
+        pairs = [(l1, l-l1) for l1 in emin if l-l1 in emin]
+        if pairs:
+            a0 = min([emin[l1]+emin[l2] for l1, l2 in pairs])
+            a1 = max([emax[l1]+emax[l2] for l1, l2 in pairs])
+            n = int(numpy.ceil(numpy.log(a1/a0)/numpy.log(beta))) + 1
+            etbs.append((l, n, a0, beta))
+    return etbs
+
+def load_etb_auxbasis(symb, basis, beta=ETB_BETA):
+    '''Even-tempered auxiliary basis of the element symb in the internal
+    format.  The basis is read from the cache if it was generated before.'''
+    key = json.dumps([symb, basis, beta])
+    fname = os.path.join(ETB_CACHE_DIR, '%s-%s.json' %
+                         (symb, hashlib.md5(key.encode()).hexdigest()))
+    etbs = None
+    if os.path.isfile(fname):
+        try:
+            with open(fname, 'r') as f:
+                etbs = json.load(f)
+        except (IOError, ValueError):
+            etbs = None
+    if etbs is None:
+        etbs = etb_auxbasis(basis, beta)
+        try:
+            if not os.path.isdir(ETB_CACHE_DIR):
+                os.makedirs(ETB_CACHE_DIR)
+            fd, ftmp = tempfile.mkstemp(dir=ETB_CACHE_DIR)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(etbs, f)
+            os.rename(ftmp, fname)
+        except (IOError, OSError):
+            pass
+    return pyscf.gto.expand_etbs(etbs)
+
+def _auxbasis_tab(mol, auxbasis):
+    '''Expand the "auto" auxbasis.  The elements which are not found in the
+    named fitting basis fall back to the even-tempered basis.'''
+    if isinstance(auxbasis, str):
+        auxbasis = dict([(symb, auxbasis) for symb in mol._basis])
+    else:
+        auxbasis = dict(auxbasis)
+    for symb, bas in auxbasis.items():
+        if not isinstance(bas, str) or symb not in mol._basis:
+            continue
+        rawsymb = pyscf.gto.mole._rm_digit(symb)
+        stdsymb = pyscf.lib.parameters.ELEMENTS[
+                pyscf.gto.mole._ELEMENTDIC[rawsymb.upper()]][0]
+        if bas.lower() != 'auto':
+            # empty if the element is not in the basis file
+            b = pyscf.gto.basis.load(bas, stdsymb)
+            if b:
+                auxbasis[symb] = b
+                continue
+            logger.warn(mol, 'aux basis %s not found for %s, '
+                        'even-tempered basis is generated', bas, symb)
+        auxbasis[symb] = load_etb_auxbasis(stdsymb, mol._basis[symb])
+    return auxbasis
+
 def format_aux_basis(mol, auxbasis='weigend'):
+    '''The auxiliary Mole object.  auxbasis can be a basis name, a dict
+    as :attr:`Mole.basis`, or "auto" to generate the even-tempered basis
+    from the orbital basis of each element.'''
     pmol = pyscf.gto.Mole()
     pmol.verbose = 0
     pmol.atom = mol.atom
-    pmol.basis = auxbasis
+    pmol.basis = _auxbasis_tab(mol, auxbasis)
     pmol.spin = mol.spin
     pmol.charge = mol.charge
     pmol.build(False, False)
@@ -60,7 +168,8 @@ def aux_e2(mol, auxmol, intor='cint3c2e_sph', aosym='s1', comp=1, hermi=0):
                               ctypes.c_int(1), cintopt,
                               c_atm.ctypes.data_as(ctypes.c_void_p), natm,
                               c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-                              c_env.ctypes.data_as(ctypes.c_void_p))
+                              c_env.ctypes.data_as(ctypes.c_void_p),
+                              _screen_cutoff(intor))
     libri.CINTdel_optimizer(ctypes.byref(cintopt))
     return eri
 
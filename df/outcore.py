@@ -88,7 +88,8 @@ def cholesky_eri(mol, erifile, auxbasis='weigend', dataname='eri_mo', tmpdir=Non
                                   ctypes.c_int(comp), cintopt,
                                   c_atm.ctypes.data_as(ctypes.c_void_p), natm,
                                   c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-                                  c_env.ctypes.data_as(ctypes.c_void_p))
+                                  c_env.ctypes.data_as(ctypes.c_void_p),
+                                  incore._screen_cutoff(int3c))
         for icomp in range(comp):
             if comp == 1:
                 label = '%s/%d'%(dataname,istep)
@@ -285,7 +286,8 @@ def half_e1(mol, mo_coeffs, swapfile, auxbasis='weigend',
                                   ctypes.c_int(comp), cintopt,
                                   c_atm.ctypes.data_as(ctypes.c_void_p), natm,
                                   c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-                                  c_env.ctypes.data_as(ctypes.c_void_p))
+                                  c_env.ctypes.data_as(ctypes.c_void_p),
+                                  incore._screen_cutoff(int3c))
         for icomp in range(comp):
             buf1 = pyscf.lib.transpose(buf[icomp])
             buf1 = _ao2mo.nr_e2_(buf1, moij, ijshape, aosym_for_nr_e2, ijmosym)
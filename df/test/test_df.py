@@ -2,6 +2,8 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import os
+import shutil
 import unittest
 import ctypes
 import tempfile
@@ -115,6 +117,54 @@ class KnowValues(unittest.TestCase):
         feri.close()
         self.assertTrue(numpy.allclose(cderi1.T, cderi0.reshape(naux,-1)))
 
+    def test_load(self):
+        ftmp = tempfile.NamedTemporaryFile()
+        cderi0 = df.incore.cholesky_eri(mol)
+        df.outcore.cholesky_eri(mol, ftmp.name, ioblk_size=.05)
+        with df.addons.load(ftmp.name) as feri:
+            self.assertEqual(feri.nrow, cderi0.shape[0])
+            self.assertTrue(numpy.allclose(feri.load_buf(10, 30), cderi0[10:40]))
+            self.assertTrue(numpy.allclose(df.load_buf(feri, 0, 1000), cderi0))
+            cderi1 = numpy.vstack([eri1 for b0, b1, eri1 in feri.loop(7)])
+            self.assertTrue(numpy.allclose(cderi1, cderi0))
+
+        feri = df.addons.load(cderi0)
+        cderi1 = numpy.vstack([eri1 for b0, b1, eri1 in feri.loop(7)])
+        self.assertTrue(numpy.allclose(cderi1, cderi0))
+
+    def test_pivoted_cholesky(self):
+        nao = mol.nao_nr()
+        eri0 = ao2mo.restore(4, scf._vhf.int2e_sph(mol._atm, mol._bas, mol._env), nao)
+        cderi = df.cholesky.cholesky_eri(mol, 1e-8)
+        self.assertTrue(abs(numpy.dot(cderi.T, cderi) - eri0).max() < 1e-8)
+        self.assertTrue(cderi.shape[0] < nao*(nao+1)//2)
+        self.assertTrue(numpy.allclose(df.cholesky.eri_diag(mol), eri0.diagonal()))
+
+        mf = scf.density_fit(scf.RHF(mol), auxbasis=None)
+        mf.cholesky_tol = 1e-8
+        self.assertAlmostEqual(mf.scf(), scf.RHF(mol).scf(), 7)
+
+    def test_auto_auxbasis(self):
+        cache_dir = df.incore.ETB_CACHE_DIR
+        df.incore.ETB_CACHE_DIR = tempfile.mkdtemp()
+        try:
+            auxmol = df.incore.format_aux_basis(mol, 'auto')
+            self.assertEqual(len(os.listdir(df.incore.ETB_CACHE_DIR)), 2)
+            auxmol1 = df.incore.format_aux_basis(mol, 'auto')
+            self.assertEqual(auxmol1._basis, auxmol._basis)
+            self.assertEqual(auxmol._basis['O'][0][0], 0)
+
+            pmol = df.incore.format_aux_basis(mol, {'O': 'weigend', 'H': 'auto'})
+            self.assertEqual(pmol._basis['H'], auxmol._basis['H'])
+            self.assertEqual(pmol._basis['O'], df.incore.format_aux_basis(mol)._basis['O'])
+            self.assertRaises(KeyError, df.incore.format_aux_basis, mol, 'weigned')
+
+            mf = scf.density_fit(scf.RHF(mol), auxbasis='auto')
+            self.assertAlmostEqual(mf.scf(), scf.RHF(mol).scf(), 5)
+        finally:
+            shutil.rmtree(df.incore.ETB_CACHE_DIR)
+            df.incore.ETB_CACHE_DIR = cache_dir
+
     def test_r_incore(self):
         j3c = df.r_incore.aux_e2(mol, auxmol, intor='cint3c2e_spinor', aosym='s1')
         nao = mol.nao_2c()
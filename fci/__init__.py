@@ -12,6 +12,9 @@
 #              MO integrals
 # direct_uhf   arbitary number of alpha and beta electrons, based on UHF
 #              MO integrals
+# direct_spin1_csf  spin-adapted (CSF) basis, based on RHF/ROHF MO integrals
+# selected_ci  selected CI on the heat-bath selected alpha and beta strings,
+#              based on RHF/ROHF MO integrals
 #
 
 from pyscf.fci import cistring
@@ -22,6 +25,8 @@ from pyscf.fci import direct_uhf
 from pyscf.fci import direct_ms0_symm
 from pyscf.fci import direct_spin0_symm
 from pyscf.fci import direct_spin1_symm
+from pyscf.fci import direct_spin1_csf
+from pyscf.fci import selected_ci
 from pyscf.fci import addons
 from pyscf.fci import rdm
 from pyscf.fci import spin_op
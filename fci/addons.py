@@ -10,12 +10,10 @@ def large_ci(ci, norb, nelec, tol=.1):
     else:
         neleca, nelecb = nelec
     idx = numpy.argwhere(abs(ci) > tol)
-    res = []
-    for i,j in idx:
-        res.append((ci[i,j], \
-                    bin(cistring.addr2str(norb, neleca, i)), \
-                    bin(cistring.addr2str(norb, nelecb, j))))
-    return res
+    stra = cistring.addrs2str(norb, neleca, idx[:,0])
+    strb = cistring.addrs2str(norb, nelecb, idx[:,1])
+    return [(ci[i,j], bin(int(sa)), bin(int(sb)))
+            for (i,j), sa, sb in zip(idx, stra, strb)]
 
 def initguess_triplet(norb, nelec, binstring):
     if isinstance(nelec, int):
@@ -6,14 +6,23 @@
 import os
 import ctypes
 import math
+import collections
 import numpy
 import pyscf.lib
 
 libfci = pyscf.lib.load_library('libmcscf')
 
+# The link tables generated by gen_linkstr_index and gen_linkstr_index_trilidx
+# are cached and shared by all FCI calls.  The least recently used tables are
+# dropped when the cache exceeds LINK_INDEX_CACHE_SIZE MB.
+LINK_INDEX_CACHE_SIZE = 500
+_link_index_cache = collections.OrderedDict()
+
 # refer to ci.rdm3.gen_strings
 def gen_strings4orblist(orb_list, nelec, ordering=True):
     assert(nelec >= 0)
+    if ordering:
+        return make_strings(orb_list, nelec).tolist()
     if nelec == 0:
         return [0]
     def gen_str_iter(orb_list, nelec):
@@ -39,6 +48,27 @@ def gen_strings4orblist(orb_list, nelec, ordering=True):
     assert(strings.__len__() == num_strings(len(orb_list),nelec))
     return strings
 
+def make_strings(orb_list, nelec):
+    '''Generate the strings of nelec electrons in the orbitals orb_list, in
+    lexical order.  Return a uint64 array'''
+    assert(nelec >= 0)
+    orb_list = sorted(orb_list)
+    norb = len(orb_list)
+    assert(norb < 64)
+    na = num_strings(norb, nelec)
+    strs = numpy.empty(na, dtype=numpy.uint64)
+    libfci.FCIgen_strings(strs.ctypes.data_as(ctypes.c_void_p),
+                          ctypes.c_int(norb), ctypes.c_int(nelec),
+                          ctypes.c_int(na))
+    if orb_list != list(range(norb)):
+        # move the k-th bit to the orbital orb_list[k].  The mapping keeps
+        # the lexical order
+        strs0, strs = strs, numpy.zeros(na, dtype=numpy.uint64)
+        for k, i in enumerate(orb_list):
+            mask = (strs0 & numpy.uint64(1<<k)) != 0
+            strs[mask] |= numpy.uint64(1<<i)
+    return strs
+
 def num_strings(n, m):
     return math.factorial(n) \
             // (math.factorial(n-m)*math.factorial(m))
@@ -74,19 +104,7 @@ def gen_linkstr_index_o0(orb_list, nelec, strs=None):
     return numpy.array(t, dtype=numpy.int32)
 
 def gen_linkstr_index(orb_list, nocc, strs=None):
-    if strs is None:
-        strs = gen_strings4orblist(orb_list, nocc)
-    strs = numpy.array(strs)
-    norb = len(orb_list)
-    nvir = norb - nocc
-    na = num_strings(norb, nocc)
-    link_index = numpy.empty((na,nocc*nvir+nocc,4), dtype=numpy.int32)
-    libfci.FCIlinkstr_index(link_index.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(norb), ctypes.c_int(na),
-                            ctypes.c_int(nocc),
-                            strs.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(0))
-    return link_index
+    return _gen_linkstr_index(orb_list, nocc, strs, 0)
 
 # compress the a, i index, to fit the symmetry of integrals
 def reform_linkstr_index(link_index):
@@ -102,9 +120,21 @@ def reform_linkstr_index(link_index):
 
 # p^+ q|0> where p > q, link_index [pq, *, str1, sign] 
 def gen_linkstr_index_trilidx(orb_list, nocc, strs=None):
+    return _gen_linkstr_index(orb_list, nocc, strs, 1)
+
+def _gen_linkstr_index(orb_list, nocc, strs, trilidx):
+    '''Generate the link table, or take it from the cache if strs is not
+    given.  The cached tables are shared, they are returned read-only.'''
     if strs is None:
-        strs = gen_strings4orblist(orb_list, nocc)
-    strs = numpy.array(strs)
+        key = (tuple(orb_list), nocc, trilidx)
+        if key in _link_index_cache:
+            link_index = _link_index_cache.pop(key)
+            _link_index_cache[key] = link_index
+            return link_index
+        strs = make_strings(orb_list, nocc)
+    else:
+        key = None
+    strs = numpy.asarray(strs, dtype=numpy.uint64)
     norb = len(orb_list)
     nvir = norb - nocc
     na = num_strings(norb, nocc)
@@ -113,13 +143,24 @@ def gen_linkstr_index_trilidx(orb_list, nocc, strs=None):
                             ctypes.c_int(norb), ctypes.c_int(na),
                             ctypes.c_int(nocc),
                             strs.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(1))
+                            ctypes.c_int(trilidx))
+    if key is not None:
+        link_index.flags.writeable = False
+        _link_index_cache[key] = link_index
+        cache_size = sum([x.nbytes for x in _link_index_cache.values()])
+        while cache_size > LINK_INDEX_CACHE_SIZE*1e6 and len(_link_index_cache) > 1:
+            cache_size -= _link_index_cache.popitem(last=False)[1].nbytes
     return link_index
 
+def clear_link_index_cache():
+    _link_index_cache.clear()
+
 # a mapping between N electron string to N+1 electron string.
 # creation of an electron for the given string -> the address of the
 # resultant string
 def gen_cre_str_index(orb_list, nelec):
+    if list(orb_list) == list(range(len(orb_list))):
+        return _gen_cre_des_str_index(len(orb_list), nelec, 1)
     cre_strs = gen_strings4orblist(orb_list, nelec+1)
     credic = dict(zip(cre_strs,range(cre_strs.__len__())))
     def parity(str0, cre_bit):
@@ -139,6 +180,8 @@ def gen_cre_str_index(orb_list, nelec):
 # annihilation of an electron for the given string -> the address of the
 # resultant string
 def gen_des_str_index(orb_list, nelec):
+    if list(orb_list) == list(range(len(orb_list))):
+        return _gen_cre_des_str_index(len(orb_list), nelec, 0)
     des_strs = gen_strings4orblist(orb_list, nelec-1)
     desdic = dict(zip(des_strs,range(des_strs.__len__())))
     def parity(str0, des_bit):
@@ -154,9 +197,25 @@ def gen_des_str_index(orb_list, nelec):
     t = [pump1e(s) for s in gen_strings4orblist(orb_list, nelec)]
     return numpy.array(t, dtype=numpy.int32)
 
+def _gen_cre_des_str_index(norb, nelec, cre_or_des):
+    strs = make_strings(range(norb), nelec)
+    na = len(strs)
+    if cre_or_des:
+        nlink = norb - nelec
+    else:
+        nlink = nelec
+    link_index = numpy.empty((na,nlink,4), dtype=numpy.int32)
+    libfci.FCIcre_des_str_index(link_index.ctypes.data_as(ctypes.c_void_p),
+                                ctypes.c_int(norb), ctypes.c_int(nelec),
+                                ctypes.c_int(na),
+                                strs.ctypes.data_as(ctypes.c_void_p),
+                                ctypes.c_int(cre_or_des))
+    return link_index
 
 
 def parity(string0, string1):
+    if numpy.ndim(string0) > 0 or numpy.ndim(string1) > 0:
+        return parity_strs(string0, string1)
     ss = string1 - string0
     def count_bit1(n):
         # see Hamming weight problem and K&R C program
@@ -197,8 +256,22 @@ def addr2str_o1(norb, nelec, addr):
             nelec_left -= 1
     return str1
 def addr2str(norb, nelec, addr):
+    if numpy.ndim(addr) > 0:
+        return addrs2str(norb, nelec, addr)
     return addr2str_o1(norb, nelec, addr)
 
+def addrs2str(norb, nelec, addrs):
+    '''Convert a list of addresses to the strings (a uint64 array)'''
+    addrs = numpy.asarray(addrs, dtype=numpy.int32)
+    assert(addrs.size == 0 or
+           (addrs.min() >= 0 and addrs.max() < num_strings(norb, nelec)))
+    strs = numpy.empty(addrs.shape, dtype=numpy.uint64)
+    libfci.FCIaddrs2str(strs.ctypes.data_as(ctypes.c_void_p),
+                        addrs.ctypes.data_as(ctypes.c_void_p),
+                        ctypes.c_int(addrs.size),
+                        ctypes.c_int(norb), ctypes.c_int(nelec))
+    return strs
+
 #def str2addr_o0(norb, nelec, string):
 #    if norb <= nelec or nelec == 0:
 #        return 0
@@ -219,6 +292,8 @@ def addr2str(norb, nelec, addr):
 #            nelec_left -= 1
 #    return addr
 def str2addr(norb, nelec, string):
+    if numpy.ndim(string) > 0:
+        return strs2addr(norb, nelec, string)
     if isinstance(string, str):
         string = int(string, 2)
         assert(string.count('1') == nelec)
@@ -228,6 +303,35 @@ def str2addr(norb, nelec, string):
     return libfci.FCIstr2addr(ctypes.c_int(norb), ctypes.c_int(nelec),
                               ctypes.c_ulong(string))
 
+def strs2addr(norb, nelec, strings):
+    '''Convert a list of strings to the addresses (an int32 array)'''
+    strings = numpy.asarray(strings, dtype=numpy.uint64)
+    addrs = numpy.empty(strings.shape, dtype=numpy.int32)
+    libfci.FCIstrs2addr(addrs.ctypes.data_as(ctypes.c_void_p),
+                        strings.ctypes.data_as(ctypes.c_void_p),
+                        ctypes.c_int(strings.size),
+                        ctypes.c_int(norb), ctypes.c_int(nelec))
+    return addrs
+
+def _strs2occslst(strs, norb, nelec):
+    '''The occupied orbitals of each string, an int32 array (nstrs,nelec)'''
+    bits = numpy.uint64(1) << numpy.arange(norb, dtype=numpy.uint64)
+    occ = (numpy.asarray(strs, dtype=numpy.uint64).reshape(-1,1) & bits) != 0
+    return numpy.nonzero(occ)[1].astype(numpy.int32).reshape(len(strs),nelec)
+
+def parity_strs(strs0, strs1):
+    '''The parity of each pair of strings (strs0[i], strs1[i])'''
+    strs0, strs1 = numpy.broadcast_arrays(numpy.asarray(strs0, dtype=numpy.uint64),
+                                          numpy.asarray(strs1, dtype=numpy.uint64))
+    strs0 = numpy.ascontiguousarray(strs0)
+    strs1 = numpy.ascontiguousarray(strs1)
+    signs = numpy.empty(strs0.shape, dtype=numpy.int32)
+    libfci.FCIparity_strs(signs.ctypes.data_as(ctypes.c_void_p),
+                          strs0.ctypes.data_as(ctypes.c_void_p),
+                          strs1.ctypes.data_as(ctypes.c_void_p),
+                          ctypes.c_int(signs.size))
+    return signs
+
 if __name__ == '__main__':
     #print(gen_strings4orblist(range(4), 2))
     #print(gen_linkstr_index(range(6), 3))
@@ -63,6 +63,7 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
             assert(neleca == nelecb)
         link_index = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
     na,nlink,_ = link_index.shape
+    fcivec = numpy.asarray(fcivec, dtype=numpy.double)
     ci1 = numpy.empty((na,na))
 
     libfci.FCIcontract_2e_ms0(eri.ctypes.data_as(ctypes.c_void_p),
@@ -114,10 +115,8 @@ def pspace(h1e, eri, norb, nelec, hdiag, np=400):
 # symmetrize addra/addrb
     addra = addr // na
     addrb = addr % na
-    stra = numpy.array([cistring.addr2str(norb,neleca,ia) for ia in addra],
-                       dtype=numpy.long)
-    strb = numpy.array([cistring.addr2str(norb,neleca,ib) for ib in addrb],
-                       dtype=numpy.long)
+    stra = cistring.addrs2str(norb, neleca, addra)
+    strb = cistring.addrs2str(norb, neleca, addrb)
     np = len(addr)
     h0 = numpy.zeros((np,np))
     libfci.FCIpspace_h0tril(h0.ctypes.data_as(ctypes.c_void_p),
@@ -212,6 +211,11 @@ def kernel_ms0(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
 
     addr, h0 = fci.pspace(h1e, eri, norb, nelec, hdiag)
     pw, pv = scipy.linalg.eigh(h0)
+    nroots = min(getattr(fci, 'nroots', 1), na*na)
+    if nroots > 1:
+        hop = direct_spin1.hop_maker(fci, h1e, eri, norb, nelec, link_index)
+        return direct_spin1._kernel_nroots(fci, hop, hdiag, pw, pv, addr,
+                                           (na,na), nroots, ci0, **kwargs)
     if not fci.davidson_only:
         if len(addr) == 1:
             return pw, pv
@@ -225,10 +229,7 @@ def kernel_ms0(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
 
     precond = fci.make_precond(hdiag, pw, pv, addr)
 
-    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
-    def hop(c):
-        hc = fci.contract_2e(h2e, c, norb, nelec, link_index)
-        return hc.ravel()
+    hop = direct_spin1.hop_maker(fci, h1e, eri, norb, nelec, link_index)
 
 #TODO: check spin of initial guess
     if ci0 is None:
@@ -261,12 +262,6 @@ class FCISolver(direct_spin1.FCISolver):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index)
 
-    def eig(self, op, x0, precond, **kwargs):
-        return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
-                                  self.max_cycle, self.max_space, self.lindep,
-                                  self.max_memory, verbose=self.verbose,
-                                  **kwargs)
-
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         return direct_spin1.make_pspace_precond(hdiag, pspaceig, pspaceci, addr,
                                                 self.level_shift)
@@ -38,24 +38,33 @@ def contract_1e(f1e, fcivec, norb, nelec, link_index=None, orbsym=[]):
 # to restore the symmetry between pq and rs,
 #       eri_{pq,rs} = (pq|rs) - (.5/Nelec) [\sum_q (pq|qs) + \sum_p (pq|rp)]
 # Please refer to the treatment in direct_spin1.absorb_h1e
-def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
+def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[],
+                wfnsym=None):
     if not orbsym:
         return direct_ms0.contract_2e(eri, fcivec, norb, nelec, link_index)
 
     eri = pyscf.ao2mo.restore(4, eri, norb)
+    if isinstance(nelec, int):
+        neleca = nelec//2
+    else:
+        neleca, nelecb = nelec
+        assert(neleca == nelecb)
     if link_index is None:
-        if isinstance(nelec, int):
-            neleca = nelec//2
-        else:
-            neleca, nelecb = nelec
-            assert(neleca == nelecb)
         link_index = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
     na,nlink,_ = link_index.shape
+    fcivec = numpy.asarray(fcivec, dtype=numpy.double)
     ci1 = numpy.empty((na,na))
 
     eri, link_index, dimirrep = \
             direct_spin1_symm.reorder4irrep(eri, norb, link_index, orbsym)
     dimirrep = numpy.array(dimirrep, dtype=numpy.int32)
+    if wfnsym is None:
+        strsirrep = None
+        strsirrep_ptr = ctypes.c_void_p()
+        wfnsym = 0
+    else:
+        strsirrep = direct_spin1_symm.strs_irrep(norb, (neleca,neleca), orbsym)[0]
+        strsirrep_ptr = strsirrep.ctypes.data_as(ctypes.c_void_p)
 
     libfci.FCIcontract_2e_ms0_symm(eri.ctypes.data_as(ctypes.c_void_p),
                                    fcivec.ctypes.data_as(ctypes.c_void_p),
@@ -64,7 +73,8 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
                                    ctypes.c_int(nlink),
                                    link_index.ctypes.data_as(ctypes.c_void_p),
                                    dimirrep.ctypes.data_as(ctypes.c_void_p),
-                                   ctypes.c_int(len(dimirrep)))
+                                   ctypes.c_int(len(dimirrep)),
+                                   strsirrep_ptr, ctypes.c_int(wfnsym))
     return ci1
 
 
@@ -76,7 +86,7 @@ def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=.001, tol=1e-8,
     cis.conv_tol = tol
     cis.lindep = lindep
     cis.max_cycle = max_cycle
-    return direct_ms0.kernel_ms0(cis, h1e, eri, norb, nelec, ci0=ci0, **kwargs)
+    return kernel_ms0(cis, h1e, eri, norb, nelec, ci0=ci0, **kwargs)
 
 # dm_pq = <|p^+ q|>
 def make_rdm1(fcivec, norb, nelec, link_index=None):
@@ -109,12 +119,33 @@ def energy(h1e, eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
     ci1 = contract_2e(h2e, fcivec, norb, nelec, link_index, orbsym)
     return numpy.dot(fcivec.ravel(), ci1.ravel())
 
+def kernel_ms0(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
+    if not fci.orbsym or fci.wfnsym is None:
+        return direct_ms0.kernel_ms0(fci, h1e, eri, norb, nelec, ci0,
+                                     **kwargs)
+    if isinstance(nelec, int):
+        neleca = nelec//2
+    else:
+        neleca, nelecb = nelec
+        assert(neleca == nelecb)
+    link_index = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+    return direct_spin1_symm.kernel_sym(fci, h1e, eri, norb, (neleca,neleca),
+                                        link_index, ci0, **kwargs)
+
 
 class FCISolver(direct_ms0.FCISolver):
     def __init__(self, mol, **kwargs):
         self.orbsym = []
+        # irrep of the target state, see direct_spin1_symm.FCISolver
+        self.wfnsym = None
         direct_ms0.FCISolver.__init__(self, mol, **kwargs)
 
+    def dump_flags(self, verbose=None):
+        direct_ms0.FCISolver.dump_flags(self, verbose)
+        log = pyscf.lib.logger.Logger(self.mol.stdout, self.verbose
+                                      if verbose is None else verbose)
+        log.info('wfnsym = %s', self.wfnsym)
+
     def absorb_h1e(self, h1e, eri, norb, nelec, fac=1):
         return direct_spin1.absorb_h1e(h1e, eri, norb, nelec, fac)
 
@@ -133,20 +164,13 @@ class FCISolver(direct_ms0.FCISolver):
             orbsym = self.orbsym
         return contract_2e(eri, fcivec, norb, nelec, link_index, orbsym, **kwargs)
 
-    def eig(self, op, x0, precond, **kwargs):
-        return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
-                                  self.max_cycle, self.max_space, self.lindep,
-                                  self.max_memory, verbose=self.verbose,
-                                  **kwargs)
-
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         return direct_spin1.make_pspace_precond(hdiag, pspaceig, pspaceci, addr,
                                                 self.level_shift)
 
     def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
         self.mol.check_sanity(self)
-        return direct_ms0.kernel_ms0(self, h1e, eri, norb, nelec, ci0,
-                                     **kwargs)
+        return kernel_ms0(self, h1e, eri, norb, nelec, ci0, **kwargs)
 
     def energy(self, h1e, eri, fcivec, norb, nelec, link_index=None):
         h2e = self.absorb_h1e(h1e, eri, norb, nelec, .5)
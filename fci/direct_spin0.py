@@ -64,6 +64,7 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
             assert(neleca == nelecb)
         link_index = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
     na,nlink,_ = link_index.shape
+    fcivec = numpy.asarray(fcivec, dtype=numpy.double)
     ci1 = numpy.empty((na,na))
 
     libfci.FCIcontract_2e_spin0(eri.ctypes.data_as(ctypes.c_void_p),
@@ -166,12 +167,6 @@ class FCISolver(direct_ms0.FCISolver):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
-    def eig(self, op, x0, precond, **kwargs):
-        return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
-                                  self.max_cycle, self.max_space, self.lindep,
-                                  self.max_memory, verbose=self.verbose,
-                                  **kwargs)
-
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         return direct_spin1.make_pspace_precond(hdiag, pspaceig, pspaceci, addr,
                                                 self.level_shift)
@@ -184,7 +179,7 @@ class FCISolver(direct_ms0.FCISolver):
 # that the ground state is triplet (ci = -ci.T), symmetrize the coefficients
 # will lead to ci = 0
 #        ci = pyscf.lib.transpose_sum(ci, inplace=True) * .5
-        return e, ci
+        return self._kernel_rdm12(h1e, eri, norb, nelec, e, ci)
 
     def energy(self, h1e, eri, fcivec, norb, nelec, link_index=None):
         h2e = self.absorb_h1e(h1e, eri, norb, nelec, .5)
@@ -198,6 +193,9 @@ class FCISolver(direct_ms0.FCISolver):
         return make_rdm1(fcivec, norb, nelec, link_index)
 
     def make_rdm12(self, fcivec, norb, nelec, link_index=None, **kwargs):
+        saved = self._saved_rdm12(fcivec, norb)
+        if saved is not None:
+            return saved
         return make_rdm12(fcivec, norb, nelec, link_index)
 
     def trans_rdm1s(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
@@ -26,6 +26,14 @@ from pyscf.fci import rdm
 
 libfci = pyscf.lib.load_library('libmcscf')
 
+def _unpack_nelec(nelec):
+    '''(neleca, nelecb) of nelec.  An int nelec has the lowest spin.'''
+    if isinstance(nelec, int):
+        nelecb = nelec//2
+        neleca = nelec - nelecb
+        nelec = (neleca, nelecb)
+    return nelec
+
 def contract_1e(f1e, fcivec, norb, nelec, link_index=None):
     if link_index is None:
         if isinstance(nelec, int):
@@ -86,14 +94,21 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
     fcivec = fcivec.reshape(na,nb)
     ci1 = numpy.empty_like(fcivec)
 
-    libfci.FCIcontract_rhf2e_spin1(eri.ctypes.data_as(ctypes.c_void_p),
-                                   fcivec.ctypes.data_as(ctypes.c_void_p),
-                                   ci1.ctypes.data_as(ctypes.c_void_p),
-                                   ctypes.c_int(norb),
-                                   ctypes.c_int(na), ctypes.c_int(nb),
-                                   ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
-                                   link_indexa.ctypes.data_as(ctypes.c_void_p),
-                                   link_indexb.ctypes.data_as(ctypes.c_void_p))
+    if fcivec.dtype == numpy.float32:
+        # single precision sigma for the mixed precision Davidson
+        eri = numpy.asarray(eri, dtype=numpy.float32, order='C')
+        fcivec = numpy.asarray(fcivec, order='C')
+        fn = libfci.FCIcontract_rhf2e_spin1_float
+    else:
+        fn = libfci.FCIcontract_rhf2e_spin1
+    fn(eri.ctypes.data_as(ctypes.c_void_p),
+       fcivec.ctypes.data_as(ctypes.c_void_p),
+       ci1.ctypes.data_as(ctypes.c_void_p),
+       ctypes.c_int(norb),
+       ctypes.c_int(na), ctypes.c_int(nb),
+       ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+       link_indexa.ctypes.data_as(ctypes.c_void_p),
+       link_indexb.ctypes.data_as(ctypes.c_void_p))
     return ci1
 
 def make_hdiag(h1e, eri, norb, nelec):
@@ -155,10 +170,8 @@ def pspace(h1e, eri, norb, nelec, hdiag, np=400):
     addr = numpy.argsort(hdiag)[:np]
     addra = addr // nb
     addrb = addr % nb
-    stra = numpy.array([cistring.addr2str(norb,neleca,ia) for ia in addra],
-                       dtype=numpy.uint64)
-    strb = numpy.array([cistring.addr2str(norb,nelecb,ib) for ib in addrb],
-                       dtype=numpy.uint64)
+    stra = cistring.addrs2str(norb, neleca, addra)
+    strb = cistring.addrs2str(norb, nelecb, addrb)
     np = len(addr)
     h0 = numpy.zeros((np,np))
     libfci.FCIpspace_h0tril(h0.ctypes.data_as(ctypes.c_void_p),
@@ -218,10 +231,47 @@ def make_rdm12s(fcivec, norb, nelec, link_index=None):
     dm1b, dm2bb = rdm.reorder_rdm(dm1b, dm2bb, inplace=True)
     return (dm1a, dm1b), (dm2aa, dm2ab, dm2bb)
 
+# spin-traced 1- and 2-pdm.  The alpha and beta excitations are gathered in
+# one pass over the link tables (rather than the aa, bb, ab passes of
+# make_rdm12s)
 def make_rdm12(fcivec, norb, nelec, link_index=None):
-    (dm1a, dm1b), (dm2aa, dm2ab, dm2bb) = \
-            make_rdm12s(fcivec, norb, nelec, link_index)
-    return dm1a+dm1b, dm2aa+dm2ab+dm2ab.transpose(2,3,0,1)+dm2bb
+    dm1, dm2 = rdm.make_rdm12_spin1('FCIrdm12kern_sf', fcivec, fcivec,
+                                    norb, nelec, link_index, 1)
+    return rdm.reorder_rdm(dm1, dm2, True)
+
+# The sigma vector H|c> and the spin-traced 1- and 2-pdm of c in one pass.
+# The intermediates <K|p^+ q|c> are gathered once and used by both the
+# contraction with eri and the 2-pdm.  eri is the 2e hamiltonian of
+# absorb_h1e.  link_index is the one of make_rdm12 (gen_linkstr_index), not
+# the trilidx one of contract_2e
+def contract_2e_and_rdm12(eri, fcivec, norb, nelec, link_index=None):
+    eri = pyscf.ao2mo.restore(4, eri, norb)
+    if link_index is None:
+        neleca, nelecb = _unpack_nelec(nelec)
+        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
+        link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+    else:
+        link_indexa, link_indexb = link_index
+
+    na, nlinka = link_indexa.shape[:2]
+    nb, nlinkb = link_indexb.shape[:2]
+    eri = numpy.asarray(eri, order='C')
+    fcivec = numpy.asarray(fcivec, dtype=numpy.double, order='C').reshape(na,nb)
+    ci1 = numpy.empty_like(fcivec)
+    rdm1 = numpy.empty((norb,norb))
+    rdm2 = numpy.empty((norb,norb,norb,norb))
+    libfci.FCIcontract_2e_rdm12_spin1(eri.ctypes.data_as(ctypes.c_void_p),
+                                      fcivec.ctypes.data_as(ctypes.c_void_p),
+                                      ci1.ctypes.data_as(ctypes.c_void_p),
+                                      rdm1.ctypes.data_as(ctypes.c_void_p),
+                                      rdm2.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(norb),
+                                      ctypes.c_int(na), ctypes.c_int(nb),
+                                      ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                      link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                      link_indexb.ctypes.data_as(ctypes.c_void_p))
+    rdm1, rdm2 = rdm.reorder_rdm(rdm1, rdm2, True)
+    return ci1, rdm1, rdm2
 
 def trans_rdm1s(cibra, ciket, norb, nelec, link_index=None):
     rdm1a = rdm.make_rdm1_spin1('FCItrans_rdm1a', cibra, ciket,
@@ -250,9 +300,22 @@ def trans_rdm12s(cibra, ciket, norb, nelec, link_index=None):
     return (dm1a, dm1b), (dm2aa, dm2ab, dm2ba, dm2bb)
 
 def trans_rdm12(cibra, ciket, norb, nelec, link_index=None):
-    (dm1a, dm1b), (dm2aa, dm2ab, dm2ba, dm2bb) = \
-            trans_rdm12s(cibra, ciket, norb, nelec, link_index)
-    return dm1a+dm1b, dm2aa+dm2ab+dm2ba+dm2bb
+    dm1, dm2 = rdm.make_rdm12_spin1('FCItdm12kern_sf', cibra, ciket,
+                                    norb, nelec, link_index, 2)
+    return rdm.reorder_rdm(dm1, dm2, True)
+
+# Transition density matrices of all pairs of bras and kets.  dm1[i,j] is the
+# trans_rdm1 of (bras[i], kets[j])
+def trans_rdm1_batch(bras, kets, norb, nelec, link_index=None):
+    return rdm.make_trans_rdm12_batch(bras, kets, norb, nelec, link_index,
+                                      False)[0]
+
+def trans_rdm12_batch(bras, kets, norb, nelec, link_index=None):
+    dm1, dm2 = rdm.make_trans_rdm12_batch(bras, kets, norb, nelec, link_index)
+    for i in range(dm1.shape[0]):
+        for j in range(dm1.shape[1]):
+            dm2[i,j] = rdm.reorder_rdm(dm1[i,j], dm2[i,j], True)[1]
+    return dm1, dm2
 
 
 
@@ -275,6 +338,12 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
 
     addr, h0 = fci.pspace(h1e, eri, norb, nelec, hdiag)
     pw, pv = scipy.linalg.eigh(h0)
+    nroots = min(getattr(fci, 'nroots', 1), na*nb)
+    if nroots > 1:
+        return _kernel_nroots(fci, hop_maker(fci, h1e, eri, norb, nelec,
+                                             (link_indexa,link_indexb)),
+                              hdiag, pw, pv, addr, (na,nb), nroots, ci0,
+                              **kwargs)
     if not fci.davidson_only:
         if len(addr) == 1:
             return pw, pv
@@ -288,10 +357,7 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
 
     precond = fci.make_precond(hdiag, pw, pv, addr)
 
-    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
-    def hop(c):
-        hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
-        return hc.ravel()
+    hop = hop_maker(fci, h1e, eri, norb, nelec, (link_indexa,link_indexb))
 
     if ci0 is None:
         ci0 = numpy.zeros(na*nb)
@@ -303,6 +369,48 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
     e, c = fci.eig(hop, ci0, precond, **kwargs)
     return e, c.reshape(na,nb)
 
+def hop_maker(fci, h1e, eri, norb, nelec, link_index):
+    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
+    threads = getattr(fci, 'threads', None)
+    def hop(c):
+        with pyscf.lib.with_omp_threads(threads):
+            hc = fci.contract_2e(h2e, c, norb, nelec, link_index)
+        return hc.ravel()
+    return hop
+
+def _kernel_nroots(fci, hop, hdiag, pw, pv, addr, shape, nroots, ci0=None,
+                   **kwargs):
+    '''Solve the lowest nroots states with the block Davidson solver.  The
+    returned energies and CI vectors are lists of nroots items.'''
+    ndet = int(numpy.prod(shape))
+    if not fci.davidson_only and len(addr) == ndet:
+        cis = []
+        for k in range(nroots):
+            c = numpy.empty(ndet)
+            c[addr] = pv[:,k]
+            cis.append(c.reshape(shape))
+        return pw[:nroots], cis
+
+    if ci0 is None:
+        ci0 = []
+        for k in range(min(nroots, len(addr))):
+            c = numpy.zeros(ndet)
+            c[addr] = pv[:,k]
+            ci0.append(c)
+        for i in numpy.argsort(hdiag):
+            if len(ci0) >= nroots:
+                break
+            if i not in addr:
+                c = numpy.zeros(ndet)
+                c[i] = 1
+                ci0.append(c)
+    else:
+        ci0 = [c.ravel() for c in ci0]
+
+    precond = fci.make_precond(hdiag, pw, pv, addr)
+    e, cis = fci.eig(hop, ci0, precond, nroots=nroots, **kwargs)
+    return e, [c.reshape(shape) for c in cis]
+
 def make_pspace_precond(hdiag, pspaceig, pspaceci, addr, level_shift=0):
     # precondition with pspace Hamiltonian, CPL, 169, 463
     def precond(r, e0, x0, *args):
@@ -344,6 +452,25 @@ class FCISolver(object):
         # solution will ignore the initial guess.  Setting davidson_only can
         # enforce the solution on the initial guess state
         self.davidson_only = False
+        # number of states to solve.  When nroots > 1, kernel returns the
+        # lists of energies and CI vectors of the lowest nroots states
+        self.nroots = 1
+        # number of OpenMP threads for the sigma vector (contract_2e).  None
+        # to use the default setting of the OpenMP runtime
+        self.threads = None
+        # run the Davidson iteration in single precision until the energy is
+        # converged to single_prec_tol: the trial vectors and sigma vectors
+        # are stored in float32 and contract_2e is called on the float32
+        # trial vectors.  Then refine the solution in float64
+        self.mixed_precision = False
+        self.single_prec_tol = 1e-6
+        # evaluate the energy of the CI vector returned by kernel and its 1-
+        # and 2-pdm in one pass (contract_2e_and_rdm12).  The next
+        # make_rdm12 call on that CI vector returns the saved 2-pdm, e.g. the
+        # casscf.casci -> fcisolver.make_rdm12 step of the CASSCF macro
+        # iterations
+        self.rdm12_from_kernel = False
+        self._rdm12 = None
 
         self._keys = set(self.__dict__.keys())
 
@@ -359,6 +486,11 @@ class FCISolver(object):
         log.info('level shift = %d', self.level_shift)
         log.info('max iter space = %d', self.max_space)
         log.info('max_memory %d MB', self.max_memory)
+        log.info('nroots = %d', self.nroots)
+        log.info('threads = %s', self.threads)
+        if self.mixed_precision:
+            log.info('mixed precision, single_prec_tol = %g',
+                     self.single_prec_tol)
 
 
     def absorb_h1e(self, h1e, eri, norb, nelec, fac=1):
@@ -377,10 +509,30 @@ class FCISolver(object):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
     def eig(self, op, x0, precond, **kwargs):
-        return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
-                                  self.max_cycle, self.max_space, self.lindep,
-                                  self.max_memory, verbose=self.verbose,
-                                  **kwargs)
+        if not self.mixed_precision:
+            return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
+                                      self.max_cycle, self.max_space,
+                                      self.lindep, self.max_memory,
+                                      verbose=self.verbose, **kwargs)
+
+        tol = max(self.conv_tol, self.single_prec_tol)
+        op_single = lambda x: op(numpy.asarray(x, dtype=numpy.float32))
+        e, x0 = pyscf.lib.davidson(op_single, x0, precond, tol,
+                                   self.max_cycle, self.max_space,
+                                   self.lindep, self.max_memory,
+                                   verbose=self.verbose,
+                                   xs_dtype=numpy.float32, **kwargs)
+# Refine in float64.  The block Davidson orthonormalizes the correction
+# vectors, which are tiny when x0 is close to the solution.
+        nroots = kwargs.pop('nroots', 1)
+        e, x0 = pyscf.lib.davidson1(lambda xs: [op(x) for x in xs], x0,
+                                    precond, self.conv_tol, self.max_cycle,
+                                    self.max_space, self.lindep,
+                                    self.max_memory, nroots=nroots,
+                                    verbose=self.verbose, **kwargs)
+        if nroots == 1:
+            return e[0], x0[0]
+        return e, x0
 
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         return make_pspace_precond(hdiag, pspaceig, pspaceci, addr,
@@ -391,7 +543,28 @@ class FCISolver(object):
 
     def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
         self.mol.check_sanity(self)
-        return kernel_ms1(self, h1e, eri, norb, nelec, ci0, **kwargs)
+        e, c = kernel_ms1(self, h1e, eri, norb, nelec, ci0, **kwargs)
+        return self._kernel_rdm12(h1e, eri, norb, nelec, e, c)
+
+    def _kernel_rdm12(self, h1e, eri, norb, nelec, e, c):
+        '''With rdm12_from_kernel, replace e by <c|H|c> and save the 1- and
+        2-pdm of c, both from one contract_2e_and_rdm12 pass.'''
+        self._rdm12 = None
+        if self.rdm12_from_kernel and numpy.ndim(e) == 0:
+            h2e = absorb_h1e(h1e, eri, norb, nelec, .5)
+            hc, dm1, dm2 = contract_2e_and_rdm12(h2e, c, norb, nelec)
+            e = numpy.dot(c.ravel(), hc.ravel())
+            self._rdm12 = (c, dm1, dm2)
+        return e, c
+
+    def _saved_rdm12(self, fcivec, norb):
+        '''The 2-pdm saved by kernel if fcivec is the CI vector kernel returned.
+        The saved 2-pdm is released after this call.'''
+        saved = getattr(self, '_rdm12', None)
+        if saved is not None and saved[0] is fcivec and saved[1].shape[0] == norb:
+            self._rdm12 = None
+            return saved[1], saved[2]
+        return None
 
     def energy(self, h1e, eri, fcivec, norb, nelec, link_index=None):
         h2e = self.absorb_h1e(h1e, eri, norb, nelec, .5)
@@ -408,6 +581,9 @@ class FCISolver(object):
         return make_rdm12s(fcivec, norb, nelec, link_index)
 
     def make_rdm12(self, fcivec, norb, nelec, link_index=None, **kwargs):
+        saved = self._saved_rdm12(fcivec, norb)
+        if saved is not None:
+            return saved
         return make_rdm12(fcivec, norb, nelec, link_index)
 
     def trans_rdm1s(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
@@ -422,6 +598,12 @@ class FCISolver(object):
     def trans_rdm12(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
         return trans_rdm12(cibra, ciket, norb, nelec, link_index)
 
+    def trans_rdm1_batch(self, bras, kets, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm1_batch(bras, kets, norb, nelec, link_index)
+
+    def trans_rdm12_batch(self, bras, kets, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm12_batch(bras, kets, norb, nelec, link_index)
+
 
 if __name__ == '__main__':
     from functools import reduce
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+#
+# FCI solver in the basis of spin-adapted configuration state functions
+# (CSFs), based on RHF/ROHF MO integrals.
+#
+# The CSFs are the genealogical (Yamanouchi-Kotani) couplings of the singly
+# occupied orbitals.  The transformation between the CSFs and the
+# determinants is block diagonal in the spatial configurations, and the block
+# only depends on the number of singly occupied orbitals.  The Davidson
+# iteration runs on the CSF coefficients.  The sigma vector is not built in
+# the CSF basis: each H|CSF> expands the trial vector to a full (na,nb)
+# determinant vector, calls the determinant kernel of direct_spin1 and
+# projects the result back to the CSFs.  The sigma cost and its temporary
+# determinant vectors are those of direct_spin1; only the memory of the
+# Davidson subspace (trial and sigma vectors) is reduced to the CSF
+# dimension.  The solutions are returned as determinant CI vectors, so that
+# the RDM functions of direct_spin1 apply.
+#
+
+import numpy
+import pyscf.lib
+import pyscf.lib.logger
+from pyscf.fci import cistring
+from pyscf.fci import direct_spin1
+
+def csf_coeff(nopen, nalpha, twoS):
+    '''Coefficients of the genealogical CSFs of nopen singly occupied orbitals
+    with total spin S = twoS/2 and M = nalpha - nopen/2.
+
+    Returns:
+        (ndet,ncsf) matrix.  The determinants are labelled by the alpha
+        singly occupied orbitals, in the order of
+        cistring.make_strings(range(nopen), nalpha).  The CSFs are labelled by
+        the coupling paths, which are the bit strings of the spin-up (bit=1)
+        couplings.
+    '''
+    dets = cistring.make_strings(range(nopen), nalpha).astype(numpy.int64)
+    nup = (nopen + twoS) // 2
+    if nopen < twoS or (nopen + twoS) % 2 or nup > nopen:
+        return numpy.zeros((len(dets),0))
+    paths = cistring.make_strings(range(nopen), nup).astype(numpy.int64)
+    # the intermediate spin cannot be negative
+    s = numpy.zeros(len(paths), dtype=int)
+    valid = numpy.ones(len(paths), dtype=bool)
+    for k in range(nopen):
+        s += ((paths >> k) & 1) * 2 - 1
+        valid &= s >= 0
+    paths = paths[valid]
+
+    coeff = numpy.ones((len(paths),len(dets)))
+    s = numpy.zeros((len(paths),1), dtype=int)  # 2S of the coupled shells
+    m = numpy.zeros((1,len(dets)), dtype=int)   # 2M of the coupled shells
+    for k in range(nopen):
+        up = ((paths >> k) & 1).reshape(-1,1) == 1
+        sgn = ((dets >> k) & 1).reshape(1,-1) * 2 - 1
+        m = m + sgn
+        # Clebsch-Gordan coefficients <S' M-m; 1/2 m|S M>, S = S'+-1/2
+        num = numpy.where(up, s + sgn*m + 1, s - sgn*m + 1)
+        fac = numpy.where(up, 1, -sgn)
+        coeff *= fac * numpy.sqrt(numpy.maximum(num, 0) / (2.*(s+1)))
+        s = s + numpy.where(up, 1, -1)
+    return coeff.T
+
+def gen_csf_transform(norb, nelec, twoS):
+    '''The CSF-determinant transformation.  Returns a list of
+    (addr, sign, coeff) for the configurations of the same number of singly
+    occupied orbitals.  addr[iconf,idet] is the address of the determinant
+    in the flattened (na,nb) CI vector, sign[iconf,idet] is the phase between
+    the orbital-ordered and the alpha-beta ordered determinant, coeff is the
+    (ndet,ncsf) matrix of csf_coeff.'''
+    neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+    assert(twoS >= abs(neleca - nelecb))
+    nb = cistring.num_strings(norb, nelecb)
+    bits = numpy.uint64(1) << numpy.arange(norb, dtype=numpy.uint64)
+    one = numpy.uint64(1)
+    blocks = []
+    for nd in range(min(neleca, nelecb)+1):
+        nopen = neleca + nelecb - nd * 2
+        if nd + nopen > norb:
+            continue
+        coeff = csf_coeff(nopen, neleca-nd, twoS)
+        if coeff.shape[1] == 0:
+            continue
+
+        # configurations = (doubly occupied, singly occupied) orbitals
+        u_strs = cistring.make_strings(range(norb), nopen)
+        dd = []
+        uu = []
+        for d in cistring.make_strings(range(norb), nd):
+            us = u_strs[(u_strs & d) == 0]
+            dd.append(numpy.repeat(d, len(us)))
+            uu.append(us)
+        dd = numpy.hstack(dd).reshape(-1,1)
+        uu = numpy.hstack(uu).reshape(-1,1)
+
+        openorbs = cistring._strs2occslst(uu, norb, nopen)
+        pattern = cistring.make_strings(range(nopen), neleca-nd)
+        alpha_open = numpy.zeros((len(uu),len(pattern)), dtype=numpy.uint64)
+        for k in range(nopen):
+            sel = (pattern >> numpy.uint64(k)) & one
+            alpha_open |= bits[openorbs[:,k]].reshape(-1,1) * sel
+        alpha = alpha_open | dd
+        beta = (uu ^ alpha_open) | dd
+
+        addra = cistring.strs2addr(norb, neleca, alpha.ravel())
+        addrb = cistring.strs2addr(norb, nelecb, beta.ravel())
+        addr = (addra.astype(numpy.int64) * nb + addrb).reshape(alpha.shape)
+
+        # a^+_{0a} a^+_{0b} a^+_{1a} ... -> a^+_{0a} a^+_{1a} ... a^+_{0b} ...
+        # the phase is the parity of the pairs (beta_p, alpha_q) with p < q
+        npair = numpy.zeros(alpha.shape, dtype=numpy.int32)
+        nbelow = numpy.zeros(alpha.shape, dtype=numpy.int32)
+        for q in range(norb):
+            q = numpy.uint64(q)
+            npair += ((alpha >> q) & one).astype(numpy.int32) * nbelow
+            nbelow += ((beta >> q) & one).astype(numpy.int32)
+        sign = (1 - (npair % 2) * 2).astype(numpy.int8)
+        blocks.append((addr, sign, coeff))
+    return blocks
+
+def det2csf(fcivec, blocks):
+    '''Project the determinant CI vector to the CSFs'''
+    fcivec = numpy.asarray(fcivec).ravel()
+    return numpy.hstack([numpy.dot(fcivec[addr] * sign, coeff).ravel()
+                         for addr, sign, coeff in blocks])
+
+def csf2det(civec, blocks, na, nb):
+    '''Transform the CSF coefficients to the determinant CI vector'''
+    fcivec = numpy.zeros(na*nb)
+    p0 = 0
+    for addr, sign, coeff in blocks:
+        nconf = addr.shape[0]
+        ncsf = coeff.shape[1]
+        p1 = p0 + nconf * ncsf
+        fcivec[addr] = numpy.dot(civec[p0:p1].reshape(nconf,ncsf), coeff.T) * sign
+        p0 = p1
+    return fcivec.reshape(na,nb)
+
+
+def kernel_csf(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
+    neleca, nelecb = nelec = direct_spin1._unpack_nelec(nelec)
+    link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+    link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+    na = link_indexa.shape[0]
+    nb = link_indexb.shape[0]
+    blocks = fci.gen_csf_transform(norb, nelec)
+    hdiag = fci.make_hdiag(h1e, eri, norb, nelec)
+    # diagonal of H in the CSFs, without the exchange coupling between the
+    # determinants of the same configuration
+    hdiag = numpy.hstack([numpy.dot(hdiag[addr], coeff**2).ravel()
+                          for addr, sign, coeff in blocks])
+    ncsf = len(hdiag)
+    assert(ncsf > 0)
+
+    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
+    # sigma in the determinant basis, see the comments at the top of the file
+    def hop(x):
+        c = csf2det(x, blocks, na, nb)
+        with pyscf.lib.with_omp_threads(fci.threads):
+            hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
+        return det2csf(hc, blocks)
+    precond = direct_spin1.make_diag_precond(hdiag, fci.level_shift)
+
+    nroots = min(fci.nroots, ncsf)
+    if ci0 is None:
+        ci0 = []
+    elif isinstance(ci0, numpy.ndarray):
+        ci0 = [ci0]
+    x0 = []
+    for c in ci0[:nroots]:
+        x = det2csf(c, blocks)
+        if numpy.linalg.norm(x) > 1e-4:
+            x0.append(x / numpy.linalg.norm(x))
+    for i in numpy.argsort(hdiag):
+        if len(x0) >= nroots:
+            break
+        if all([abs(x[i]) < 1e-4 for x in x0]):
+            x = numpy.zeros(ncsf)
+            x[i] = 1
+            x0.append(x)
+
+    if nroots > 1:
+        e, c = fci.eig(hop, x0, precond, nroots=nroots, **kwargs)
+        return e, [csf2det(x, blocks, na, nb) for x in c]
+    else:
+        e, c = fci.eig(hop, x0[0], precond, **kwargs)
+        return e, csf2det(c, blocks, na, nb)
+
+
+class FCISolver(direct_spin1.FCISolver):
+    def __init__(self, mol=None):
+        # 2S of the target states.  None for the lowest spin of nelec, ie
+        # singlet for the even number of electrons and doublet for the odd
+        self.spin = None
+        self._csf_transform = (None, None)
+        direct_spin1.FCISolver.__init__(self, mol)
+
+    def dump_flags(self, verbose=None):
+        direct_spin1.FCISolver.dump_flags(self, verbose)
+        log = pyscf.lib.logger.Logger(self.mol.stdout, self.verbose
+                                      if verbose is None else verbose)
+        log.info('spin (2S) = %s', self.spin)
+
+    def gen_csf_transform(self, norb, nelec):
+        '''The CSF-determinant transformation of the last call is reused'''
+        neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+        if self.spin is None:
+            twoS = abs(neleca - nelecb)
+        else:
+            twoS = self.spin
+        key = (norb, neleca, nelecb, twoS)
+        if self._csf_transform[0] != key:
+            self._csf_transform = (key, gen_csf_transform(norb, nelec, twoS))
+        return self._csf_transform[1]
+
+    def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
+        if self.mol is not None:
+            self.mol.check_sanity(self)
+        return kernel_csf(self, h1e, eri, norb, nelec, ci0, **kwargs)
+
+
+if __name__ == '__main__':
+    from functools import reduce
+    from pyscf import gto
+    from pyscf import scf
+    from pyscf import ao2mo
+    from pyscf.fci import spin_op
+
+    mol = gto.Mole()
+    mol.verbose = 0
+    mol.output = None
+    mol.atom = [
+        ['H', ( 1.,-1.    , 0.   )],
+        ['H', ( 0.,-1.    ,-1.   )],
+        ['H', ( 1.,-0.5   ,-1.   )],
+        ['H', ( 0.,-0.    ,-1.   )],
+        ['H', ( 1.,-0.5   , 0.   )],
+        ['H', ( 0., 1.    , 1.   )],
+    ]
+    mol.basis = {'H': 'sto-3g'}
+    mol.build()
+
+    m = scf.RHF(mol)
+    m.scf()
+
+    norb = m.mo_coeff.shape[1]
+    nelec = mol.nelectron
+    h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+    eri = ao2mo.incore.full(m._eri, m.mo_coeff)
+
+    cis = FCISolver(mol)
+    cis.spin = 2
+    e1, c1 = cis.kernel(h1e, eri, norb, nelec)
+    print(e1, spin_op.spin_square(c1, norb, nelec))
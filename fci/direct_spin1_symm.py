@@ -56,29 +56,41 @@ def contract_1e(f1e, fcivec, norb, nelec, link_index=None, orbsym=[]):
 # to restore the symmetry between pq and rs,
 #       eri_{pq,rs} = (pq|rs) - (.5/Nelec) [\sum_q (pq|qs) + \sum_p (pq|rp)]
 # Please refer to the treatment in direct_spin1.absorb_h1e
-def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
+#
+# When wfnsym is given, fcivec must belong to irrep wfnsym.  Only the symmetry
+# allowed (ij| blocks are contracted for each pair of alpha and beta strings.
+def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[],
+                wfnsym=None):
     if not orbsym:
         return direct_spin1.contract_2e(eri, fcivec, norb, nelec, link_index)
 
     eri = pyscf.ao2mo.restore(4, eri, norb)
+    if isinstance(nelec, int):
+        nelecb = nelec//2
+        neleca = nelec - nelecb
+    else:
+        neleca, nelecb = nelec
     if link_index is None:
-        if isinstance(nelec, int):
-            nelecb = nelec//2
-            neleca = nelec - nelecb
-        else:
-            neleca, nelecb = nelec
         link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
         link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
     else:
         link_indexa, link_indexb = link_index
     na, nlinka = link_indexa.shape[:2]
     nb, nlinkb = link_indexb.shape[:2]
-    fcivec = fcivec.reshape(na,nb)
+    fcivec = numpy.asarray(fcivec, dtype=numpy.double).reshape(na,nb)
     ci1 = numpy.empty_like(fcivec)
 
     eri, link_indexa, dimirrep = reorder4irrep(eri, norb, link_indexa, orbsym)
     link_indexb = reorder4irrep(eri, norb, link_indexb, orbsym)[1]
     dimirrep = numpy.array(dimirrep, dtype=numpy.int32)
+    if wfnsym is None:
+        airreps = birreps = None
+        airreps_ptr = birreps_ptr = ctypes.c_void_p()
+        wfnsym = 0
+    else:
+        airreps, birreps = strs_irrep(norb, (neleca,nelecb), orbsym)
+        airreps_ptr = airreps.ctypes.data_as(ctypes.c_void_p)
+        birreps_ptr = birreps.ctypes.data_as(ctypes.c_void_p)
 
     libfci.FCIcontract_rhf2e_spin1_symm(eri.ctypes.data_as(ctypes.c_void_p),
                                         fcivec.ctypes.data_as(ctypes.c_void_p),
@@ -89,9 +101,140 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
                                         link_indexa.ctypes.data_as(ctypes.c_void_p),
                                         link_indexb.ctypes.data_as(ctypes.c_void_p),
                                         dimirrep.ctypes.data_as(ctypes.c_void_p),
-                                        ctypes.c_int(len(dimirrep)))
+                                        ctypes.c_int(len(dimirrep)),
+                                        airreps_ptr, birreps_ptr,
+                                        ctypes.c_int(wfnsym))
     return ci1
 
+def gen_strs_irrep(strs, orbsym):
+    '''The irrep of each string, i.e. the direct product of the irreps of the
+    occupied orbitals.  The irreps are labelled by the XOR-able ids of
+    pyscf.symm (see mol.irrep_id).'''
+    strs = numpy.asarray(strs, dtype=numpy.int64)
+    irreps = numpy.zeros(len(strs), dtype=numpy.int32)
+    for i, ir in enumerate(orbsym):
+        irreps[(strs & (1<<i)) != 0] ^= ir
+    return irreps
+
+def strs_irrep(norb, nelec, orbsym):
+    '''The irreps of the alpha strings and the beta strings'''
+    neleca, nelecb = nelec
+    airreps = gen_strs_irrep(cistring.make_strings(range(norb), neleca),
+                             orbsym)
+    if nelecb == neleca:
+        birreps = airreps
+    else:
+        birreps = gen_strs_irrep(cistring.make_strings(range(norb), nelecb),
+                                 orbsym)
+    return airreps, birreps
+
+def sym_allowed_indices(airreps, birreps, wfnsym):
+    '''Addresses of the determinants of irrep wfnsym in the flattened
+    (na,nb) CI vector'''
+    mask = (airreps.reshape(-1,1) ^ birreps) == wfnsym
+    return numpy.where(mask.ravel())[0]
+
+def kernel_sym(fci, h1e, eri, norb, nelec, link_index, ci0=None, **kwargs):
+    '''Davidson diagonalization in the space of the determinants of irrep
+    fci.wfnsym.  The trial vectors, the preconditioner and the pspace only
+    hold the symmetry allowed determinants.  The sigma vector is computed on
+    the full (na,nb) array, in which the C kernel skips the forbidden
+    (alpha-irrep,beta-irrep) blocks; hdiag and the RDMs are computed in the
+    full space as well.  The CI vectors are returned in the full (na,nb)
+    shape.'''
+    neleca, nelecb = nelec
+    na = cistring.num_strings(norb, neleca)
+    nb = cistring.num_strings(norb, nelecb)
+    airreps, birreps = strs_irrep(norb, nelec, fci.orbsym)
+    wfnsym = fci.wfnsym
+    sym_idx = sym_allowed_indices(airreps, birreps, wfnsym)
+    ndet = len(sym_idx)
+    if ndet == 0:
+        raise RuntimeError('No determinant of irrep %s' % wfnsym)
+
+    def unpack(c):
+        ci = numpy.zeros(na*nb)
+        ci[sym_idx] = c
+        return ci.reshape(na,nb)
+
+    hdiag = fci.make_hdiag(h1e, eri, norb, nelec)
+# exclude the determinants of other irreps from pspace
+    hdiag_sym = numpy.empty_like(hdiag)
+    hdiag_sym[:] = numpy.inf
+    hdiag_sym[sym_idx] = hdiag[sym_idx]
+    addr, h0 = fci.pspace(h1e, eri, norb, nelec, hdiag_sym, min(400, ndet))
+    hdiag_sym = None
+    addr = numpy.searchsorted(sym_idx, addr)
+    hdiag = hdiag[sym_idx]
+    pw, pv = scipy.linalg.eigh(h0)
+
+    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
+    threads = getattr(fci, 'threads', None)
+    def hop(c):
+        with pyscf.lib.with_omp_threads(threads):
+            hc = fci.contract_2e(h2e, unpack(c), norb, nelec, link_index,
+                                 wfnsym=wfnsym)
+        return hc.ravel()[sym_idx]
+
+    def project(c):
+        # the guess of other irreps has no component in the irrep wfnsym
+        c = numpy.asarray(c).ravel()
+        if c.size != ndet:
+            c = c[sym_idx]
+        norm = numpy.linalg.norm(c)
+        if norm < 1e-8:
+            return None
+        return c / norm
+
+    nroots = min(getattr(fci, 'nroots', 1), ndet)
+    if nroots > 1:
+        if isinstance(ci0, numpy.ndarray):
+            ci0 = [ci0]
+        if ci0 is not None:
+            ci0 = [x for x in [project(c) for c in ci0] if x is not None]
+            if len(ci0) == 0:
+                ci0 = None
+        e, cis = direct_spin1._kernel_nroots(fci, hop, hdiag, pw, pv, addr,
+                                             (ndet,), nroots, ci0, **kwargs)
+        return e, [unpack(c) for c in cis]
+
+    if not fci.davidson_only:
+        if ndet == 1:
+            return pw[0], unpack(pv[:,0])
+        elif len(addr) == ndet:
+            ci0 = numpy.empty(ndet)
+            ci0[addr] = pv[:,0]
+            if abs(pw[0]-pw[1]) > 1e-12:
+                return pw[0], unpack(ci0)
+
+    precond = fci.make_precond(hdiag, pw, pv, addr)
+
+    if ci0 is not None:
+        if isinstance(ci0, (list, tuple)):
+            ci0 = ci0[0]
+        ci0 = project(ci0)
+    if ci0 is None:
+        ci0 = numpy.zeros(ndet)
+        ci0[numpy.argmin(hdiag)] = 1
+
+    e, c = fci.eig(hop, ci0, precond, **kwargs)
+    return e, unpack(c)
+
+def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, **kwargs):
+# Without wfnsym, the lowest state of all irreps is searched in the full space
+    if not fci.orbsym or fci.wfnsym is None:
+        return direct_spin1.kernel_ms1(fci, h1e, eri, norb, nelec, ci0,
+                                       **kwargs)
+    if isinstance(nelec, int):
+        nelecb = nelec//2
+        neleca = nelec - nelecb
+    else:
+        neleca, nelecb = nelec
+    link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+    link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+    return kernel_sym(fci, h1e, eri, norb, (neleca,nelecb),
+                      (link_indexa,link_indexb), ci0, **kwargs)
+
 
 def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=.001, tol=1e-8,
            lindep=1e-8, max_cycle=50, orbsym=[], **kwargs):
@@ -101,8 +244,7 @@ def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=.001, tol=1e-8,
     cis.conv_tol = tol
     cis.lindep = lindep
     cis.max_cycle = max_cycle
-    return direct_spin1.kernel_ms1(cis, h1e, eri, norb, nelec, ci0=ci0,
-                                   **kwargs)
+    return kernel_ms1(cis, h1e, eri, norb, nelec, ci0=ci0, **kwargs)
 
 # dm_pq = <|p^+ q|>
 def make_rdm1(fcivec, norb, nelec, link_index=None):
@@ -139,8 +281,18 @@ def energy(h1e, eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
 class FCISolver(direct_spin1.FCISolver):
     def __init__(self, mol, **kwargs):
         self.orbsym = []
+        # irrep of the target state.  The Davidson subspace is restricted
+        # to the determinants of this irrep.  If None, the solver works in
+        # the full determinant space and finds the ground state of all irreps
+        self.wfnsym = None
         direct_spin1.FCISolver.__init__(self, mol, **kwargs)
 
+    def dump_flags(self, verbose=None):
+        direct_spin1.FCISolver.dump_flags(self, verbose)
+        log = pyscf.lib.logger.Logger(self.mol.stdout, self.verbose
+                                      if verbose is None else verbose)
+        log.info('wfnsym = %s', self.wfnsym)
+
     def absorb_h1e(self, h1e, eri, norb, nelec, fac=1):
         return direct_spin1.absorb_h1e(h1e, eri, norb, nelec, fac)
 
@@ -159,12 +311,6 @@ class FCISolver(direct_spin1.FCISolver):
             orbsym = self.orbsym
         return contract_2e(eri, fcivec, norb, nelec, link_index, orbsym, **kwargs)
 
-    def eig(self, op, x0, precond, **kwargs):
-        return pyscf.lib.davidson(op, x0, precond, self.conv_tol,
-                                  self.max_cycle, self.max_space, self.lindep,
-                                  self.max_memory, verbose=self.verbose,
-                                  **kwargs)
-
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         return direct_spin1.make_pspace_precond(hdiag, pspaceig, pspaceci, addr,
                                                 self.level_shift)
@@ -174,8 +320,8 @@ class FCISolver(direct_spin1.FCISolver):
 
     def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
         self.mol.check_sanity(self)
-        return direct_spin1.kernel_ms1(self, h1e, eri, norb, nelec, ci0,
-                                       **kwargs)
+        e, c = kernel_ms1(self, h1e, eri, norb, nelec, ci0, **kwargs)
+        return self._kernel_rdm12(h1e, eri, norb, nelec, e, c)
 
     def energy(self, h1e, eri, fcivec, norb, nelec, link_index=None):
         h2e = self.absorb_h1e(h1e, eri, norb, nelec, .5)
@@ -192,6 +338,9 @@ class FCISolver(direct_spin1.FCISolver):
         return direct_spin1.make_rdm12s(fcivec, norb, nelec, link_index)
 
     def make_rdm12(self, fcivec, norb, nelec, link_index=None, **kwargs):
+        saved = self._saved_rdm12(fcivec, norb)
+        if saved is not None:
+            return saved
         return direct_spin1.make_rdm12(fcivec, norb, nelec, link_index)
 
     def trans_rdm1s(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
@@ -130,6 +130,49 @@ def make_rdm12_spin1(fname, cibra, ciket, norb, nelec, link_index=None, symm=0):
                         ctypes.c_int(symm))
     return rdm1, rdm2
 
+# Spin-traced transition density matrices of all pairs (bras[i], kets[j]) in
+# one pass.  Returns dm1[i,j] and dm2[i,j] in the same order as
+# make_rdm12_spin1 (call reorder_rdm for each pair to get the normal rdm2)
+def make_trans_rdm12_batch(bras, kets, norb, nelec, link_index=None,
+                           with_rdm2=True):
+    if isinstance(nelec, int):
+        neleca = nelecb = nelec//2
+    else:
+        neleca, nelecb = nelec
+    if link_index is None:
+        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
+        link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+    else:
+        link_indexa, link_indexb = link_index
+    na,nlinka = link_indexa.shape[:2]
+    nb,nlinkb = link_indexb.shape[:2]
+    bras = numpy.asarray([numpy.asarray(c).ravel() for c in bras], order='C')
+    kets = numpy.asarray([numpy.asarray(c).ravel() for c in kets], order='C')
+    nbra = bras.shape[0]
+    nket = kets.shape[0]
+    nnorb = norb * norb
+    rdm1 = numpy.empty((nbra,nket,norb,norb))
+    if with_rdm2:
+        rdm2 = numpy.empty((nbra,norb,norb,nket,nnorb))
+    else:
+        rdm2 = numpy.empty(0)
+    librdm.FCItdm12_batch_drv(rdm1.ctypes.data_as(ctypes.c_void_p),
+                              rdm2.ctypes.data_as(ctypes.c_void_p),
+                              bras.ctypes.data_as(ctypes.c_void_p),
+                              kets.ctypes.data_as(ctypes.c_void_p),
+                              ctypes.c_int(nbra), ctypes.c_int(nket),
+                              ctypes.c_int(norb),
+                              ctypes.c_int(na), ctypes.c_int(nb),
+                              ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                              link_indexa.ctypes.data_as(ctypes.c_void_p),
+                              link_indexb.ctypes.data_as(ctypes.c_void_p),
+                              ctypes.c_int(with_rdm2))
+    if not with_rdm2:
+        return rdm1, None
+    # swap the cre/des indices of the bra, see _transpose_jikl
+    rdm2 = numpy.ascontiguousarray(rdm2.transpose(0,3,2,1,4))
+    return rdm1, rdm2.reshape(nbra,nket,norb,norb,norb,norb)
+
 
 ##############################
 #
@@ -164,32 +207,24 @@ def _complete_dm3_(dm2, dm3):
 # fci_4pdm.c assumed symmetry p >= r >= t for 3-pdm <p^+ q r^+ s t^+ u>
 # Using E^r_sE^p_q = E^p_qE^r_s - \delta_{qr}E^p_s + \delta_{ps}E^r_q to
 # complete the full 3-pdm
-    def transpose01(ijk, i, j, k):
-        jik = ijk.transpose(1,0,2)
-        jik[:,j] -= dm2[i,:,k,:]
-        jik[i,:] += dm2[j,:,k,:]
-        dm3[j,:,i,:,k,:] = jik
-        return jik
-    def transpose12(ijk, i, j, k):
-        ikj = ijk.transpose(0,2,1)
-        ikj[:,:,k] -= dm2[i,:,j,:]
-        ikj[:,j,:] += dm2[i,:,k,:]
-        dm3[i,:,k,:,j,:] = ikj
-        return ikj
-
-# ijk -> jik -> jki -> kji -> kij -> ikj
     norb = dm2.shape[0]
-    for i in range(norb):
-        for j in range(i+1):
-            for k in range(j+1):
-                tmp = transpose01(dm3[i,:,j,:,k,:].copy(), i, j, k)
-                tmp = transpose12(tmp, j, i, k)
-                tmp = transpose01(tmp, j, k, i)
-                tmp = transpose12(tmp, k, j, i)
-                tmp = transpose01(tmp, k, i, j)
+    librdm.FCIcomplete_dm3(dm2.ctypes.data_as(ctypes.c_void_p),
+                           dm3.ctypes.data_as(ctypes.c_void_p),
+                           ctypes.c_int(norb))
     return dm3
 
-def make_dm1234(fcivec, norb, nelec):
+# The 4-pdm dm4[p,q,r,s,t,u,v,w] = <p^+ q r^+ s t^+ u v^+ w> is returned in
+# the packed blocks dm4[p,:,r,:,t,:,v,:] of p >= r >= t >= v, which is an
+# array of shape (dm4_nblk(norb),norb,norb,norb,norb).
+#       packed[dm4_block_id(p,r,t,v)][q,s,u,w] = dm4[p,q,r,s,t,u,v,w]
+# The other blocks are not copies of these blocks.  They are generated with
+# E^r_sE^p_q = E^p_qE^r_s - \delta_{qr}E^p_s + \delta_{ps}E^r_q, which involves
+# the 3-pdm.  unpack_dm4 (or dense=True) gives the full norb**8 4-pdm.
+#
+# If dm4file is given, the 4-pdm is generated in this file (.npy format) through
+# a memory map, rather than in memory.  The blocks of the 4-pdm can be read
+# later with numpy.load(dm4file, mmap_mode='r')
+def make_dm1234(fcivec, norb, nelec, dm4file=None, dense=False):
     if isinstance(nelec, int):
         neleca = nelecb = nelec//2
     else:
@@ -200,7 +235,12 @@ def make_dm1234(fcivec, norb, nelec):
     rdm1 = numpy.empty((norb,)*2)
     rdm2 = numpy.empty((norb,)*4)
     rdm3 = numpy.empty((norb,)*6)
-    rdm4 = numpy.empty((norb,)*8)
+    if dm4file is None or dense:
+        rdm4 = numpy.empty((dm4_nblk(norb),)+(norb,)*4)
+    else:
+        rdm4 = numpy.lib.format.open_memmap(dm4file, mode='w+',
+                                            dtype=numpy.double,
+                                            shape=(dm4_nblk(norb),)+(norb,)*4)
     kernel = _ctypes.dlsym(librdm._handle, 'FCI4pdm_kern_spin0')
     librdm.FCIrdm4_drv(ctypes.c_void_p(kernel),
                        rdm1.ctypes.data_as(ctypes.c_void_p),
@@ -215,55 +255,38 @@ def make_dm1234(fcivec, norb, nelec):
                        link_index.ctypes.data_as(ctypes.c_void_p),
                        link_index.ctypes.data_as(ctypes.c_void_p))
     rdm3 = _complete_dm3_(rdm2, rdm3)
-    rdm4 = _complete_dm4_(rdm3, rdm4)
+    if dense:
+        if dm4file is None:
+            out = None
+        else:
+            out = numpy.lib.format.open_memmap(dm4file, mode='w+',
+                                               dtype=numpy.double,
+                                               shape=(norb,)*8)
+        rdm4 = unpack_dm4(rdm3, rdm4, out)
+    if dm4file is not None:
+        rdm4.flush()
     return rdm1, rdm2, rdm3, rdm4
-def _complete_dm4_(dm3, dm4):
-# fci_4pdm.c assumed symmetry p >= r >= t >= v for 4-pdm <p^+ q r^+ s t^+ u v^+ w>
-# Using E^r_sE^p_q = E^p_qE^r_s - \delta_{qr}E^p_s + \delta_{ps}E^r_q to
-# complete the full 4-pdm
-    def transpose01(ijkl, i, j, k, l):
-        jikl = ijkl.transpose(1,0,2,3)
-        jikl[:,j] -= dm3[i,:,k,:,l,:]
-        jikl[i,:] += dm3[j,:,k,:,l,:]
-        dm4[j,:,i,:,k,:,l,:] = jikl
-        return jikl
-    def transpose12(ijkl, i, j, k, l):
-        ikjl = ijkl.transpose(0,2,1,3)
-        ikjl[:,:,k] -= dm3[i,:,j,:,l,:]
-        ikjl[:,j,:] += dm3[i,:,k,:,l,:]
-        dm4[i,:,k,:,j,:,l,:] = ikjl
-        return ikjl
-    def transpose23(ijkl, i, j, k, l):
-        ijlk = ijkl.transpose(0,1,3,2)
-        ijlk[:,:,:,l] -= dm3[i,:,j,:,k,:]
-        ijlk[:,:,k,:] += dm3[i,:,j,:,l,:]
-        dm4[i,:,j,:,l,:,k,:] = ijlk
-        return ijlk
-    def chain(ijkl, i, j, k, l):
-        tmp = transpose23(ijkl, i, j, k, l)
-        tmp = transpose12(tmp, i, j, l, k)
-        tmp = transpose23(tmp, i, l, j, k)
-        tmp = transpose12(tmp, i, l, k, j)
-        tmp = transpose23(tmp, i, k, l, j)
-        return tmp
 
-# ijkl -> ijlk -> iljk -> ilkj -> iklj -> ikjl
-#      -> jikl -> jilk -> jlik -> jlki -> jkli -> jkil
-#(ikjl)-> kijl -> kilj -> klij -> klji -> kjli -> kjil
-#(iljk)-> lijk -> likj -> lkij -> lkji -> ljki -> ljik
+# Number of the packed blocks of the 4-pdm
+def dm4_nblk(norb):
+    return dm4_block_id(norb, 0, 0, 0)
+
+# Index of the block dm4[p,:,r,:,t,:,v,:] in the packed 4-pdm, p >= r >= t >= v
+def dm4_block_id(p, r, t, v):
+    assert(p >= r >= t >= v)
+    return (p+3)*(p+2)*(p+1)*p//24 + (r+2)*(r+1)*r//6 + (t+1)*t//2 + v
+
+# Expand the packed 4-pdm of make_dm1234 to the full norb**8 4-pdm
+def unpack_dm4(dm3, dm4, out=None):
     norb = dm3.shape[0]
-    for i in range(norb):
-        for k in range(i+1):
-            for j in range(k+1):
-                for l in range(j+1):
-                    tmp = chain(dm4[i,:,j,:,k,:,l,:].copy(), i, j, k, l)
-                    tmp = transpose01(tmp, i, k, j, l)
-                    tmp = chain(tmp, k, i, j, l)
-                    tmp = transpose01(dm4[i,:,j,:,k,:,l,:].copy(), i, j, k, l)
-                    tmp = chain(tmp, j, i, k, l)
-                    tmp = transpose01(dm4[i,:,l,:,j,:,k,:].copy(), i, l, j, k)
-                    tmp = chain(tmp, l, i, j, k)
-    return dm4
+    dm4 = numpy.asarray(dm4, order='C')
+    if out is None:
+        out = numpy.empty((norb,)*8)
+    librdm.FCIunpack_dm4(dm3.ctypes.data_as(ctypes.c_void_p),
+                         dm4.ctypes.data_as(ctypes.c_void_p),
+                         out.ctypes.data_as(ctypes.c_void_p),
+                         ctypes.c_int(norb))
+    return out
 
 # <p^+ q r^+ s t^+ u> => <p^+ r^+ t^+ u s q>
 # rdm2 is the (reordered) standard 2-pdm
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+#
+# Selected CI for arbitary number of alpha and beta electrons, based on
+# RHF/ROHF MO integrals.
+#
+# The CI space is the direct product of a set of selected alpha strings and a
+# set of selected beta strings.  The CI vector is a (na_selected,nb_selected)
+# matrix, which carries the (sorted) strings in the attribute _strs.  The
+# strings are selected with the heat-bath criterion: the string
+# str1 = E_{ai} str0 (or E_{ai}E_{bj} str0) is added to the space when
+# |h_{ai}| * max|c(str0)| (or |(ai|bj)-(aj|bi)| * max|c(str0)|) is larger than
+# select_cutoff.  The space is enlarged and the Hamiltonian is diagonalized
+# alternately until the energy converges.
+#
+# The sigma vector and the density matrices are computed by the kernels of
+# direct_spin1.  The link tables of the selected strings skip the
+# excitations which leave the selected space.
+#
+
+import sys
+import ctypes
+import numpy
+import pyscf.lib
+import pyscf.lib.logger
+import pyscf.ao2mo
+from pyscf.fci import cistring
+from pyscf.fci import direct_spin1
+
+libfci = pyscf.lib.load_library('libmcscf')
+
+class SCIvector(numpy.ndarray):
+    '''CI vector of selected CI.  _strs = (alpha strings, beta strings)'''
+    def __array_finalize__(self, obj):
+        self._strs = getattr(obj, '_strs', None)
+
+def as_SCIvector(civec, ci_strs):
+    civec = numpy.asarray(civec).view(SCIvector)
+    civec._strs = ci_strs
+    return civec
+
+def gen_linkstr_index(strs, norb, nocc, trilidx=False):
+    '''Link table of the selected (sorted) strings, see
+    cistring.gen_linkstr_index.  The excitations out of the selected strings
+    are dropped and the table of each string is padded with zeros.'''
+    strs = numpy.asarray(strs, dtype=numpy.uint64)
+    nstrs = len(strs)
+    nvir = norb - nocc
+    link_index = numpy.empty((nstrs,nocc*nvir+nocc,4), dtype=numpy.int32)
+    libfci.FCIselect_linkstr_index(link_index.ctypes.data_as(ctypes.c_void_p),
+                                   ctypes.c_int(norb), ctypes.c_int(nstrs),
+                                   ctypes.c_int(nocc),
+                                   strs.ctypes.data_as(ctypes.c_void_p),
+                                   ctypes.c_int(trilidx))
+    return link_index
+
+def _all_linkstr_index(ci_strs, norb, nelec, trilidx=False):
+    neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+    link_indexa = gen_linkstr_index(ci_strs[0], norb, neleca, trilidx)
+    if ci_strs[1] is ci_strs[0] and nelecb == neleca:
+        link_indexb = link_indexa
+    else:
+        link_indexb = gen_linkstr_index(ci_strs[1], norb, nelecb, trilidx)
+    return link_indexa, link_indexb
+
+def _as_2d(civec_strs):
+    strsa, strsb = civec_strs._strs
+    return numpy.asarray(civec_strs).reshape(len(strsa),len(strsb))
+
+def contract_1e(f1e, civec_strs, norb, nelec, link_index=None):
+    ci_strs = civec_strs._strs
+    if link_index is None:
+        link_index = _all_linkstr_index(ci_strs, norb, nelec, True)
+    ci1 = direct_spin1.contract_1e(f1e, _as_2d(civec_strs), norb, nelec,
+                                   link_index)
+    return as_SCIvector(ci1, ci_strs)
+
+def contract_2e(eri, civec_strs, norb, nelec, link_index=None):
+    ci_strs = civec_strs._strs
+    if link_index is None:
+        link_index = _all_linkstr_index(ci_strs, norb, nelec, True)
+    ci1 = direct_spin1.contract_2e(eri, _as_2d(civec_strs), norb, nelec,
+                                   link_index)
+    return as_SCIvector(ci1, ci_strs)
+
+def make_hdiag(h1e, eri, ci_strs, norb, nelec):
+    neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+    h1e = numpy.ascontiguousarray(h1e)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    occslista = cistring._strs2occslst(ci_strs[0], norb, neleca)
+    occslistb = cistring._strs2occslst(ci_strs[1], norb, nelecb)
+    na = len(occslista)
+    nb = len(occslistb)
+    hdiag = numpy.empty(na*nb)
+    jdiag = numpy.einsum('iijj->ij',eri).copy('C')
+    kdiag = numpy.einsum('ijji->ij',eri).copy('C')
+    libfci.FCImake_hdiag_uhf(hdiag.ctypes.data_as(ctypes.c_void_p),
+                             h1e.ctypes.data_as(ctypes.c_void_p),
+                             h1e.ctypes.data_as(ctypes.c_void_p),
+                             jdiag.ctypes.data_as(ctypes.c_void_p),
+                             jdiag.ctypes.data_as(ctypes.c_void_p),
+                             jdiag.ctypes.data_as(ctypes.c_void_p),
+                             kdiag.ctypes.data_as(ctypes.c_void_p),
+                             kdiag.ctypes.data_as(ctypes.c_void_p),
+                             ctypes.c_int(norb),
+                             ctypes.c_int(na), ctypes.c_int(nb),
+                             ctypes.c_int(neleca), ctypes.c_int(nelecb),
+                             occslista.ctypes.data_as(ctypes.c_void_p),
+                             occslistb.ctypes.data_as(ctypes.c_void_p))
+    return hdiag
+
+def select_strs(strs, weights, h1e, eri, norb, nelec, select_cutoff):
+    '''The strings which are connected to strs by a single or double
+    excitation of which |h_{ai}| * weight or |(ai|bj)-(aj|bi)| * weight is
+    larger than select_cutoff.  For the single excitations, h_{ai} is taken
+    as the largest of the Fock-like matrix element of str0 and the opposite
+    spin double excitation amplitudes max_{bj}|(ai|bj)|.'''
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    eri_ai = abs(eri).reshape(norb,norb,-1).max(axis=2)
+    hmax = abs(h1e).max() + abs(eri).max() * (nelec+2)
+    bits = numpy.uint64(1) << numpy.arange(norb, dtype=numpy.uint64)
+    occslst = cistring._strs2occslst(strs, norb, nelec)
+    new_strs = [numpy.asarray(strs, dtype=numpy.uint64)]
+    for k, str0 in enumerate(numpy.asarray(strs, dtype=numpy.uint64)):
+        if weights[k] * hmax < select_cutoff:
+            continue
+        occ = occslst[k]
+        vir = numpy.where((str0 & bits) == 0)[0]
+        if len(vir) == 0 or len(occ) == 0:
+            continue
+
+        vooo = eri[numpy.ix_(vir,occ,occ,occ)]
+        fai = (h1e[numpy.ix_(vir,occ)] + numpy.einsum('aikk->ai', vooo)
+               - numpy.einsum('akki->ai', vooo))
+        hai = numpy.maximum(abs(fai), eri_ai[numpy.ix_(vir,occ)])
+        a, i = numpy.where(hai * weights[k] > select_cutoff)
+        new_strs.append((str0 ^ bits[occ[i]]) | bits[vir[a]])
+
+        if len(occ) > 1 and len(vir) > 1:
+            vovo = eri[numpy.ix_(vir,occ,vir,occ)]
+            vovo = abs(vovo - vovo.transpose(0,3,2,1))
+            a, i, b, j = numpy.where(vovo * weights[k] > select_cutoff)
+            mask = (a < b) & (i < j)
+            a, i, b, j = a[mask], i[mask], b[mask], j[mask]
+            new_strs.append((str0 ^ bits[occ[i]] ^ bits[occ[j]])
+                            | bits[vir[a]] | bits[vir[b]])
+    return numpy.unique(numpy.hstack(new_strs))
+
+def enlarge_space(myci, civec_strs, h1e, eri, norb, nelec):
+    '''Add the strings selected from the (list of) CI vectors to the space.
+    Return the enlarged (alpha strings, beta strings)'''
+    if isinstance(civec_strs, (tuple, list)):
+        ci_strs = civec_strs[0]._strs
+        cimax = numpy.max([abs(_as_2d(c)) for c in civec_strs], axis=0)
+    else:
+        ci_strs = civec_strs._strs
+        cimax = abs(_as_2d(civec_strs))
+    neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    strsa = select_strs(ci_strs[0], cimax.max(axis=1), h1e, eri, norb, neleca,
+                        myci.select_cutoff)
+    strsb = select_strs(ci_strs[1], cimax.max(axis=0), h1e, eri, norb, nelecb,
+                        myci.select_cutoff)
+    if neleca == nelecb:
+        # keep the same alpha and beta strings for the spin symmetry
+        strsa = strsb = numpy.union1d(strsa, strsb)
+    return strsa, strsb
+
+def _expand_civec(civec_strs, ci_strs):
+    '''Put the CI vector in a space which includes all its strings'''
+    stra0, strb0 = civec_strs._strs
+    ia = numpy.searchsorted(ci_strs[0], stra0)
+    ib = numpy.searchsorted(ci_strs[1], strb0)
+    ci1 = numpy.zeros((len(ci_strs[0]),len(ci_strs[1])))
+    ci1[ia[:,None],ib] = _as_2d(civec_strs)
+    return as_SCIvector(ci1, ci_strs)
+
+def to_fci(civec_strs, norb, nelec):
+    '''Transform the selected CI vector to the full CI vector'''
+    neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+    strsa, strsb = civec_strs._strs
+    na = cistring.num_strings(norb, neleca)
+    nb = cistring.num_strings(norb, nelecb)
+    addra = cistring.strs2addr(norb, neleca, strsa)
+    addrb = cistring.strs2addr(norb, nelecb, strsb)
+    fcivec = numpy.zeros((na,nb))
+    fcivec[addra[:,None],addrb] = _as_2d(civec_strs)
+    return fcivec
+
+
+def make_rdm1s(civec_strs, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(civec_strs._strs, norb, nelec)
+    return direct_spin1.make_rdm1s(_as_2d(civec_strs), norb, nelec, link_index)
+
+def make_rdm1(civec_strs, norb, nelec, link_index=None):
+    rdm1a, rdm1b = make_rdm1s(civec_strs, norb, nelec, link_index)
+    return rdm1a + rdm1b
+
+def make_rdm12s(civec_strs, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(civec_strs._strs, norb, nelec)
+    return direct_spin1.make_rdm12s(_as_2d(civec_strs), norb, nelec,
+                                    link_index)
+
+def make_rdm12(civec_strs, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(civec_strs._strs, norb, nelec)
+    return direct_spin1.make_rdm12(_as_2d(civec_strs), norb, nelec,
+                                   link_index)
+
+# cibra and ciket must be defined on the same strings
+def trans_rdm1s(cibra, ciket, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(ciket._strs, norb, nelec)
+    return direct_spin1.trans_rdm1s(_as_2d(cibra), _as_2d(ciket), norb, nelec,
+                                    link_index)
+
+def trans_rdm1(cibra, ciket, norb, nelec, link_index=None):
+    rdm1a, rdm1b = trans_rdm1s(cibra, ciket, norb, nelec, link_index)
+    return rdm1a + rdm1b
+
+def trans_rdm12s(cibra, ciket, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(ciket._strs, norb, nelec)
+    return direct_spin1.trans_rdm12s(_as_2d(cibra), _as_2d(ciket), norb,
+                                     nelec, link_index)
+
+def trans_rdm12(cibra, ciket, norb, nelec, link_index=None):
+    if link_index is None:
+        link_index = _all_linkstr_index(ciket._strs, norb, nelec)
+    return direct_spin1.trans_rdm12(_as_2d(cibra), _as_2d(ciket), norb,
+                                    nelec, link_index)
+
+
+###############################################################
+# selected-CI driver
+###############################################################
+
+def kernel_fixed_space(myci, h1e, eri, norb, nelec, ci_strs, ci0=None,
+                       **kwargs):
+    '''Diagonalize the Hamiltonian in the space of ci_strs.  ci0 can be
+    the (list of) CI vectors of a smaller space.'''
+    nelec = direct_spin1._unpack_nelec(nelec)
+    na = len(ci_strs[0])
+    nb = len(ci_strs[1])
+    h2e = direct_spin1.absorb_h1e(h1e, eri, norb, nelec, .5)
+    link_index = _all_linkstr_index(ci_strs, norb, nelec, True)
+    hdiag = myci.make_hdiag_sci(h1e, eri, ci_strs, norb, nelec)
+    def hop(c):
+        with pyscf.lib.with_omp_threads(myci.threads):
+            hc = direct_spin1.contract_2e(h2e, c, norb, nelec, link_index)
+        return hc.ravel()
+    precond = direct_spin1.make_diag_precond(hdiag, myci.level_shift)
+
+    nroots = min(myci.nroots, na*nb)
+    if ci0 is None:
+        ci0 = []
+    elif isinstance(ci0, numpy.ndarray):
+        ci0 = [ci0]
+    x0 = [_expand_civec(c, ci_strs).ravel() for c in ci0[:nroots]]
+    for i in numpy.argsort(hdiag):
+        if len(x0) >= nroots:
+            break
+        if all([abs(x[i]) < 1e-4 for x in x0]):
+            x = numpy.zeros(na*nb)
+            x[i] = 1
+            x0.append(x)
+
+    if nroots > 1:
+        e, c = myci.eig(hop, x0, precond, nroots=nroots, **kwargs)
+        return e, [as_SCIvector(x.reshape(na,nb), ci_strs) for x in c]
+    else:
+        e, c = myci.eig(hop, x0[0], precond, **kwargs)
+        return e, as_SCIvector(c.reshape(na,nb), ci_strs)
+
+def kernel_float_space(myci, h1e, eri, norb, nelec, ci0=None, **kwargs):
+    '''Enlarge the space and diagonalize the Hamiltonian alternately, until
+    the energy changes less than conv_tol or the space stops growing.'''
+    log = pyscf.lib.logger.Logger(getattr(myci.mol, 'stdout', sys.stdout),
+                                  myci.verbose)
+    neleca, nelecb = nelec = direct_spin1._unpack_nelec(nelec)
+    h1e = numpy.ascontiguousarray(h1e)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+
+    if isinstance(ci0, (tuple, list)):
+        ci_strs = getattr(ci0[0], '_strs', None)
+    else:
+        ci_strs = getattr(ci0, '_strs', None)
+    if ci_strs is None:
+        # start from the reference determinant
+        ci_strs = (numpy.asarray([(1<<neleca)-1], dtype=numpy.uint64),
+                   numpy.asarray([(1<<nelecb)-1], dtype=numpy.uint64))
+        ci0 = as_SCIvector(numpy.ones((1,1)), ci_strs)
+
+    if myci.max_select_cycle < 1:
+        # no selection, diagonalize in the space of ci0
+        return kernel_fixed_space(myci, h1e, eri, norb, nelec, ci_strs, ci0,
+                                  **kwargs)
+
+    e_last = None
+    ndet_last = 0
+    for icycle in range(myci.max_select_cycle):
+        ci_strs = enlarge_space(myci, ci0, h1e, eri, norb, nelec)
+        ndet = len(ci_strs[0]) * len(ci_strs[1])
+        if ndet == ndet_last:
+            log.debug('Selected space does not change')
+            break
+        e, ci0 = kernel_fixed_space(myci, h1e, eri, norb, nelec, ci_strs, ci0,
+                                    **kwargs)
+        if e_last is None:
+            de = e
+        else:
+            de = numpy.max(abs(numpy.asarray(e) - e_last))
+        log.info('SCI cycle %d  ndet = %d  E = %s  dE = %.8g',
+                 icycle, ndet, e, de)
+        if e_last is not None and de < myci.conv_tol:
+            break
+        e_last = numpy.asarray(e)
+        ndet_last = ndet
+    return e, ci0
+
+
+class SelectedCI(direct_spin1.FCISolver):
+    def __init__(self, mol=None):
+        # the threshold of |h_{ai}| * |c| to select the excited strings
+        self.select_cutoff = 1e-3
+        # max. number of the enlarge-diagonalize cycles
+        self.max_select_cycle = 20
+        # strings of the last solution, for the vectors which lose the
+        # attribute _strs (eg created by numpy functions)
+        self._strs = None
+        direct_spin1.FCISolver.__init__(self, mol)
+
+    def dump_flags(self, verbose=None):
+        direct_spin1.FCISolver.dump_flags(self, verbose)
+        log = pyscf.lib.logger.Logger(self.mol.stdout, self.verbose
+                                      if verbose is None else verbose)
+        log.info('select_cutoff = %g', self.select_cutoff)
+        log.info('max_select_cycle = %d', self.max_select_cycle)
+
+    def _as_SCIvector(self, civec):
+        if getattr(civec, '_strs', None) is None:
+            return as_SCIvector(civec, self._strs)
+        else:
+            return civec
+
+    def contract_1e(self, f1e, civec, norb, nelec, link_index=None, **kwargs):
+        return contract_1e(f1e, self._as_SCIvector(civec), norb, nelec,
+                           link_index)
+
+    def contract_2e(self, eri, civec, norb, nelec, link_index=None, **kwargs):
+        return contract_2e(eri, self._as_SCIvector(civec), norb, nelec,
+                           link_index)
+
+    def make_hdiag_sci(self, h1e, eri, ci_strs, norb, nelec):
+        return make_hdiag(h1e, eri, ci_strs, norb, nelec)
+
+    def enlarge_space(self, civec, h1e, eri, norb, nelec):
+        return enlarge_space(self, civec, h1e, eri, norb, nelec)
+
+    def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
+        if self.mol is not None:
+            self.mol.check_sanity(self)
+        if self._strs is not None:
+            ndet = len(self._strs[0]) * len(self._strs[1])
+            if isinstance(ci0, (tuple, list)):
+                if all([c.size == ndet for c in ci0]):
+                    ci0 = [self._as_SCIvector(c) for c in ci0]
+            elif ci0 is not None and ci0.size == ndet:
+                ci0 = self._as_SCIvector(ci0)
+        e, c = kernel_float_space(self, h1e, eri, norb, nelec, ci0, **kwargs)
+        if isinstance(c, (tuple, list)):
+            self._strs = c[0]._strs
+        else:
+            self._strs = c._strs
+        return e, c
+
+    def make_rdm1s(self, civec, norb, nelec, link_index=None, **kwargs):
+        return make_rdm1s(self._as_SCIvector(civec), norb, nelec, link_index)
+
+    def make_rdm1(self, civec, norb, nelec, link_index=None, **kwargs):
+        return make_rdm1(self._as_SCIvector(civec), norb, nelec, link_index)
+
+    def make_rdm12s(self, civec, norb, nelec, link_index=None, **kwargs):
+        return make_rdm12s(self._as_SCIvector(civec), norb, nelec, link_index)
+
+    def make_rdm12(self, civec, norb, nelec, link_index=None, **kwargs):
+        return make_rdm12(self._as_SCIvector(civec), norb, nelec, link_index)
+
+    def trans_rdm1s(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm1s(self._as_SCIvector(cibra), self._as_SCIvector(ciket),
+                           norb, nelec, link_index)
+
+    def trans_rdm1(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm1(self._as_SCIvector(cibra), self._as_SCIvector(ciket),
+                          norb, nelec, link_index)
+
+    def trans_rdm12s(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm12s(self._as_SCIvector(cibra), self._as_SCIvector(ciket),
+                            norb, nelec, link_index)
+
+    def trans_rdm12(self, cibra, ciket, norb, nelec, link_index=None, **kwargs):
+        return trans_rdm12(self._as_SCIvector(cibra), self._as_SCIvector(ciket),
+                           norb, nelec, link_index)
+
+SCI = SelectedCI
+
+
+if __name__ == '__main__':
+    from functools import reduce
+    from pyscf import gto
+    from pyscf import scf
+    from pyscf import ao2mo
+
+    mol = gto.Mole()
+    mol.verbose = 0
+    mol.output = None
+    mol.atom = [
+        ['H', ( 1.,-1.    , 0.   )],
+        ['H', ( 0.,-1.    ,-1.   )],
+        ['H', ( 1.,-0.5   ,-1.   )],
+        ['H', ( 0.,-0.    ,-1.   )],
+        ['H', ( 1.,-0.5   , 0.   )],
+        ['H', ( 0., 1.    , 1.   )],
+    ]
+    mol.basis = {'H': 'sto-3g'}
+    mol.build()
+
+    m = scf.RHF(mol)
+    m.scf()
+
+    norb = m.mo_coeff.shape[1]
+    nelec = mol.nelectron
+    h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+    eri = ao2mo.incore.full(m._eri, m.mo_coeff)
+
+    e1 = SelectedCI(mol).kernel(h1e, eri, norb, nelec)[0]
+    e2 = direct_spin1.kernel(h1e, eri, norb, nelec)[0]
+    print(e1, e1 - e2)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import unittest
+import itertools
 import numpy
 from pyscf import fci
 
@@ -28,6 +29,19 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(numpy.all(idx1[:,:,2:] == idx2[:,:,2:]))
         self.assertTrue(numpy.all(idx23 == idx2[3]))
 
+    def test_linkstr_index_cache(self):
+        fci.cistring.clear_link_index_cache()
+        idx1 = fci.cistring.gen_linkstr_index(range(6), 3)
+        idx2 = fci.cistring.gen_linkstr_index(range(6), 3)
+        self.assertTrue(idx1 is idx2)
+        self.assertFalse(idx1.flags.writeable)
+        strs = fci.cistring.gen_strings4orblist(range(6), 3)
+        idx3 = fci.cistring.gen_linkstr_index(range(6), 3, strs)
+        self.assertTrue(numpy.all(idx1 == idx3))
+        idx4 = fci.cistring.gen_linkstr_index_trilidx(range(6), 3)
+        self.assertTrue(idx4 is not idx1)
+        self.assertTrue(numpy.all(idx4[:,:,2:] == idx1[:,:,2:]))
+
     def test_addr2str(self):
         self.assertEqual(bin(fci.cistring.addr2str(6, 3, 7)), '0b11001')
         self.assertEqual(bin(fci.cistring.addr2str(6, 3, 8)), '0b11010')
@@ -58,6 +72,21 @@ class KnowValues(unittest.TestCase):
                 [[ 2, 3, 3,-1], [ 3, 6, 2, 1]]],
         self.assertTrue(numpy.allclose(idx, idx0))
 
+    def test_vectorized_addr2str(self):
+        strs = fci.cistring.make_strings(range(8), 4)
+        self.assertEqual(strs.dtype, numpy.uint64)
+        ref = sorted([sum([1<<i for i in c])
+                      for c in itertools.combinations(range(8), 4)])
+        self.assertEqual(strs.tolist(), ref)
+        addrs = numpy.arange(len(strs))
+        self.assertTrue(numpy.all(fci.cistring.addr2str(8, 4, addrs) == strs))
+        self.assertTrue(numpy.all(fci.cistring.str2addr(8, 4, strs) == addrs))
+        self.assertEqual(fci.cistring.addr2str(8, 4, 9), strs[9])
+        signs = fci.cistring.parity(strs[:20], strs[20:40])
+        ref = [fci.cistring.parity(int(s0), int(s1))
+               for s0, s1 in zip(strs[:20], strs[20:40])]
+        self.assertEqual(signs.tolist(), ref)
+
 
 if __name__ == "__main__":
     print("Full Tests for CI string")
@@ -1,5 +1,6 @@
 from functools import reduce
 import unittest
+import tempfile
 import numpy
 from pyscf import gto
 from pyscf import scf
@@ -28,7 +29,30 @@ class KnowValues(unittest.TestCase):
 
     def test_dm4(self):
         dm4ref = make_dm4_o0(ci0, norb, nelec)
-        dm4 = fci.rdm.make_dm1234(ci0, norb, nelec)[3]
+        dm4 = fci.rdm.make_dm1234(ci0, norb, nelec, dense=True)[3]
+        self.assertTrue(numpy.allclose(dm4ref, dm4))
+
+        dm3, dm4 = fci.rdm.make_dm1234(ci0, norb, nelec)[2:]
+        self.assertEqual(dm4.shape, (fci.rdm.dm4_nblk(norb),)+(norb,)*4)
+        for p in range(norb):
+            for r in range(p+1):
+                for t in range(r+1):
+                    for v in range(t+1):
+                        k = fci.rdm.dm4_block_id(p, r, t, v)
+                        self.assertTrue(numpy.allclose(dm4ref[p,:,r,:,t,:,v,:],
+                                                       dm4[k]))
+        self.assertTrue(numpy.allclose(dm4ref, fci.rdm.unpack_dm4(dm3, dm4)))
+
+        ftmp = tempfile.NamedTemporaryFile(suffix='.npy')
+        fci.rdm.make_dm1234(ci0, norb, nelec, ftmp.name)
+        dm4p = numpy.load(ftmp.name, mmap_mode='r')
+        k = fci.rdm.dm4_block_id(4, 2, 1, 1)
+        self.assertTrue(numpy.allclose(dm4ref[4,:,2,:,1,:,1,:], dm4p[k]))
+        self.assertTrue(numpy.allclose(dm4, dm4p))
+
+        fci.rdm.make_dm1234(ci0, norb, nelec, ftmp.name, dense=True)
+        dm4 = numpy.load(ftmp.name, mmap_mode='r')
+        self.assertTrue(numpy.allclose(dm4ref[2,:,1], dm4[2,:,1]))
         self.assertTrue(numpy.allclose(dm4ref, dm4))
 
     def test_tdm2(self):
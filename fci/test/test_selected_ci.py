@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import unittest
+from functools import reduce
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf import ao2mo
+from pyscf import fci
+from pyscf import mcscf
+from pyscf.fci import selected_ci
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = None
+mol.atom = [
+    ['H', ( 1.,-1.    , 0.   )],
+    ['H', ( 0.,-1.    ,-1.   )],
+    ['H', ( 0.,-0.5   ,-0.   )],
+    ['H', ( 0.,-0.    ,-1.   )],
+    ['H', ( 1.,-0.5   , 0.   )],
+    ['H', ( 0., 1.    , 1.   )],
+]
+
+mol.basis = {'H': 'sto-3g'}
+mol.build()
+
+m = scf.RHF(mol)
+ehf = m.scf()
+
+norb = m.mo_coeff.shape[1]
+nelec = (mol.nelectron//2, mol.nelectron//2)
+h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+g2e = ao2mo.incore.general(m._eri, (m.mo_coeff,)*4, compact=False)
+strsa = fci.cistring.make_strings(range(norb), nelec[0])[[0,1,3,6,8,12,17]]
+strsb = fci.cistring.make_strings(range(norb), nelec[1])[[0,2,4,5,9,11]]
+numpy.random.seed(1)
+civec = selected_ci.as_SCIvector(numpy.random.random((len(strsa),len(strsb))),
+                                 (strsa,strsb))
+
+class KnowValues(unittest.TestCase):
+    def test_contract(self):
+        addra = fci.cistring.strs2addr(norb, nelec[0], strsa)
+        addrb = fci.cistring.strs2addr(norb, nelec[1], strsb)
+        h2e = fci.direct_spin1.absorb_h1e(h1e, g2e, norb, nelec, .5)
+        ci1 = selected_ci.contract_2e(h2e, civec, norb, nelec)
+        ref = fci.direct_spin1.contract_2e(h2e, selected_ci.to_fci(civec, norb, nelec),
+                                           norb, nelec)
+        self.assertTrue(numpy.allclose(ci1, ref[addra[:,None],addrb]))
+
+    def test_rdm(self):
+        fcivec = selected_ci.to_fci(civec, norb, nelec)
+        dm1, dm2 = selected_ci.make_rdm12(civec, norb, nelec)
+        dm1ref, dm2ref = fci.direct_spin1.make_rdm12(fcivec, norb, nelec)
+        self.assertTrue(numpy.allclose(dm1, dm1ref))
+        self.assertTrue(numpy.allclose(dm2, dm2ref))
+        dm1s = selected_ci.make_rdm1s(civec, norb, nelec)
+        dm1sref = fci.direct_spin1.make_rdm1s(fcivec, norb, nelec)
+        self.assertTrue(numpy.allclose(dm1s, dm1sref))
+
+    def test_kernel(self):
+        myci = selected_ci.SelectedCI(mol)
+        myci.select_cutoff = 1e-12
+        e1, c1 = myci.kernel(h1e, g2e, norb, nelec)
+        e0 = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)[0]
+        self.assertAlmostEqual(e1, e0, 7)
+        myci.select_cutoff = 1e-2
+        e2, c2 = myci.kernel(h1e, g2e, norb, nelec)
+        self.assertTrue(e2 > e0 - 1e-9)
+        self.assertTrue(c2.size <= c1.size)
+        dm1 = myci.make_rdm1(c2, norb, nelec)
+        self.assertAlmostEqual(dm1.trace(), mol.nelectron, 9)
+
+    def test_casscf(self):
+        mc0 = mcscf.CASSCF(m, 4, 4)
+        mc0.fcisolver = fci.direct_spin1.FCISolver(mol)
+        e0 = mc0.kernel()[0]
+        mc = mcscf.CASSCF(m, 4, 4)
+        mc.fcisolver = selected_ci.SelectedCI(mol)
+        mc.fcisolver.select_cutoff = 1e-12
+        e1 = mc.kernel()[0]
+        self.assertAlmostEqual(e1, e0, 7)
+
+    def test_max_select_cycle(self):
+        myci = selected_ci.SelectedCI(mol)
+        myci.max_select_cycle = 0
+        e, c = myci.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, ehf-mol.energy_nuc(), 9)
+        self.assertEqual(c.shape, (1,1))
+
+
+if __name__ == "__main__":
+    print("Full Tests for selected CI")
+    unittest.main()
@@ -3,6 +3,7 @@
 import unittest
 from functools import reduce
 import numpy
+from pyscf import lib
 from pyscf import gto
 from pyscf import scf
 from pyscf import ao2mo
@@ -55,6 +56,42 @@ class KnowValues(unittest.TestCase):
         ci3 = fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(ci3), 127.497802938663, 10)
 
+    def test_contract_threads(self):
+        ci1ref = fci.direct_spin1.contract_2e(g2e, ci0, norb, nelec)
+        for n in (1, 3):
+            with lib.with_omp_threads(n):
+                ci1 = fci.direct_spin1.contract_2e(g2e, ci0, norb, nelec)
+            self.assertTrue(numpy.allclose(ci1, ci1ref))
+        ci1ref = fci.direct_spin0.contract_2e(g2e, ci0, norb, nelec)
+        with lib.with_omp_threads(1):
+            ci1 = fci.direct_spin0.contract_2e(g2e, ci0, norb, nelec)
+        self.assertTrue(numpy.allclose(ci1, ci1ref))
+
+    def test_kernel_nroots(self):
+        cis = fci.direct_spin1.FCISolver(mol)
+        cis.nroots = 3
+        cis.davidson_only = True
+        e, c = cis.kernel(h1e, g2e, norb, nelec)
+        na = fci.cistring.num_strings(norb, nelec[0])
+        nb = fci.cistring.num_strings(norb, nelec[1])
+        h2e = fci.direct_spin1.absorb_h1e(h1e, g2e, norb, nelec, .5)
+        hmat = [fci.direct_spin1.contract_2e(h2e, x.reshape(na,nb), norb, nelec).ravel()
+                for x in numpy.eye(na*nb)]
+        eref = numpy.linalg.eigh(numpy.array(hmat))[0]
+        self.assertTrue(numpy.allclose(e, eref[:3]))
+        self.assertAlmostEqual(abs(numpy.dot(c[0].ravel(), c[1].ravel())), 0, 7)
+
+    def test_kernel_outcore_subspace(self):
+        cis = fci.direct_spin1.FCISolver(mol)
+        cis.davidson_only = True
+        e0, c0 = cis.kernel(h1e, g2e, norb, nelec)
+        cis.max_memory = .001  # trial vectors in memory-mapped file
+        e1, c1 = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e0, e1, 9)
+        cis.nroots = 2
+        e1, c1 = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e0, e1[0], 9)
+
     def test_kernel(self):
         eref, cref = fci.direct_ms0.kernel(h1e, g2e, norb, mol.nelectron)
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
@@ -65,6 +102,32 @@ class KnowValues(unittest.TestCase):
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, neleci)
         self.assertAlmostEqual(e, -8.7498253981782, 8)
 
+    def test_mixed_precision(self):
+        ci1ref = fci.direct_spin1.contract_2e(g2e, ci0, norb, nelec)
+        ci1 = fci.direct_spin1.contract_2e(g2e, ci0.astype(numpy.float32),
+                                           norb, nelec)
+        self.assertEqual(ci1.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(ci1, ci1ref, rtol=1e-4,
+                                       atol=abs(ci1ref).max()*1e-5))
+
+        cis = fci.direct_spin1.FCISolver(mol)
+        cis.davidson_only = True
+        cis.mixed_precision = True
+        e, c = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, -8.9347029192929, 8)
+
+        cis.nroots = 3
+        e, c = cis.kernel(h1e, g2e, norb, nelec)
+        cis.mixed_precision = False
+        eref, cref = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertTrue(numpy.allclose(e, eref, atol=1e-8))
+
+        # the double precision kernels take the float32 trial vectors
+        cis = fci.direct_spin0.FCISolver(mol)
+        cis.mixed_precision = True
+        e, c = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, -8.9347029192929, 8)
+
     def test_hdiag(self):
         hdiagref = fci.direct_ms0.make_hdiag(h1e, g2e, norb, mol.nelectron)
         hdiag = fci.direct_spin1.make_hdiag(h1e, g2e, norb, nelec)
@@ -93,6 +156,30 @@ class KnowValues(unittest.TestCase):
         dm1, dm2 = fci.direct_spin1.make_rdm12(ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(dm1), 242.33237916212, 10)
         self.assertAlmostEqual(numpy.linalg.norm(dm2), 581.11055963403, 10)
+        dm1s, dm2s = fci.direct_spin1.make_rdm12s(ci2, norb, neleci)
+        self.assertTrue(numpy.allclose(dm1s[0]+dm1s[1], dm1))
+        self.assertTrue(numpy.allclose(dm2s[0]+dm2s[1]+dm2s[1].transpose(2,3,0,1)
+                                       +dm2s[2], dm2))
+
+    def test_contract_2e_and_rdm12(self):
+        for c, ne in ((ci0, nelec), (ci2, neleci)):
+            ci1, dm1, dm2 = fci.direct_spin1.contract_2e_and_rdm12(g2e, c,
+                                                                   norb, ne)
+            ci1ref = fci.direct_spin1.contract_2e(g2e, c, norb, ne)
+            dm1ref, dm2ref = fci.direct_spin1.make_rdm12(c, norb, ne)
+            self.assertTrue(numpy.allclose(ci1, ci1ref))
+            self.assertTrue(numpy.allclose(dm1, dm1ref))
+            self.assertTrue(numpy.allclose(dm2, dm2ref))
+
+        for Solver in (fci.direct_spin1.FCISolver, fci.direct_spin0.FCISolver):
+            cis = Solver(mol)
+            cis.rdm12_from_kernel = True
+            e, c = cis.kernel(h1e, g2e, norb, nelec)
+            self.assertAlmostEqual(e, -8.9347029192929, 8)
+            dm1, dm2 = cis.make_rdm12(c, norb, nelec)
+            dm1ref, dm2ref = fci.direct_spin1.make_rdm12(c, norb, nelec)
+            self.assertTrue(numpy.allclose(dm1, dm1ref))
+            self.assertTrue(numpy.allclose(dm2, dm2ref))
 
     def test_trans_rdm1(self):
         dm1ref = fci.direct_ms0.trans_rdm1(ci0, ci1, norb, mol.nelectron)
@@ -120,6 +207,25 @@ class KnowValues(unittest.TestCase):
         dm1, dm2 = fci.direct_spin1.trans_rdm12(ci3, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(dm1), 193.703051323676, 10)
         self.assertAlmostEqual(numpy.linalg.norm(dm2), 512.111790469461, 10)
+        dm1s, dm2s = fci.direct_spin1.trans_rdm12s(ci3, ci2, norb, neleci)
+        self.assertTrue(numpy.allclose(dm1s[0]+dm1s[1], dm1))
+        self.assertTrue(numpy.allclose(dm2s[0]+dm2s[1]+dm2s[2]+dm2s[3], dm2))
+
+    def test_trans_rdm12_batch(self):
+        bras = (ci0, ci1)
+        kets = (ci1, ci0, ci0+ci1)
+        dm1s, dm2s = fci.direct_spin1.trans_rdm12_batch(bras, kets, norb, nelec)
+        self.assertEqual(dm2s.shape, (2,3,norb,norb,norb,norb))
+        for i, bra in enumerate(bras):
+            for j, ket in enumerate(kets):
+                dm1, dm2 = fci.direct_spin1.trans_rdm12(bra, ket, norb, nelec)
+                self.assertTrue(numpy.allclose(dm1s[i,j], dm1))
+                self.assertTrue(numpy.allclose(dm2s[i,j], dm2))
+        dm1s = fci.direct_spin1.trans_rdm1_batch((ci3,), (ci2,ci3), norb, neleci)
+        self.assertTrue(numpy.allclose(dm1s[0,0],
+                        fci.direct_spin1.trans_rdm1(ci3, ci2, norb, neleci)))
+        self.assertTrue(numpy.allclose(dm1s[0,1],
+                        fci.direct_spin1.make_rdm1(ci3, norb, neleci)))
 
 
 if __name__ == "__main__":
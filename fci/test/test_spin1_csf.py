@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import unittest
+from functools import reduce
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf import ao2mo
+from pyscf import fci
+from pyscf.fci import direct_spin1_csf
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = None
+mol.atom = [
+    ['H', ( 1.,-1.    , 0.   )],
+    ['H', ( 0.,-1.    ,-1.   )],
+    ['H', ( 0.,-0.5   ,-0.   )],
+    ['H', ( 0.,-0.    ,-1.   )],
+    ['H', ( 1.,-0.5   , 0.   )],
+    ['H', ( 0., 1.    , 1.   )],
+]
+
+mol.basis = {'H': 'sto-3g'}
+mol.build()
+
+m = scf.RHF(mol)
+ehf = m.scf()
+
+norb = m.mo_coeff.shape[1]
+nelec = mol.nelectron
+h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+g2e = ao2mo.incore.general(m._eri, (m.mo_coeff,)*4, compact=False)
+
+class KnowValues(unittest.TestCase):
+    def test_csf_coeff(self):
+        coeff = direct_spin1_csf.csf_coeff(6, 3, 0)
+        self.assertEqual(coeff.shape, (20,5))
+        self.assertTrue(numpy.allclose(numpy.dot(coeff.T, coeff), numpy.eye(5)))
+        blocks = direct_spin1_csf.gen_csf_transform(norb, nelec, 2)
+        na = fci.cistring.num_strings(norb, nelec//2)
+        numpy.random.seed(1)
+        x = numpy.random.random(sum([a.shape[0]*c.shape[1] for a,s,c in blocks]))
+        c = direct_spin1_csf.csf2det(x, blocks, na, na)
+        self.assertTrue(numpy.allclose(direct_spin1_csf.det2csf(c, blocks), x))
+        ss = fci.spin_op.spin_square(c/numpy.linalg.norm(c), norb, nelec)[0]
+        self.assertAlmostEqual(ss, 2, 9)
+
+    def test_kernel(self):
+        e0 = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)[0]
+        cis = direct_spin1_csf.FCISolver(mol)
+        e1, c1 = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e1, e0, 7)
+        self.assertAlmostEqual(fci.spin_op.spin_square(c1, norb, nelec)[0], 0, 7)
+        cis.spin = 2
+        e2, c2 = cis.kernel(h1e, g2e, norb, nelec)
+        self.assertTrue(e2 > e1)
+        self.assertAlmostEqual(fci.spin_op.spin_square(c2, norb, nelec)[0], 2, 7)
+
+
+if __name__ == "__main__":
+    print("Full Tests for CSF solver")
+    unittest.main()
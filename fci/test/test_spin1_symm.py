@@ -45,6 +45,38 @@ class KnowValues(unittest.TestCase):
         e = fci.direct_spin1_symm.energy(h1e, g2e, c, norb, nelec)
         self.assertAlmostEqual(e, -84.200905534209554, 8)
 
+    def test_wfnsym(self):
+        airreps, birreps = fci.direct_spin1_symm.strs_irrep(norb, (nelec//2,nelec//2),
+                                                            orbsym)
+        for wfnsym in set(airreps):
+            idx = fci.direct_spin1_symm.sym_allowed_indices(airreps, birreps, wfnsym)
+            c = numpy.zeros(na*na)
+            c[idx] = ci0.ravel()[idx]
+            c = c.reshape(na,na)
+            ci1ref = cis.contract_2e(g2e, c, norb, nelec)
+            ci1 = fci.direct_spin1_symm.contract_2e(g2e, c, norb, nelec,
+                                                    orbsym=orbsym, wfnsym=wfnsym)
+            self.assertTrue(numpy.allclose(ci1ref, ci1))
+
+        # without wfnsym, the ground state of all irreps in the full space
+        mc = fci.direct_spin1_symm.FCISolver(mol)
+        mc.orbsym = orbsym
+        e0 = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)[0]
+        self.assertAlmostEqual(mc.kernel(h1e, g2e, norb, nelec)[0], e0, 8)
+
+        mc.wfnsym = 0
+        e, c = mc.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, -84.200905534209554, 8)
+        self.assertEqual(c.shape, (na,na))
+
+        # the guess of irrep 0 has no component in the other irreps
+        mc.wfnsym = int(max(airreps))
+        mc.davidson_only = True
+        e1 = mc.kernel(h1e, g2e, norb, nelec)[0]
+        e2 = mc.kernel(h1e, g2e, norb, nelec, ci0=c)[0]
+        self.assertFalse(numpy.isnan(e2))
+        self.assertAlmostEqual(e1, e2, 8)
+
 
 if __name__ == "__main__":
     print("Full Tests for ms0")
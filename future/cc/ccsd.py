@@ -481,7 +481,11 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         nocc = self.nocc
         nvir = self.nmo-self.nocc
         nov = nocc*nvir
-        damp = ccdiis.DIIS(self)
+        mem_now = self.max_memory - _memory_usage(self.nmo, nocc)
+        if self.diis_space*2*nov*(nov+1)*8/1e6 > mem_now:
+            damp = ccdiis.DIISLarge(self)
+        else:
+            damp = ccdiis.DIIS(self)
         damp.space = self.diis_space
         damp.min_space = 1
         def fupdate(t1, t2, istep, normt, de):
@@ -66,12 +66,14 @@ def parse(basisfile, symb):
     return bsort
 
 def search_seg(basisfile, symb):
+    '''The lines of the basis of symb.  An empty list if symb is not found'''
     fin = open(basisfile, 'r')
     fdata = fin.read().split('#BASIS SET')
+    fin.close()
     for dat in fdata[1:]:
         if symb+' ' in dat:
-            break
-    fin.close()
-    # remove blank lines
-    return [x for x in dat.split('\n')[1:] if x.strip() and 'END' not in x]
+            # remove blank lines
+            return [x for x in dat.split('\n')[1:]
+                    if x.strip() and 'END' not in x]
+    return []
 
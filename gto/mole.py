@@ -157,6 +157,9 @@ def format_basis(basis_tab):
             stdsymb = param.ELEMENTS[_ELEMENTDIC[rawsymb.upper()]][0]
             symb = symb.replace(rawsymb, stdsymb)
             fmt_basis[symb] = basis.load(basis_tab[atom], stdsymb)
+            if not fmt_basis[symb]:
+                raise RuntimeError('Basis %s not found for %s' %
+                                   (basis_tab[atom], stdsymb))
         else:
             fmt_basis[symb] = basis_tab[atom]
     return fmt_basis
@@ -8,14 +8,23 @@ import tempfile
 from functools import reduce
 import numpy
 import scipy.linalg
-import h5py
 from pyscf.lib import logger
 
 # default max_memory 2000 MB
 
 def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
              max_memory=2000, eig_pick=None, dot=numpy.dot, callback=None,
-             verbose=logger.WARN):
+             nroots=1, verbose=logger.WARN, xs_dtype=None):
+    '''Davidson diagonalization for the lowest eigenpair.
+
+    xs_dtype is the storage type of the trial vectors and the A*x vectors of
+    the subspace, eg numpy.float32 to halve their memory.  The subspace
+    matrices and the solution are computed in the precision of x0.
+    '''
+    if nroots > 1:
+        return davidson1(lambda xs: [a(x) for x in xs], x0, precond, tol,
+                         max_cycle, maxspace, lindep, max_memory, dot,
+                         callback, nroots, verbose, xs_dtype)
     if isinstance(verbose, logger.Logger):
         log = verbose
     else:
@@ -24,8 +33,13 @@ def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
     # if trial vectors are held in memory, store as many as possible
     maxspace = max(int((max_memory-1e3)*1e6/x0.nbytes/2), maxspace)
 
-    xs = _TrialXs(x0.nbytes, maxspace, max_memory)
-    ax = _TrialXs(x0.nbytes, maxspace, max_memory)
+    nvec = min(maxspace, max_cycle) + 2
+    if xs_dtype is None:
+        xbytes = x0.nbytes
+    else:
+        xbytes = x0.size * numpy.dtype(xs_dtype).itemsize
+    xs = _TrialXs(xbytes, nvec, max_memory, xs_dtype)
+    ax = _TrialXs(xbytes, nvec, max_memory, xs_dtype)
     if eig_pick is None:
         eig_pick = lambda w, v: 0
     #e0_hist = []
@@ -49,10 +63,20 @@ def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
             ax0 = None
             xt = precond(dx, e, x0)
             dx = None
+            if xs_dtype is not None:
+# The overlap of the rounded subspace vectors is ill-conditioned when the
+# trial vectors are nearly linearly dependent.  Orthonormalize the trial
+# vector against the stored subspace.
+                xt = _orthonormalize([xt], xs, dot, lindep)
+                if len(xt) == 0:
+                    break
+                xt = xt[0]
         axt = a(xt)
-        for i in range(subspace):
-            heff[subspace,i] = heff[i,subspace] = dot(xt.conj(), ax[i])
-            ovlp[subspace,i] = ovlp[i,subspace] = dot(xt.conj(), xs[i])
+        if subspace > 0:
+            heff[subspace,:subspace] = heff[:subspace,subspace] = \
+                    ax.dot(xt, dot).conj()
+            ovlp[subspace,:subspace] = ovlp[:subspace,subspace] = \
+                    xs.dot(xt, dot).conj()
         heff[subspace,subspace] = dot(xt.conj(), axt)
         ovlp[subspace,subspace] = dot(xt.conj(), xt)
 
@@ -74,9 +98,9 @@ def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
 
         x0  = xt  * v[subspace,index]
         ax0 = axt * v[subspace,index]
-        for i in reversed(range(subspace)):
-            x0  += v[i,index] * xs[i]
-            ax0 += v[i,index] * ax[i]
+        if subspace > 0:
+            x0  += xs.lincomb(v[:subspace,index])
+            ax0 += ax.lincomb(v[:subspace,index])
 
         seig = scipy.linalg.eigh(ovlp[:subspace+1,:subspace+1])[0]
         dx = ax0 - e * x0
@@ -97,8 +121,8 @@ def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
 # linear dependent which seems reducing the accuracy. Removing all trial
 # vectors and restarting iteration with better initial guess gives better
 # accuracy, though more iterations are required.
-            xs = _TrialXs(x0.nbytes, maxspace, max_memory)
-            ax = _TrialXs(x0.nbytes, maxspace, max_memory)
+            xs = _TrialXs(xbytes, nvec, max_memory, xs_dtype)
+            ax = _TrialXs(xbytes, nvec, max_memory, xs_dtype)
             e = 0
         v_prev = v[:,index]
 
@@ -112,39 +136,215 @@ def davidson(a, x0, precond, tol=1e-14, max_cycle=50, maxspace=12, lindep=1e-16,
 eigh = davidson
 dsyev = davidson
 
+def davidson1(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
+              lindep=1e-16, max_memory=2000, dot=numpy.dot, callback=None,
+              nroots=1, verbose=logger.WARN, xs_dtype=None):
+    '''Block Davidson diagonalization for the lowest nroots eigenpairs.
+
+    Args:
+        aop : function(xs) => [a*x for x in xs]
+            The matrix-vector multiplication on a list of trial vectors.
+            All trial vectors of one iteration are passed in one call.
+        x0 : 1D array or a list of 1D arrays
+            Initial guess, one vector per root
+        precond : function(dx, e, x0) => array_like_dx
+            Preconditioner
+
+    Kwargs:
+        max_space : int
+            The subspace is restarted from the current Ritz vectors (thick
+            restart) when it exceeds max_space + 3*(nroots-1)
+        nroots : int
+            Number of eigenpairs to solve.  A root is locked (no more trial
+            vectors generated for it) once it is converged.
+        xs_dtype : numpy dtype
+            The storage type of the subspace vectors, as in :func:`davidson`
+
+    Returns:
+        e : ndarray of the nroots lowest eigenvalues
+        x : list of the nroots eigenvectors
+    '''
+    if isinstance(verbose, logger.Logger):
+        log = verbose
+    else:
+        log = logger.Logger(sys.stdout, verbose)
+    toloose = numpy.sqrt(tol)
+
+    if isinstance(x0, numpy.ndarray) and x0.ndim == 1:
+        x0 = [x0]
+    xt = _orthonormalize(x0, [], dot, lindep)
+    if len(xt) < nroots:
+        log.warn('davidson1: %d independent initial guess for %d roots',
+                 len(xt), nroots)
+        nroots = len(xt)
+    max_cycle = min(max_cycle, x0[0].size)
+    max_space = max_space + (nroots-1) * 3
+
+    dtype = x0[0].dtype
+    if xs_dtype is None:
+        xbytes = x0[0].nbytes
+    else:
+        xbytes = x0[0].size * numpy.dtype(xs_dtype).itemsize
+    nmax = max(max_space, len(xt)) + nroots
+    heff = numpy.zeros((nmax,nmax), dtype=dtype)
+    xs = _TrialXs(xbytes, nmax, max_memory, xs_dtype)
+    ax = _TrialXs(xbytes, nmax, max_memory, xs_dtype)
+    e = numpy.zeros(nroots)
+    conv = [False] * nroots
+    for istep in range(max_cycle):
+        axt = aop(xt)
+        head = len(xs)
+        xs.extend(xt)
+        ax.extend(axt)
+        space = len(xs)
+        for i in range(head, space):
+            heff[i,:space] = ax.dot(xs[i], dot).conj()
+            heff[:space,i] = heff[i,:space].conj()
+        xt = axt = None
+
+        w, v = scipy.linalg.eigh(heff[:space,:space])
+        de = w[:nroots] - e
+        e = w[:nroots]
+        x0 = _gen_x0(v[:,:nroots], xs)
+        ax0 = _gen_x0(v[:,:nroots], ax)
+
+        xt = []
+        rnorm = numpy.empty(nroots)
+        for k in range(nroots):
+            dx = ax0[k] - e[k] * x0[k]
+            rnorm[k] = numpy.linalg.norm(dx)
+            conv[k] = rnorm[k] < toloose or abs(de[k]) < tol
+            if not conv[k]:
+                xt.append(precond(dx, e[k], x0[k]))
+        log.debug('davidson1 %d %d, max|r|=%g, max|de|=%g, e=%s',
+                  istep, space, rnorm.max(), abs(de).max(), e)
+        if all(conv):
+            break
+
+        if space + len(xt) > max_space:
+# thick restart: the Ritz vectors are orthonormal and diagonalize heff
+            xs = _TrialXs(xbytes, nmax, max_memory, xs_dtype)
+            ax = _TrialXs(xbytes, nmax, max_memory, xs_dtype)
+            xs.extend(x0)
+            ax.extend(ax0)
+            heff[:] = 0
+            heff[numpy.diag_indices(nroots)] = e
+        xt = _orthonormalize(xt, xs, dot, lindep)
+        if len(xt) == 0:
+            log.debug('davidson1: linear dependent trial vectors')
+            break
+
+        if callable(callback):
+            callback(istep, xs, ax)
+
+    log.debug('final step %d', istep)
+    return e, x0
 
-class _TrialXs(list):
-    def __init__(self, xbytes, maxspace, max_memory):
-        if xbytes*maxspace*2 > max_memory*1e6:
-            _fd = tempfile.NamedTemporaryFile()
-            self.scr_h5 = h5py.File(_fd.name, 'w')
+def _gen_x0(v, xs):
+    return [xs.lincomb(v[:,k]) for k in range(v.shape[1])]
+
+def _orthonormalize(xt, xs, dot=numpy.dot, lindep=1e-16):
+    '''Schmidt orthonormalize xt against the orthonormal vectors xs and
+    among themselves.  Vectors which are linearly dependent are dropped.'''
+    out = []
+    for x in xt:
+        norm = numpy.sqrt(dot(x.conj(), x).real)
+        if norm == 0:
+            continue
+        x = x / norm
+        if len(xs) > 0:
+            x -= xs.lincomb(xs.dot(x, dot))
+        for xi in out:
+            x -= xi * dot(xi.conj(), x)
+        norm = numpy.sqrt(dot(x.conj(), x).real)
+        if norm**2 > lindep:
+            out.append(x/norm)
+    return out
+
+
+class _TrialXs(object):
+    '''Trial vectors of the Davidson subspace.  They are held row by row in
+    one preallocated array of nvec rows.  If the subspace does not fit in
+    max_memory, the array is a numpy.memmap of a temporary file, and the
+    overlaps and linear combinations are streamed over column blocks of at
+    most BLKMEM MB.  If dtype is given, the vectors are stored in dtype, and
+    they are streamed over column blocks as well so that the conversion to
+    the precision of the input vector never copies the whole subspace.'''
+    BLKMEM = 64
+    def __init__(self, xbytes, nvec, max_memory, dtype=None):
+        self.nvec = nvec
+        self.dtype = dtype
+        self.outcore = xbytes*nvec*2 > max_memory*1e6
+        self.blocked = self.outcore or dtype is not None
+        self._buf = None
+        self._fd = None
+        self._n = 0
+
+    def _alloc(self, x):
+        shape = (self.nvec, x.size)
+        if self.outcore:
+            self._fd = tempfile.NamedTemporaryFile()
+            self._buf = numpy.memmap(self._fd, dtype=self.dtype or x.dtype,
+                                     mode='w+', shape=shape)
         else:
-            self.scr_h5 = None
+            self._buf = numpy.empty(shape, dtype=self.dtype or x.dtype)
 
-    def __getitem__(self, n):
-        if self.scr_h5 is None:
-            return list.__getitem__(self, n)
+    def _col_blocks(self):
+        size = self._buf.shape[1]
+        if self.blocked:
+            blksize = max(int(self.BLKMEM*1e6/self._buf.itemsize/self.nvec), 1)
         else:
-            return self.scr_h5[str(n)]
+            blksize = size
+        for p0 in range(0, size, blksize):
+            yield p0, min(p0+blksize, size)
 
     def append(self, x):
-        if self.scr_h5 is None:
-            list.append(self, x)
-        else:
-            n = len(self.scr_h5)
-            self.scr_h5[str(n)] = x
+        if self._buf is None:
+            self._alloc(x)
+        if self._n >= self.nvec:
+            raise IndexError('_TrialXs is full (%d vectors)' % self.nvec)
+        self._buf[self._n] = x.ravel()
+        self._n += 1
 
-    def __setitem__(self, n, x):
-        if self.scr_h5 is None:
-            list.__setitem__(self, n, x)
-        else:
-            self.scr_h5[str(n)] = x
+    def extend(self, xs):
+        for x in xs:
+            self.append(x)
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self._n
+        if not 0 <= n < self._n:
+            raise IndexError(n)
+        return numpy.asarray(self._buf[n])
 
     def __len__(self):
-        if self.scr_h5 is None:
-            return list.__len__(self)
-        else:
-            return len(self.scr_h5)
+        return self._n
+
+    def dot(self, x, dot=numpy.dot):
+        '''[dot(xs[i].conj(), x) for all stored xs[i]], as one
+        matrix-vector multiplication for numpy.dot'''
+        n = self._n
+        x = x.ravel()
+        if dot is not numpy.dot:
+            return numpy.array([dot(self[i].conj(), x) for i in range(n)])
+        out = 0
+        for p0, p1 in self._col_blocks():
+            blk = self._buf[:n,p0:p1]
+            if numpy.iscomplexobj(blk):
+                blk = blk.conj()
+            out = out + numpy.dot(blk, x[p0:p1])
+        return out
+
+    def lincomb(self, v):
+        '''sum_i v[i] * xs[i]'''
+        n = len(v)
+        if not self.blocked:
+            return numpy.dot(v, self._buf[:n])
+        size = self._buf.shape[1]
+        out = numpy.empty(size, numpy.result_type(v, self._buf.dtype))
+        for p0, p1 in self._col_blocks():
+            out[p0:p1] = numpy.dot(v, self._buf[:n,p0:p1])
+        return out
 
 # Krylov subspace method
 # ref: J. A. Pople, R. Krishnan, H. B. Schlegel, and J. S. Binkley,
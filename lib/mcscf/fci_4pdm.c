@@ -145,41 +145,90 @@ static void rdm4_a_t2(double *ci0, double *t2,
 }
 }
 
-static void tril3pdm_particle_symm(double *rdm3, double *tbra, double *t2ket,
-                                   int bcount, int ncre, int norb)
+/*
+ * The 4-pdm dm4[p,q,r,s,t,u,v,w] = <p^+ q r^+ s t^+ u v^+ w> is stored in
+ * the blocks dm4[p,:,r,:,t,:,v,:] of p >= r >= t >= v.  The other blocks are
+ * generated from these blocks and the 3-pdm (see FCIunpack_dm4).  The block
+ * of (p,r,t,v) is stored at dm4+FCIdm4_block_id(p,r,t,v)*norb**4, in the
+ * order [q,s,u,w].
+ */
+size_t FCIdm4_block_id(int p, int r, int t, int v)
+{
+        return (size_t)(p+3)*(p+2)*(p+1)*p/24 + (size_t)(r+2)*(r+1)*r/6
+             + (size_t)(t+1)*t/2 + v;
+}
+
+/*
+ * dm4[p,q,r,s,t,u,v,w] += sum_n fac[n] t2[n,s,r,q,p] * t2[n,t,u,v,w]
+ * for the blocks p >= r >= t >= v.  For a given (p,r), the blocks of all
+ * (t,v), t <= r, are contiguous.
+ */
+static void dm4_packed_kern(double *dm4, double *t2, double *fac,
+                            int bcount, int norb)
+{
+        const int nnorb = norb * norb;
+        const size_t n3 = nnorb * norb;
+        const size_t n4 = nnorb * nnorb;
+        const int npair = norb * (norb+1)/2;
+        int *pidx = malloc(sizeof(int) * npair);
+        int *ridx = malloc(sizeof(int) * npair);
+        double *bra = malloc(sizeof(double) * npair*bcount*nnorb);
+        double *ket = malloc(sizeof(double) * npair*bcount*nnorb);
+        int p, r, pr;
+        for (pr = 0, p = 0; p < norb; p++) {
+                for (r = 0; r <= p; r++, pr++) {
+                        pidx[pr] = p;
+                        ridx[pr] = r;
+                }
+        }
+
+#pragma omp parallel default(none) \
+        shared(dm4, t2, fac, bcount, norb, pidx, ridx, bra, ket), \
+        private(p, r, pr)
 {
-        assert(norb <= BLK);
         const char TRANS_N = 'N';
         const char TRANS_T = 'T';
         const double D1 = 1;
-        int nnorb = norb * norb;
-        int n4 = nnorb * nnorb;
-        int i, j, k, m, n, blk1;
-        int iblk = MIN(BLK/norb, norb);
-        int blk = iblk * norb;
-
-        //dgemm_(&TRANS_N, &TRANS_T, &n4, &nncre, &bcount,
-        //       &D1, t2ket, &n4, tbra, &nnorb, &D1, rdm3, &n4);
-// "upper triangle" F-array[k,j,i], k<=i<=j
-        for (j = 0; j < ncre; j++) {
-        for (n = 0; n < norb; n++) {
-                for (k = 0; k < j+1-iblk; k+=iblk) {
-                        m = k * norb;
-                        i = m + blk;
-                        dgemm_(&TRANS_N, &TRANS_T, &i, &blk, &bcount,
-                               &D1, t2ket, &n4, tbra+m, &nnorb,
-                               &D1, rdm3+m*n4, &n4);
+        int n, q, s, tv;
+        double *pbra, *pket, *pt2;
+        size_t blk0;
+#pragma omp for schedule(static)
+        for (pr = 0; pr < npair; pr++) {
+                p = pidx[pr];
+                r = ridx[pr];
+                for (n = 0; n < bcount; n++) {
+                        pbra = bra + ((size_t)pr*bcount+n) * nnorb;
+                        pket = ket + ((size_t)pr*bcount+n) * nnorb;
+                        pt2 = t2 + n * n4;
+                        for (q = 0; q < norb; q++) {
+                        for (s = 0; s < norb; s++) {
+                                pbra[q*norb+s] = pt2[s*n3+r*nnorb+q*norb+p];
+                                pket[q*norb+s] = pt2[p*n3+q*nnorb+r*norb+s];
+                        } }
+                        if (fac != NULL) {
+                                for (q = 0; q < nnorb; q++) {
+                                        pbra[q] *= fac[n];
+                                }
+                        }
                 }
-
-                m = k * norb;
-                i = (j+1) * norb;
-                blk1 = i - m;
-                dgemm_(&TRANS_N, &TRANS_T, &i, &blk1, &bcount,
-                       &D1, t2ket, &n4, tbra+m, &nnorb,
-                       &D1, rdm3+m*n4, &n4);
-                t2ket += nnorb;
-                rdm3 += nnorb;
-        } }
+        }
+#pragma omp for schedule(dynamic, 1)
+        for (pr = 0; pr < npair; pr++) {
+                p = pidx[pr];
+                r = ridx[pr];
+                blk0 = FCIdm4_block_id(p, r, 0, 0);
+                for (tv = 0; tv < (r+1)*(r+2)/2; tv++) {
+                        dgemm_(&TRANS_N, &TRANS_T, &nnorb, &nnorb, &bcount,
+                               &D1, ket+(size_t)tv*bcount*nnorb, &nnorb,
+                               bra+(size_t)pr*bcount*nnorb, &nnorb,
+                               &D1, dm4+(blk0+tv)*n4, &nnorb);
+                }
+        }
+}
+        free(pidx);
+        free(ridx);
+        free(bra);
+        free(ket);
 }
 
 static void tril2pdm_particle_symm(double *rdm2, double *tbra, double *tket,
@@ -220,7 +269,6 @@ void FCI4pdm_kern_ms0(double *rdm1, double *rdm2, double *rdm3, double *rdm4,
         const int nnorb = norb * norb;
         const int n4 = nnorb * nnorb;
         const int n3 = nnorb * norb;
-        const unsigned long n6 = nnorb * nnorb * nnorb;
         int i, j, k, l, ij;
         unsigned long n;
         double *tbra;
@@ -255,15 +303,13 @@ void FCI4pdm_kern_ms0(double *rdm1, double *rdm2, double *rdm3, double *rdm4,
 
                 i = ij / norb;
                 j = ij - i * norb;
-// contract <bra-of-Eij| with |E^k_l E^m_n ci0>
-                tril3pdm_particle_symm(rdm4+(j*norb+i)*n6, tbra, t2,
-                                       bcount, j+1, norb);
 // rdm3
                 tril2pdm_particle_symm(rdm3+(j*norb+i)*n4, tbra, t1,
                                        bcount, j+1, norb);
         }
         free(tbra);
 }
+        dm4_packed_kern(rdm4, t2, NULL, bcount, norb);
 
 // rdm1 and rdm2
         const int INC1 = 1;
@@ -311,7 +357,6 @@ void FCI4pdm_kern_spin0(double *rdm1, double *rdm2, double *rdm3, double *rdm4,
         const int nnorb = norb * norb;
         const int n4 = nnorb * nnorb;
         const int n3 = nnorb * norb;
-        const unsigned long n6 = nnorb * nnorb * nnorb;
         int i, j, k, l, ij;
         unsigned long n;
         double factor;
@@ -352,15 +397,22 @@ void FCI4pdm_kern_spin0(double *rdm1, double *rdm2, double *rdm3, double *rdm4,
                         }
                 }
 
-// contract <bra-of-Eij| with |E^k_l E^m_n ci0>
-                tril3pdm_particle_symm(rdm4+(j*norb+i)*n6, tbra, t2,
-                                       fill1, j+1, norb);
 // rdm3
                 tril2pdm_particle_symm(rdm3+(j*norb+i)*n4, tbra, t1,
                                        fill1, j+1, norb);
         }
         free(tbra);
 }
+        double *fac = malloc(sizeof(double) * fill1);
+        for (n = 0; n < fill1; n++) {
+                if (n+strb_id == stra_id) {
+                        fac[n] = 1;
+                } else {
+                        fac[n] = 2;
+                }
+        }
+        dm4_packed_kern(rdm4, t2, fac, fill1, norb);
+        free(fac);
 
 // rdm1 and rdm2
         tbra = malloc(sizeof(double) * nnorb * fill1);
@@ -393,8 +445,8 @@ void FCI4pdm_kern_spin0(double *rdm1, double *rdm2, double *rdm3, double *rdm4,
 
 
 /*
- * This function returns incomplete rdm3, rdm4, in which, particle
- * permutation symmetry is assumed.
+ * This function returns incomplete rdm3, in which, particle permutation
+ * symmetry is assumed, and the packed rdm4 (see FCIdm4_block_id).
  * kernel can be FCI4pdm_kern_ms0, FCI4pdm_kern_spin0
  */
 void FCIrdm4_drv(void (*kernel)(),
@@ -412,7 +464,7 @@ void FCIrdm4_drv(void (*kernel)(),
         memset(rdm1, 0, sizeof(double) * nnorb);
         memset(rdm2, 0, sizeof(double) * n4);
         memset(rdm3, 0, sizeof(double) * n4 * nnorb);
-        memset(rdm4, 0, sizeof(double) * n4 * n4);
+        memset(rdm4, 0, sizeof(double) * n4 * FCIdm4_block_id(norb, 0, 0, 0));
 
         for (strk = 0; strk < na; strk++) {
                 for (ib = 0; ib < na; ib += BUFBASE) {
@@ -629,3 +681,302 @@ void FCIrdm3_drv(void (*kernel)(),
         free(clinka);
 }
 
+
+
+/*
+ * Complete the 3-pdm and 4-pdm of FCIrdm3_drv and FCIrdm4_drv with
+ *      E^r_s E^p_q = E^p_q E^r_s - \delta_{qr}E^p_s + \delta_{ps}E^r_q
+ * dm3 (dm4) is processed in blocks dm3[i,:,j,:,k,:], each permutation of
+ * the indices (i,j,k) is generated from the block of the previous
+ * permutation.  The blocks of one set of unique indices are handled by the
+ * same thread.
+ */
+static void dm3_get(double *blk, double *dm3, int i, int j, int k, int norb)
+{
+        const unsigned long n = norb;
+        unsigned long q, s;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+                memcpy(blk+(q*n+s)*n, dm3+((((i*n+q)*n+j)*n+s)*n+k)*n,
+                       sizeof(double)*n);
+        } }
+}
+static void dm3_put(double *dm3, double *blk, int i, int j, int k, int norb)
+{
+        const unsigned long n = norb;
+        unsigned long q, s;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+                memcpy(dm3+((((i*n+q)*n+j)*n+s)*n+k)*n, blk+(q*n+s)*n,
+                       sizeof(double)*n);
+        } }
+}
+/* out[s,q,u] = in[q,s,u] - delta_{qj} dm2[i,s,k,u] + delta_{si} dm2[j,q,k,u]
+ * transform block (i,j,k) to block (j,i,k) */
+static void dm3_swap01(double *out, double *in, double *dm2,
+                       int i, int j, int k, int norb)
+{
+        const unsigned long n = norb;
+        const unsigned long nn = n * n;
+        unsigned long q, s, u;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                out[s*nn+q*n+u] = in[q*nn+s*n+u];
+        } } }
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                out[s*nn+j*n+u] -= dm2[((i*n+s)*n+k)*n+u];
+        } }
+        for (q = 0; q < n; q++) {
+        for (u = 0; u < n; u++) {
+                out[i*nn+q*n+u] += dm2[((j*n+q)*n+k)*n+u];
+        } }
+}
+/* out[q,u,s] = in[q,s,u] - delta_{sk} dm2[i,q,j,u] + delta_{uj} dm2[i,q,k,s]
+ * transform block (i,j,k) to block (i,k,j) */
+static void dm3_swap12(double *out, double *in, double *dm2,
+                       int i, int j, int k, int norb)
+{
+        const unsigned long n = norb;
+        const unsigned long nn = n * n;
+        unsigned long q, s, u;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                out[q*nn+u*n+s] = in[q*nn+s*n+u];
+        } } }
+        for (q = 0; q < n; q++) {
+        for (u = 0; u < n; u++) {
+                out[q*nn+u*n+k] -= dm2[((i*n+q)*n+j)*n+u];
+        } }
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+                out[q*nn+j*n+s] += dm2[((i*n+q)*n+k)*n+s];
+        } }
+}
+
+void FCIcomplete_dm3(double *dm2, double *dm3, int norb)
+{
+        int i, j, k;
+
+#pragma omp parallel default(none) \
+        shared(dm2, dm3, norb), \
+        private(i, j, k)
+{
+        double *buf0 = malloc(sizeof(double) * norb*norb*norb);
+        double *buf1 = malloc(sizeof(double) * norb*norb*norb);
+// ijk -> jik -> jki -> kji -> kij -> ikj
+#pragma omp for schedule(dynamic, 1) nowait
+        for (i = 0; i < norb; i++) {
+        for (j = 0; j <= i; j++) {
+        for (k = 0; k <= j; k++) {
+                dm3_get(buf0, dm3, i, j, k, norb);
+                dm3_swap01(buf1, buf0, dm2, i, j, k, norb);
+                dm3_put(dm3, buf1, j, i, k, norb);
+                dm3_swap12(buf0, buf1, dm2, j, i, k, norb);
+                dm3_put(dm3, buf0, j, k, i, norb);
+                dm3_swap01(buf1, buf0, dm2, j, k, i, norb);
+                dm3_put(dm3, buf1, k, j, i, norb);
+                dm3_swap12(buf0, buf1, dm2, k, j, i, norb);
+                dm3_put(dm3, buf0, k, i, j, norb);
+                dm3_swap01(buf1, buf0, dm2, k, i, j, norb);
+                dm3_put(dm3, buf1, i, k, j, norb);
+        } } }
+        free(buf0);
+        free(buf1);
+}
+}
+
+static void dm4_get(double *blk, double *dm4, int i, int j, int k, int l,
+                    int norb)
+{
+        const unsigned long n = norb;
+        unsigned long q, s, u;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                memcpy(blk+((q*n+s)*n+u)*n,
+                       dm4+((((((i*n+q)*n+j)*n+s)*n+k)*n+u)*n+l)*n,
+                       sizeof(double)*n);
+        } } }
+}
+static void dm4_put(double *dm4, double *blk, int i, int j, int k, int l,
+                    int norb)
+{
+        const unsigned long n = norb;
+        unsigned long q, s, u;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                memcpy(dm4+((((((i*n+q)*n+j)*n+s)*n+k)*n+u)*n+l)*n,
+                       blk+((q*n+s)*n+u)*n, sizeof(double)*n);
+        } } }
+}
+#define DM3IDX(a,b,c,d,e,f)     (((((a*n+b)*n+c)*n+d)*n+e)*n+f)
+/* out[s,q,u,w] = in[q,s,u,w] - delta_{qj} dm3[i,s,k,u,l,w]
+ *                            + delta_{si} dm3[j,q,k,u,l,w] */
+static void dm4_swap01(double *out, double *in, double *dm3,
+                       int i, int j, int k, int l, int norb)
+{
+        const unsigned long n = norb;
+        const unsigned long nn = n * n;
+        const unsigned long n3 = nn * n;
+        unsigned long q, s, u, w;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[s*n3+q*nn+u*n+w] = in[q*n3+s*nn+u*n+w];
+        } } } }
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[s*n3+j*nn+u*n+w] -= dm3[DM3IDX(i,s,k,u,l,w)];
+        } } }
+        for (q = 0; q < n; q++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[i*n3+q*nn+u*n+w] += dm3[DM3IDX(j,q,k,u,l,w)];
+        } } }
+}
+/* out[q,u,s,w] = in[q,s,u,w] - delta_{sk} dm3[i,q,j,u,l,w]
+ *                            + delta_{uj} dm3[i,q,k,s,l,w] */
+static void dm4_swap12(double *out, double *in, double *dm3,
+                       int i, int j, int k, int l, int norb)
+{
+        const unsigned long n = norb;
+        const unsigned long nn = n * n;
+        const unsigned long n3 = nn * n;
+        unsigned long q, s, u, w;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[q*n3+u*nn+s*n+w] = in[q*n3+s*nn+u*n+w];
+        } } } }
+        for (q = 0; q < n; q++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[q*n3+u*nn+k*n+w] -= dm3[DM3IDX(i,q,j,u,l,w)];
+        } } }
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (w = 0; w < n; w++) {
+                out[q*n3+j*nn+s*n+w] += dm3[DM3IDX(i,q,k,s,l,w)];
+        } } }
+}
+/* out[q,s,w,u] = in[q,s,u,w] - delta_{ul} dm3[i,q,j,s,k,w]
+ *                            + delta_{wk} dm3[i,q,j,s,l,u] */
+static void dm4_swap23(double *out, double *in, double *dm3,
+                       int i, int j, int k, int l, int norb)
+{
+        const unsigned long n = norb;
+        const unsigned long nn = n * n;
+        const unsigned long n3 = nn * n;
+        unsigned long q, s, u, w;
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+        for (w = 0; w < n; w++) {
+                out[q*n3+s*nn+w*n+u] = in[q*n3+s*nn+u*n+w];
+        } } } }
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (w = 0; w < n; w++) {
+                out[q*n3+s*nn+w*n+l] -= dm3[DM3IDX(i,q,j,s,k,w)];
+        } } }
+        for (q = 0; q < n; q++) {
+        for (s = 0; s < n; s++) {
+        for (u = 0; u < n; u++) {
+                out[q*n3+s*nn+k*n+u] += dm3[DM3IDX(i,q,j,s,l,u)];
+        } } }
+}
+
+/* t0 holds block (i,j,k,l).  Generates and saves the blocks
+ * ijlk -> iljk -> ilkj -> iklj -> ikjl, t0 holds block (i,k,j,l) on exit */
+static void dm4_chain(double *dm4, double *t0, double *t1, double *dm3,
+                      int i, int j, int k, int l, int norb)
+{
+        dm4_swap23(t1, t0, dm3, i, j, k, l, norb);
+        dm4_put(dm4, t1, i, j, l, k, norb);
+        dm4_swap12(t0, t1, dm3, i, j, l, k, norb);
+        dm4_put(dm4, t0, i, l, j, k, norb);
+        dm4_swap23(t1, t0, dm3, i, l, j, k, norb);
+        dm4_put(dm4, t1, i, l, k, j, norb);
+        dm4_swap12(t0, t1, dm3, i, l, k, j, norb);
+        dm4_put(dm4, t0, i, k, l, j, norb);
+        dm4_swap23(t1, t0, dm3, i, k, l, j, norb);
+        dm4_put(dm4, t1, i, k, j, l, norb);
+        memcpy(t0, t1, sizeof(double)*norb*norb*norb*norb);
+}
+
+void FCIcomplete_dm4(double *dm3, double *dm4, int norb)
+{
+        int i, j, k, l;
+
+#pragma omp parallel default(none) \
+        shared(dm3, dm4, norb), \
+        private(i, j, k, l)
+{
+        double *buf0 = malloc(sizeof(double) * norb*norb*norb*norb);
+        double *buf1 = malloc(sizeof(double) * norb*norb*norb*norb);
+// ijkl -> ijlk -> iljk -> ilkj -> iklj -> ikjl
+//      -> jikl -> jilk -> jlik -> jlki -> jkli -> jkil
+//(ikjl)-> kijl -> kilj -> klij -> klji -> kjli -> kjil
+//(iljk)-> lijk -> likj -> lkij -> lkji -> ljki -> ljik
+#pragma omp for schedule(dynamic, 1) nowait
+        for (i = 0; i < norb; i++) {
+        for (k = 0; k <= i; k++) {
+        for (j = 0; j <= k; j++) {
+        for (l = 0; l <= j; l++) {
+                dm4_get(buf0, dm4, i, j, k, l, norb);
+                dm4_chain(dm4, buf0, buf1, dm3, i, j, k, l, norb);
+                dm4_swap01(buf1, buf0, dm3, i, k, j, l, norb);
+                dm4_put(dm4, buf1, k, i, j, l, norb);
+                dm4_chain(dm4, buf1, buf0, dm3, k, i, j, l, norb);
+
+                dm4_get(buf0, dm4, i, j, k, l, norb);
+                dm4_swap01(buf1, buf0, dm3, i, j, k, l, norb);
+                dm4_put(dm4, buf1, j, i, k, l, norb);
+                dm4_chain(dm4, buf1, buf0, dm3, j, i, k, l, norb);
+
+                dm4_get(buf0, dm4, i, l, j, k, norb);
+                dm4_swap01(buf1, buf0, dm3, i, l, j, k, norb);
+                dm4_put(dm4, buf1, l, i, j, k, norb);
+                dm4_chain(dm4, buf1, buf0, dm3, l, i, j, k, norb);
+        } } } }
+        free(buf0);
+        free(buf1);
+}
+}
+
+/*
+ * Expand the packed 4-pdm dm4p (the blocks p >= r >= t >= v, see
+ * FCIdm4_block_id) to the full 4-pdm dm4.
+ */
+void FCIunpack_dm4(double *dm3, double *dm4p, double *dm4, int norb)
+{
+        const size_t n4 = (size_t)norb * norb * norb * norb;
+        int i, j, k, l;
+
+#pragma omp parallel default(none) \
+        shared(dm3, dm4p, dm4, norb), \
+        private(i, j, k, l)
+{
+        double *buf = malloc(sizeof(double) * n4);
+        double *pblk;
+// FCIcomplete_dm4 starts from the blocks (i,j,k,l) of i >= k >= j >= l
+#pragma omp for schedule(dynamic, 1)
+        for (i = 0; i < norb; i++) {
+        for (k = 0; k <= i; k++) {
+        for (j = 0; j <= k; j++) {
+        for (l = 0; l <= j; l++) {
+                pblk = dm4p + FCIdm4_block_id(i, k, j, l) * n4;
+                dm4_swap12(buf, pblk, dm3, i, k, j, l, norb);
+                dm4_put(dm4, buf, i, j, k, l, norb);
+        } } } }
+        free(buf);
+}
+        FCIcomplete_dm4(dm3, dm4, norb);
+}
@@ -29,7 +29,7 @@
  */
 typedef struct {
         unsigned int addr;
-        unsigned char ia;
+        unsigned short ia;
         char sign;
 } _LinkT;
 #define EXTRACT_IA(I)   (I.ia)
@@ -83,6 +83,9 @@ static double prog_a_t1(double *ci0, double *t1, int fillcnt, int stra_id,
                 ia   = EXTRACT_IA  (tab[j]);
                 str1 = EXTRACT_ADDR(tab[j]);
                 sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
                 pt1 = t1 + ia;
                 pci = ci0 + str1*(unsigned long)nstrb;
                 if (sign > 0) {
@@ -120,6 +123,9 @@ static double prog_b_t1(double *ci0, double *t1, int fillcnt, int stra_id,
                         ia   = EXTRACT_IA  (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         t1[ia] += sign * pci[str1];
                         csum += pci[str1] * pci[str1];
                 }
@@ -151,6 +157,9 @@ static double prog0_b_t1(double *ci0, double *t1, int fillcnt, int stra_id,
                         ia   = EXTRACT_IA  (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         t1[ia] += sign * pci[str1];
                         csum += pci[str1] * pci[str1];
                 }
@@ -163,10 +172,11 @@ static double prog0_b_t1(double *ci0, double *t1, int fillcnt, int stra_id,
 
 /*
  * spread t1 into ci1
+ * Only the rows [row0:row1] of ci1 are updated.
  */
 static void spread_a_t1(double *ci1, double *t1, int fillcnt, int stra_id,
                         int norb, int nstrb, int nlinka,
-                        _LinkT *clink_indexa)
+                        _LinkT *clink_indexa, int row0, int row1)
 {
         const int nnorb = norb * (norb+1)/2;
         int j, k, ia, str1, sign;
@@ -177,6 +187,12 @@ static void spread_a_t1(double *ci1, double *t1, int fillcnt, int stra_id,
                 ia   = EXTRACT_IA  (tab[j]);
                 str1 = EXTRACT_ADDR(tab[j]);
                 sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
+                if (str1 < row0 || str1 >= row1) {
+                        continue;
+                }
                 cp0 = t1 + ia;
                 cp1 = ci1 + str1*(unsigned long)nstrb;
                 if (sign > 0) {
@@ -191,6 +207,58 @@ static void spread_a_t1(double *ci1, double *t1, int fillcnt, int stra_id,
         }
 }
 
+/*
+ * spread_a_t1 for the alpha strings [kstart:strk1] of the batch which starts
+ * at strk0, restricted to the rows [row0:row1] of ci1.
+ * For lower_tri, the alpha string strk only spreads strk-ib beta strings.
+ */
+static void spread_a_rows(double *ci1, double *buf, int strk0, int kstart,
+                          int strk1, int ib, int blen, int lower_tri,
+                          int norb, int nb, int nlinka, _LinkT *clinka,
+                          int row0, int row1)
+{
+        int nnorb = norb * (norb+1)/2;
+        int strk, fillcnt;
+        for (strk = kstart; strk < strk1; strk++) {
+                if (lower_tri) {
+                        fillcnt = MIN(blen, strk-ib);
+                } else {
+                        fillcnt = blen;
+                }
+                spread_a_t1(ci1+ib, buf+(strk-strk0)*blen*nnorb, fillcnt,
+                            strk, norb, nb, nlinka, clinka, row0, row1);
+        }
+}
+
+/*
+ * Different alpha strings of the batch can spread to the same rows of ci1.
+ * Instead of serializing the scatter, the rows of ci1 are divided among the
+ * threads.  Every thread walks through the whole batch and only updates the
+ * rows it owns, so the threads write to disjoint parts of ci1.
+ */
+static void spread_a_batch(double *ci1, double *buf, int strk0, int kstart,
+                           int strk1, int ib, int blen, int lower_tri,
+                           int norb, int na, int nb, int nlinka,
+                           _LinkT *clinka)
+{
+#pragma omp parallel default(none) \
+        shared(ci1, buf, strk0, kstart, strk1, ib, blen, lower_tri, \
+               norb, na, nb, nlinka, clinka)
+{
+        int row0, row1;
+        int nthread = 1;
+        int ithread = 0;
+#if defined HAVE_OPENMP
+        nthread = omp_get_num_threads();
+        ithread = omp_get_thread_num();
+#endif
+        row0 = (int)((long)na * ithread / nthread);
+        row1 = (int)((long)na * (ithread+1) / nthread);
+        spread_a_rows(ci1, buf, strk0, kstart, strk1, ib, blen, lower_tri,
+                      norb, nb, nlinka, clinka, row0, row1);
+}
+}
+
 static void spread_b_t1(double *ci1, double *t1, int fillcnt, int stra_id,
                         int norb, int nstrb, int nlinkb,
                         _LinkT *clink_indexb)
@@ -205,6 +273,9 @@ static void spread_b_t1(double *ci1, double *t1, int fillcnt, int stra_id,
                         ia   = EXTRACT_IA  (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         pci[str1] += sign * t1[ia];
                 }
                 t1 += nnorb;
@@ -232,6 +303,9 @@ void FCIcontract_a_1e(double *f1e_tril, double *ci0, double *ci1,
                         ia   = EXTRACT_IA  (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         pci0 = ci0 + str0 * (unsigned long)nstrb;
                         pci1 = ci1 + str1 * (unsigned long)nstrb;
                         tmp = sign * f1e_tril[ia];
@@ -266,6 +340,9 @@ void FCIcontract_b_1e(double *f1e_tril, double *ci0, double *ci1,
                                 ia   = EXTRACT_IA  (tab[j]);
                                 str1 = EXTRACT_ADDR(tab[j]);
                                 sign = EXTRACT_SIGN(tab[j]);
+                                if (sign == 0) {
+                                        break;
+                                }
                                 if (sign > 0) {
                                         pci1[str1] += tmp * f1e_tril[ia];
                                 } else {
@@ -380,12 +457,8 @@ void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
 /* Note: the fillcnt diffs in ctr_rhf2e_kern and spread_a_t1.
  * ctr_rhf2e_kern needs strk+1 beta-strings, spread_a_t1 takes strk
  * beta-strings */
-                        for (strk = MAX(strk0, ib); strk < strk1; strk++) {
-                                pbuf = buf + (strk-strk0)*blen*nnorb;
-                                spread_a_t1(ci1+ib, pbuf,
-                                            MIN(blklenb,strk-ib), strk, norb, na,
-                                            nlink, clink);
-                        }
+                        spread_a_batch(ci1, buf, strk0, MAX(strk0, ib), strk1,
+                                       ib, blen, 1, norb, na, na, nlink, clink);
                 }
         }
         free(clink);
@@ -427,13 +500,8 @@ void FCIcontract_rhf2e_spin1(double *eri, double *ci0, double *ci1,
                                                norb, na, nb, nlinka, nlinkb,
                                                clinka, clinkb);
                         }
-// spread alpha-strings in serial mode
-                        for (ic = 0; ic < strk1; ic++) {
-                                strk = strk0 + ic;
-                                pbuf = buf + ic * blen * nnorb;
-                                spread_a_t1(ci1+ib, pbuf, blen, strk, norb, nb,
-                                            nlinka, clinka);
-                        }
+                        spread_a_batch(ci1, buf, strk0, strk0, strk0+strk1,
+                                       ib, blen, 0, norb, na, nb, nlinka, clinka);
                 }
         }
         free(clinka);
@@ -527,13 +595,8 @@ void FCIcontract_uhf2e(double *eri_aa, double *eri_ab, double *eri_bb,
                                                norb, na, nb, nlinka, nlinkb,
                                                clinka, clinkb);
                         }
-// spread alpha-strings in serial mode
-                        for (ic = 0; ic < strk1; ic++) {
-                                strk = strk0 + ic;
-                                pbuf = buf + ic * blen * nnorb;
-                                spread_a_t1(ci1+ib, pbuf, blen, strk, norb, nb,
-                                            nlinka, clinka);
-                        }
+                        spread_a_batch(ci1, buf, strk0, strk0, strk0+strk1,
+                                       ib, blen, 0, norb, na, nb, nlinka, clinka);
                 }
         }
         free(clinka);
@@ -743,12 +806,58 @@ void FCIpspace_h0tril(double *h0, double *h1e, double *g2e,
  *
  * dimirrep stores the number of occurence for each irrep
  *
+ * When the irreps of the alpha and beta strings (airreps, birreps) are
+ * given, ci0 is assumed to be in the irrep wfnsym.  t1[:,strb] is then
+ * non-zero only for the (ij| pairs of irrep airreps[stra]^birreps[strb]^wfnsym,
+ * and only that block of eri is contracted.
+ *
  ***********************************************************************/
+static void ctr_wfnsym_blocks(double *eri, double *t1, double *tbuf,
+                              int fillcnt, int nnorb, int *dimirrep,
+                              int totirrep, int irab, int *birreps,
+                              int *cols, double *wbuf)
+{
+        const char TRANS_N = 'N';
+        const double D0 = 0;
+        const double D1 = 1;
+        double *a = wbuf;
+        double *b = wbuf + nnorb*fillcnt;
+        int ir, p0, dim, n, j, k;
+
+        memset(tbuf, 0, sizeof(double)*nnorb*fillcnt);
+        for (ir = 0, p0 = 0; ir < totirrep; p0 += dimirrep[ir], ir++) {
+                dim = dimirrep[ir];
+                if (dim == 0) {
+                        continue;
+                }
+                for (n = 0, j = 0; j < fillcnt; j++) {
+                        if ((irab ^ birreps[j]) == ir) {
+                                cols[n] = j;
+                                n++;
+                        }
+                }
+                if (n == 0) {
+                        continue;
+                }
+                for (k = 0; k < n; k++) {
+                        memcpy(a+k*dim, t1+cols[k]*nnorb+p0, sizeof(double)*dim);
+                }
+                dgemm_(&TRANS_N, &TRANS_N, &dim, &n, &dim,
+                       &D1, eri+p0*nnorb+p0, &nnorb, a, &dim,
+                       &D0, b, &dim);
+                for (k = 0; k < n; k++) {
+                        memcpy(tbuf+cols[k]*nnorb+p0, b+k*dim, sizeof(double)*dim);
+                }
+        }
+}
+
 static void ctr_rhf2esym_kern(double *eri, double *ci0, double *ci1, double *tbuf,
                               int fillcnt, int stra_id, int strb_id,
                               int norb, int na, int nb, int nlinka, int nlinkb,
                               _LinkT *clink_indexa, _LinkT *clink_indexb,
-                              int *dimirrep, int totirrep)
+                              int *dimirrep, int totirrep,
+                              int *airreps, int *birreps, int wfnsym,
+                              int *cols, double *wbuf)
 {
         const char TRANS_N = 'N';
         const double D0 = 0;
@@ -758,18 +867,26 @@ static void ctr_rhf2esym_kern(double *eri, double *ci0, double *ci1, double *tbu
         double *t1 = malloc(sizeof(double) * nnorb*fillcnt);
         double csum;
 
+        // prog0_b_t1 initializes t1, it must be called before prog_a_t1
         csum = prog0_b_t1(ci0, t1, fillcnt, stra_id, norb, nb,
-                          nlinkb, clink_indexb+strb_id*nlinkb)
-             + prog_a_t1(ci0+strb_id, t1, fillcnt, stra_id, norb, nb,
-                         nlinka, clink_indexa);
+                          nlinkb, clink_indexb+strb_id*nlinkb);
+        csum += prog_a_t1(ci0+strb_id, t1, fillcnt, stra_id, norb, nb,
+                          nlinka, clink_indexa);
 
         if (csum > CSUMTHR) {
-                for (ir = 0, p0 = 0; ir < totirrep; ir++) {
-                        dgemm_(&TRANS_N, &TRANS_N,
-                               dimirrep+ir, &fillcnt, dimirrep+ir,
-                               &D1, eri+p0*nnorb+p0, &nnorb, t1+p0, &nnorb,
-                               &D0, tbuf+p0, &nnorb);
-                        p0 += dimirrep[ir];
+                if (airreps != NULL) {
+                        ctr_wfnsym_blocks(eri, t1, tbuf, fillcnt, nnorb,
+                                          dimirrep, totirrep,
+                                          airreps[stra_id]^wfnsym,
+                                          birreps+strb_id, cols, wbuf);
+                } else {
+                        for (ir = 0, p0 = 0; ir < totirrep; ir++) {
+                                dgemm_(&TRANS_N, &TRANS_N,
+                                       dimirrep+ir, &fillcnt, dimirrep+ir,
+                                       &D1, eri+p0*nnorb+p0, &nnorb, t1+p0, &nnorb,
+                                       &D0, tbuf+p0, &nnorb);
+                                p0 += dimirrep[ir];
+                        }
                 }
                 spread_b_t1(ci1, tbuf, fillcnt, stra_id, norb, nb,
                             nlinkb, clink_indexb+strb_id*nlinkb);
@@ -782,30 +899,48 @@ static void ctr_rhf2esym_kern(double *eri, double *ci0, double *ci1, double *tbu
 void FCIcontract_rhf2e_spin1_symm(double *eri, double *ci0, double *ci1,
                                   int norb, int na, int nb, int nlinka, int nlinkb,
                                   int *link_indexa, int *link_indexb,
-                                  int *dimirrep, int totirrep)
+                                  int *dimirrep, int totirrep,
+                                  int *airreps, int *birreps, int wfnsym)
 {
-        const int nnorb = norb * (norb+1)/2;
-        const int blklenb = strb_buflen(nb, nnorb);
+        int nnorb = norb * (norb+1)/2;
+        int blklenb = strb_buflen(nb, nnorb);
 
         int ic, strk1, strk0, strk, ib, blen;
         int bufbas = MIN(BUFBASE, nb);
         double *buf = (double *)malloc(sizeof(double) * bufbas*nnorb*blklenb);
         double *pbuf;
+        int *cols;
+        double *wbuf;
+        int row0, row1;
         _LinkT *clinka = malloc(sizeof(_LinkT) * nlinka * na);
         _LinkT *clinkb = malloc(sizeof(_LinkT) * nlinkb * nb);
         compress_link(clinka, link_indexa, na, nlinka);
         compress_link(clinkb, link_indexb, nb, nlinkb);
 
         memset(ci1, 0, sizeof(double)*na*nb);
+// the work space of ctr_wfnsym_blocks is allocated once for each thread
+#pragma omp parallel default(none) \
+        shared(eri, ci0, ci1, norb, na, nb, nlinka, nlinkb, \
+               clinka, clinkb, dimirrep, totirrep, \
+               airreps, birreps, wfnsym, buf, bufbas, nnorb, blklenb), \
+        private(strk0, strk1, ib, blen, strk, ic, pbuf, cols, wbuf, \
+                row0, row1)
+{
+        int nthread = 1;
+        int ithread = 0;
+#if defined HAVE_OPENMP
+        nthread = omp_get_num_threads();
+        ithread = omp_get_thread_num();
+#endif
+// the rows of ci1 owned by this thread in the scatter of the alpha strings
+        row0 = (int)((long)na * ithread / nthread);
+        row1 = (int)((long)na * (ithread+1) / nthread);
+        cols = malloc(sizeof(int) * blklenb);
+        wbuf = malloc(sizeof(double) * nnorb*blklenb*2);
         for (strk0 = 0; strk0 < na; strk0 += bufbas) {
                 strk1 = MIN(na-strk0, bufbas);
                 for (ib = 0; ib < nb; ib += blklenb) {
                         blen = MIN(blklenb, nb-ib);
-#pragma omp parallel default(none) \
-                shared(eri, ci0, ci1, norb, na, nb, nlinka, nlinkb, \
-                       clinka, clinkb, dimirrep, totirrep, \
-                       buf, strk0, strk1, ib, blen), \
-                private(strk, ic, pbuf)
 #pragma omp for schedule(static)
                         for (ic = 0; ic < strk1; ic++) {
                                 strk = strk0 + ic;
@@ -814,17 +949,20 @@ void FCIcontract_rhf2e_spin1_symm(double *eri, double *ci0, double *ci1,
                                                   blen, strk, ib,
                                                   norb, na, nb, nlinka, nlinkb,
                                                   clinka, clinkb,
-                                                  dimirrep, totirrep);
-                        }
-// spread alpha-strings in serial mode
-                        for (ic = 0; ic < strk1; ic++) {
-                                strk = strk0 + ic;
-                                pbuf = buf + ic * blen * nnorb;
-                                spread_a_t1(ci1+ib, pbuf, blen, strk, norb, nb,
-                                            nlinka, clinka);
+                                                  dimirrep, totirrep,
+                                                  airreps, birreps, wfnsym,
+                                                  cols, wbuf);
                         }
+                        spread_a_rows(ci1, buf, strk0, strk0, strk0+strk1,
+                                      ib, blen, 0, norb, nb, nlinka, clinka,
+                                      row0, row1);
+// buf is overwritten by the next batch
+#pragma omp barrier
                 }
         }
+        free(cols);
+        free(wbuf);
+}
         free(clinka);
         free(clinkb);
         free(buf);
@@ -832,10 +970,12 @@ void FCIcontract_rhf2e_spin1_symm(double *eri, double *ci0, double *ci1,
 
 void FCIcontract_2e_ms0_symm(double *eri, double *ci0, double *ci1,
                              int norb, int na, int nlink, int *link_index,
-                             int *dimirrep, int totirrep)
+                             int *dimirrep, int totirrep,
+                             int *strsirrep, int wfnsym)
 {
         FCIcontract_rhf2e_spin1_symm(eri, ci0, ci1, norb, na, na, nlink, nlink,
-                                     link_index, link_index, dimirrep,totirrep);
+                                     link_index, link_index, dimirrep,totirrep,
+                                     strsirrep, strsirrep, wfnsym);
 }
 
 void FCIcontract_2e_spin0_symm(double *eri, double *ci0, double *ci1,
@@ -869,21 +1009,238 @@ void FCIcontract_2e_spin0_symm(double *eri, double *ci0, double *ci1,
                                                   MIN(blklenb, strk+1-ib), strk, ib,
                                                   norb, na, na, nlink, nlink,
                                                   clink, clink,
-                                                  dimirrep, totirrep);
+                                                  dimirrep, totirrep,
+                                                  NULL, NULL, 0, NULL, NULL);
                 }
 
 /* Note: the fillcnt diffs in ctr_rhf2e_kern and spread_a_t1.
  * ctr_rhf2e_kern needs strk+1 beta-strings, spread_a_t1 takes strk
  * beta-strings */
-                        for (strk = MAX(strk0, ib); strk < strk1; strk++) {
-                                pbuf = buf + (strk-strk0)*blen*nnorb;
-                                spread_a_t1(ci1+ib, pbuf,
-                                            MIN(blklenb,strk-ib), strk, norb, na,
-                                            nlink, clink);
-                        }
+                        spread_a_batch(ci1, buf, strk0, MAX(strk0, ib), strk1,
+                                       ib, blen, 1, norb, na, na, nlink, clink);
                 }
         }
         free(clink);
         free(buf);
 }
 
+
+
+/*
+ * Single precision FCIcontract_rhf2e_spin1.  eri, ci0 and ci1 are float32.
+ * The t1 gather, the t1*eri GEMM and the scatter follow the double precision
+ * code; the sum of squares that screens t1 is accumulated in double.  It is
+ * used by the early iterations of the mixed precision Davidson solver.
+ */
+static double prog_a_t1_float(float *ci0, float *t1, int fillcnt, int stra_id,
+                              int norb, int nstrb, int nlinka,
+                              _LinkT *clink_indexa)
+{
+        const int nnorb = norb * (norb+1)/2;
+        int j, k, ia, str1, sign;
+        const _LinkT *tab = clink_indexa + stra_id * nlinka;
+        float *pt1, *pci;
+        double csum = 0;
+
+        for (j = 0; j < nlinka; j++) {
+                ia   = EXTRACT_IA  (tab[j]);
+                str1 = EXTRACT_ADDR(tab[j]);
+                sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
+                pt1 = t1 + ia;
+                pci = ci0 + str1*(unsigned long)nstrb;
+                if (sign > 0) {
+                        for (k = 0; k < fillcnt; k++) {
+                                pt1[k*nnorb] += pci[k];
+                                csum += pci[k] * pci[k];
+                        }
+                } else {
+                        for (k = 0; k < fillcnt; k++) {
+                                pt1[k*nnorb] -= pci[k];
+                                csum += pci[k] * pci[k];
+                        }
+                }
+        }
+        return csum;
+}
+
+static double prog0_b_t1_float(float *ci0, float *t1, int fillcnt, int stra_id,
+                               int norb, int nstrb, int nlinkb,
+                               _LinkT *clink_indexb)
+{
+        const int nnorb = norb * (norb+1)/2;
+        int j, ia, str0, str1, sign;
+        const _LinkT *tab = clink_indexb;
+        float *pci = ci0 + stra_id*(unsigned long)nstrb;
+        double csum = 0;
+
+        for (str0 = 0; str0 < fillcnt; str0++) {
+                memset(t1, 0, sizeof(float)*nnorb);
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
+                        t1[ia] += sign * pci[str1];
+                        csum += pci[str1] * pci[str1];
+                }
+                t1 += nnorb;
+                tab += nlinkb;
+        }
+        return csum;
+}
+
+static void spread_a_t1_float(float *ci1, float *t1, int fillcnt, int stra_id,
+                              int norb, int nstrb, int nlinka,
+                              _LinkT *clink_indexa, int row0, int row1)
+{
+        const int nnorb = norb * (norb+1)/2;
+        int j, k, ia, str1, sign;
+        const _LinkT *tab = clink_indexa + stra_id * nlinka;
+        float *cp0, *cp1;
+
+        for (j = 0; j < nlinka; j++) {
+                ia   = EXTRACT_IA  (tab[j]);
+                str1 = EXTRACT_ADDR(tab[j]);
+                sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
+                if (str1 < row0 || str1 >= row1) {
+                        continue;
+                }
+                cp0 = t1 + ia;
+                cp1 = ci1 + str1*(unsigned long)nstrb;
+                if (sign > 0) {
+                        for (k = 0; k < fillcnt; k++) {
+                                cp1[k] += cp0[k*nnorb];
+                        }
+                } else {
+                        for (k = 0; k < fillcnt; k++) {
+                                cp1[k] -= cp0[k*nnorb];
+                        }
+                }
+        }
+}
+
+static void spread_b_t1_float(float *ci1, float *t1, int fillcnt, int stra_id,
+                              int norb, int nstrb, int nlinkb,
+                              _LinkT *clink_indexb)
+{
+        const int nnorb = norb * (norb+1)/2;
+        int j, ia, str0, str1, sign;
+        const _LinkT *tab = clink_indexb;
+        float *pci = ci1 + stra_id * (unsigned long)nstrb;
+
+        for (str0 = 0; str0 < fillcnt; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
+                        pci[str1] += sign * t1[ia];
+                }
+                t1 += nnorb;
+                tab += nlinkb;
+        }
+}
+
+static void ctr_rhf2e_kern_float(float *eri, float *ci0, float *ci1,
+                                 float *tbuf, float *t1,
+                                 int fillcnt, int stra_id, int strb_id,
+                                 int norb, int na, int nb,
+                                 int nlinka, int nlinkb,
+                                 _LinkT *clink_indexa, _LinkT *clink_indexb)
+{
+        const char TRANS_N = 'N';
+        const float D0 = 0;
+        const float D1 = 1;
+        const int nnorb = norb * (norb+1)/2;
+        double csum;
+
+        csum = prog0_b_t1_float(ci0, t1, fillcnt, stra_id, norb, nb,
+                                nlinkb, clink_indexb+strb_id*nlinkb)
+             + prog_a_t1_float(ci0+strb_id, t1, fillcnt, stra_id, norb, nb,
+                               nlinka, clink_indexa);
+
+        if (csum > CSUMTHR) {
+                sgemm_(&TRANS_N, &TRANS_N, &nnorb, &fillcnt, &nnorb,
+                       &D1, eri, &nnorb, t1, &nnorb,
+                       &D0, tbuf, &nnorb);
+                spread_b_t1_float(ci1, tbuf, fillcnt, stra_id, norb, nb,
+                                  nlinkb, clink_indexb+strb_id*nlinkb);
+        } else {
+                memset(tbuf, 0, sizeof(float)*nnorb*fillcnt);
+        }
+}
+
+void FCIcontract_rhf2e_spin1_float(float *eri, float *ci0, float *ci1,
+                                   int norb, int na, int nb,
+                                   int nlinka, int nlinkb,
+                                   int *link_indexa, int *link_indexb)
+{
+        int nnorb = norb * (norb+1)/2;
+        int blklenb = strb_buflen(nb, nnorb);
+
+        int ic, k, strk1, strk0, strk, ib, blen;
+        int bufbas = MIN(BUFBASE, nb);
+        float *buf = malloc(sizeof(float) * bufbas*nnorb*blklenb);
+        float *pbuf;
+        float *t1;
+        int row0, row1;
+        _LinkT *clinka = malloc(sizeof(_LinkT) * nlinka * na);
+        _LinkT *clinkb = malloc(sizeof(_LinkT) * nlinkb * nb);
+        compress_link(clinka, link_indexa, na, nlinka);
+        compress_link(clinkb, link_indexb, nb, nlinkb);
+
+        memset(ci1, 0, sizeof(float)*na*nb);
+#pragma omp parallel default(none) \
+        shared(eri, ci0, ci1, norb, na, nb, nlinka, nlinkb, \
+               clinka, clinkb, buf, bufbas, nnorb, blklenb), \
+        private(strk0, strk1, ib, blen, strk, ic, k, pbuf, t1, row0, row1)
+{
+        int nthread = 1;
+        int ithread = 0;
+#if defined HAVE_OPENMP
+        nthread = omp_get_num_threads();
+        ithread = omp_get_thread_num();
+#endif
+// the rows of ci1 owned by this thread in the scatter of the alpha strings
+        row0 = (int)((long)na * ithread / nthread);
+        row1 = (int)((long)na * (ithread+1) / nthread);
+        t1 = malloc(sizeof(float) * nnorb*blklenb);
+        for (strk0 = 0; strk0 < na; strk0 += bufbas) {
+                strk1 = MIN(na-strk0, bufbas);
+                for (ib = 0; ib < nb; ib += blklenb) {
+                        blen = MIN(blklenb, nb-ib);
+#pragma omp for schedule(static)
+                        for (ic = 0; ic < strk1; ic++) {
+                                strk = strk0 + ic;
+                                pbuf = buf + ic * blen * nnorb;
+                                ctr_rhf2e_kern_float(eri, ci0, ci1, pbuf, t1,
+                                                     blen, strk, ib,
+                                                     norb, na, nb,
+                                                     nlinka, nlinkb,
+                                                     clinka, clinkb);
+                        }
+                        for (k = 0; k < strk1; k++) {
+                                spread_a_t1_float(ci1+ib, buf+k*blen*nnorb,
+                                                  blen, strk0+k, norb, nb,
+                                                  nlinka, clinka, row0, row1);
+                        }
+// buf is overwritten by the next batch
+#pragma omp barrier
+                }
+        }
+        free(t1);
+}
+        free(clinka);
+        free(clinkb);
+        free(buf);
+}
@@ -70,6 +70,9 @@ static double rdm2_a_t1(double *ci0, double *t1,
                 a    = EXTRACT_A   (tab[j]);
                 str1 = EXTRACT_ADDR(tab[j]);
                 sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
                 pci = ci0 + str1*nstrb;
                 pt1 = t1 + i*norb+a;
                 if (sign > 0) {
@@ -104,6 +107,9 @@ static double rdm2_b_t1(double *ci0, double *t1,
                         a    = EXTRACT_A   (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         t1[i*norb+a] += sign * pci[str1];
                         csum += pci[str1] * pci[str1];
                 }
@@ -129,6 +135,9 @@ static double rdm2_0b_t1(double *ci0, double *t1,
                         a    = EXTRACT_A   (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         t1[i*norb+a] += sign * pci[str1];
                         csum += pci[str1] * pci[str1];
                 }
@@ -144,8 +153,8 @@ double FCI_t1ci_ms0(double *ci0, double *t1, int bcount,
 {
         double csum;
         csum = rdm2_0b_t1(ci0, t1, bcount, stra_id, strb_id,
-                          norb, na, nlink, clink_index)
-             + rdm2_a_t1 (ci0, t1, bcount, stra_id, strb_id,
+                          norb, na, nlink, clink_index);
+        csum += rdm2_a_t1(ci0, t1, bcount, stra_id, strb_id,
                           norb, na, nlink, clink_index);
         return csum;
 }
@@ -203,6 +212,27 @@ static void _transpose_jikl(double *dm2, int norb)
         free(tmp);
 }
 
+/*
+ * Fill the upper triangular part of rdm1 and rdm2 which are accumulated by
+ * dsyrk, then transpose rdm2 to the order [p q^+ r^+ s]
+ */
+static void _rdm12_braket_symm(double *rdm1, double *rdm2, int norb)
+{
+        int nnorb = norb * norb;
+        int i, j;
+        for (i = 0; i < norb; i++) {
+                for (j = 0; j < i; j++) {
+                        rdm1[j*norb+i] = rdm1[i*norb+j];
+                }
+        }
+        for (i = 0; i < nnorb; i++) {
+                for (j = 0; j < i; j++) {
+                        rdm2[j*nnorb+i] = rdm2[i*nnorb+j];
+                }
+        }
+        _transpose_jikl(rdm2, norb);
+}
+
 /*
  * Note! The returned rdm2 from FCI*kern* function corresponds to
  *      [(p^+ q on <bra|) r^+ s] = [p q^+ r^+ s]
@@ -271,17 +301,7 @@ void FCIrdm12_drv(void (*dm12kernel)(),
         free(clinkb);
         switch (symm) {
         case BRAKETSYM:
-                for (i = 0; i < norb; i++) {
-                        for (j = 0; j < i; j++) {
-                                rdm1[j*norb+i] = rdm1[i*norb+j];
-                        }
-                }
-                for (i = 0; i < nnorb; i++) {
-                        for (j = 0; j < i; j++) {
-                                rdm2[j*nnorb+i] = rdm2[i*nnorb+j];
-                        }
-                }
-                _transpose_jikl(rdm2, norb);
+                _rdm12_braket_symm(rdm1, rdm2, norb);
                 break;
         case PARTICLESYM:
 // right 2pdm order is required here,  which transposes the cre/des on bra
@@ -379,16 +399,16 @@ void FCIrdm12kern_spin0(double *rdm1, double *rdm2, double *bra, double *ket,
                 fill0 = bcount;
                 fill1 = bcount;
                 csum = rdm2_0b_t1(ket, buf, fill0, stra_id, strb_id,
-                                  norb, na, nlinka, clink_indexa)
-                     + rdm2_a_t1 (ket, buf, fill1, stra_id, strb_id,
+                                  norb, na, nlinka, clink_indexa);
+                csum += rdm2_a_t1(ket, buf, fill1, stra_id, strb_id,
                                   norb, na, nlinka, clink_indexa);
         } else if (stra_id >= strb_id) {
                 fill0 = stra_id - strb_id;
                 fill1 = stra_id - strb_id + 1;
                 memset(buf+fill0*nnorb, 0, sizeof(double)*nnorb);
                 csum = rdm2_0b_t1(ket, buf, fill0, stra_id, strb_id,
-                                  norb, na, nlinka, clink_indexa)
-                     + rdm2_a_t1 (ket, buf, fill1, stra_id, strb_id,
+                                  norb, na, nlinka, clink_indexa);
+                csum += rdm2_a_t1(ket, buf, fill1, stra_id, strb_id,
                                   norb, na, nlinka, clink_indexa);
         }
         if (csum > CSUMTHR) {
@@ -653,6 +673,389 @@ _normal_end:
         free(bufa);
 }
 
+/*
+ * ***********************************************
+ * spin-free 2pdm kernel for any number of alpha and beta electrons.
+ * The alpha and beta excitations are gathered in the same t1, so the
+ * spin-traced (t)dm12 is obtained in one pass over the link tables
+ * instead of the separated aa, bb, ab (and ba) passes.
+ * ***********************************************
+ */
+static double t1ci_sf(double *ci0, double *t1, int bcount,
+                      int stra_id, int strb_id, int norb, int nb,
+                      int nlinka, int nlinkb,
+                      _LinkT *clink_indexa, _LinkT *clink_indexb)
+{
+        double csum;
+        // rdm2_0b_t1 initializes t1, it must be called before rdm2_a_t1
+        csum = rdm2_0b_t1(ci0, t1, bcount, stra_id, strb_id,
+                          norb, nb, nlinkb, clink_indexb);
+        csum += rdm2_a_t1(ci0, t1, bcount, stra_id, strb_id,
+                          norb, nb, nlinka, clink_indexa);
+        return csum;
+}
+
+void FCIrdm12kern_sf(double *rdm1, double *rdm2, double *bra, double *ket,
+                     int bcount, int stra_id, int strb_id,
+                     int norb, int na, int nb, int nlinka, int nlinkb,
+                     _LinkT *clink_indexa, _LinkT *clink_indexb, int symm)
+{
+        const int INC1 = 1;
+        const char UP = 'U';
+        const char TRANS_N = 'N';
+        const char TRANS_T = 'T';
+        const double D1 = 1;
+        const int nnorb = norb * norb;
+        double csum;
+        double *buf = malloc(sizeof(double) * nnorb * bcount);
+
+        csum = t1ci_sf(ket, buf, bcount, stra_id, strb_id,
+                       norb, nb, nlinka, nlinkb, clink_indexa, clink_indexb);
+        if (csum > CSUMTHR) {
+                dgemv_(&TRANS_N, &nnorb, &bcount, &D1, buf, &nnorb,
+                       ket+stra_id*nb+strb_id, &INC1, &D1, rdm1, &INC1);
+                switch (symm) {
+                case BRAKETSYM:
+                        dsyrk_(&UP, &TRANS_N, &nnorb, &bcount,
+                               &D1, buf, &nnorb, &D1, rdm2, &nnorb);
+                        break;
+                case PARTICLESYM:
+                        tril_particle_symm(rdm2, buf, buf, bcount, norb, 1, 1);
+                        break;
+                default:
+                        dgemm_(&TRANS_N, &TRANS_T, &nnorb, &nnorb, &bcount,
+                               &D1, buf, &nnorb, buf, &nnorb,
+                               &D1, rdm2, &nnorb);
+                }
+        }
+        free(buf);
+}
+
+void FCItdm12kern_sf(double *tdm1, double *tdm2, double *bra, double *ket,
+                     int bcount, int stra_id, int strb_id,
+                     int norb, int na, int nb, int nlinka, int nlinkb,
+                     _LinkT *clink_indexa, _LinkT *clink_indexb, int symm)
+{
+        const int INC1 = 1;
+        const char TRANS_N = 'N';
+        const char TRANS_T = 'T';
+        const double D1 = 1;
+        const int nnorb = norb * norb;
+        double csum;
+        double *buf0 = malloc(sizeof(double) * nnorb*bcount);
+        double *buf1 = malloc(sizeof(double) * nnorb*bcount);
+
+        csum = t1ci_sf(bra, buf1, bcount, stra_id, strb_id,
+                       norb, nb, nlinka, nlinkb, clink_indexa, clink_indexb);
+        if (csum < CSUMTHR) { goto _normal_end; }
+        csum = t1ci_sf(ket, buf0, bcount, stra_id, strb_id,
+                       norb, nb, nlinka, nlinkb, clink_indexa, clink_indexb);
+        if (csum < CSUMTHR) { goto _normal_end; }
+        dgemv_(&TRANS_N, &nnorb, &bcount, &D1, buf0, &nnorb,
+               bra+stra_id*nb+strb_id, &INC1, &D1, tdm1, &INC1);
+        switch (symm) {
+        case PARTICLESYM:
+                tril_particle_symm(tdm2, buf1, buf0, bcount, norb, D1, D1);
+                break;
+        default:
+                dgemm_(&TRANS_N, &TRANS_T, &nnorb, &nnorb, &bcount,
+                       &D1, buf0, &nnorb, buf1, &nnorb,
+                       &D1, tdm2, &nnorb);
+        }
+_normal_end:
+        free(buf0);
+        free(buf1);
+}
+
+/*
+ * Spin-traced transition 1- and 2-pdm of all pairs (bras[ibra], kets[iket]).
+ * The t1 intermediates of each bra and ket are computed once for a block
+ * of strings, and all pairs are contracted in one GEMM over the block.
+ * Output:
+ *      tdm1[ibra,iket,:nnorb]
+ *      tdm2[ibra,:nnorb,iket,:nnorb], in the order of FCItdm12kern_sf with
+ *              symm=0 before _transpose_jikl
+ */
+void FCItdm12_batch_drv(double *tdm1, double *tdm2, double *bras, double *kets,
+                        int nbra, int nket, int norb, int na, int nb,
+                        int nlinka, int nlinkb,
+                        int *link_indexa, int *link_indexb, int with_tdm2)
+{
+        int nnorb = norb * norb;
+        int bufbase = MIN(BUFBASE, nb);
+        size_t nstr = (size_t)na * nb;
+        int M = nbra * nnorb;
+        int N = nket * nnorb;
+        double *kbuf = malloc(sizeof(double) * bufbase * N);
+        double *bbuf = malloc(sizeof(double) * bufbase * M);
+        double *cibuf = malloc(sizeof(double) * bufbase * nbra);
+        _LinkT *clinka = malloc(sizeof(_LinkT) * nlinka * na);
+        _LinkT *clinkb = malloc(sizeof(_LinkT) * nlinkb * nb);
+        compress_link(clinka, link_indexa, norb, na, nlinka);
+        compress_link(clinkb, link_indexb, norb, nb, nlinkb);
+        memset(tdm1, 0, sizeof(double) * nbra*N);
+        if (with_tdm2) {
+                memset(tdm2, 0, sizeof(double) * (size_t)M*N);
+        }
+
+#pragma omp parallel default(none) \
+        shared(tdm1, tdm2, bras, kets, nbra, nket, norb, na, nb, \
+               nlinka, nlinkb, with_tdm2, kbuf, bbuf, cibuf, clinka, clinkb, \
+               nnorb, bufbase, nstr, M, N)
+{
+        const char TRANS_N = 'N';
+        const char TRANS_T = 'T';
+        const double D1 = 1;
+        int strk, ib, blen, i, k, s;
+        double *t1 = malloc(sizeof(double) * nnorb * bufbase);
+        for (strk = 0; strk < na; strk++) {
+        for (ib = 0; ib < nb; ib += bufbase) {
+                blen = MIN(bufbase, nb-ib);
+#pragma omp for schedule(dynamic)
+                for (i = 0; i < nket+nbra; i++) {
+                        if (i < nket) {
+                                t1ci_sf(kets+i*nstr, t1, blen, strk, ib, norb,
+                                        nb, nlinka, nlinkb, clinka, clinkb);
+                                for (s = 0; s < blen; s++) {
+                                        memcpy(kbuf+(s*nket+i)*nnorb, t1+s*nnorb,
+                                               sizeof(double)*nnorb);
+                                }
+                        } else if (with_tdm2) {
+                                k = i - nket;
+                                t1ci_sf(bras+k*nstr, t1, blen, strk, ib, norb,
+                                        nb, nlinka, nlinkb, clinka, clinkb);
+                                for (s = 0; s < blen; s++) {
+                                        memcpy(bbuf+(s*nbra+k)*nnorb, t1+s*nnorb,
+                                               sizeof(double)*nnorb);
+                                }
+                        }
+                }
+
+                if (with_tdm2) {
+#pragma omp for schedule(static)
+                        for (k = 0; k < nbra; k++) {
+                                dgemm_(&TRANS_N, &TRANS_T, &N, &nnorb, &blen,
+                                       &D1, kbuf, &N, bbuf+k*nnorb, &M,
+                                       &D1, tdm2+(size_t)k*nnorb*N, &N);
+                        }
+                }
+#pragma omp single
+{
+                for (k = 0; k < nbra; k++) {
+                        for (s = 0; s < blen; s++) {
+                                cibuf[k*blen+s] = bras[k*nstr+strk*nb+ib+s];
+                        }
+                }
+                dgemm_(&TRANS_N, &TRANS_N, &N, &nbra, &blen,
+                       &D1, kbuf, &N, cibuf, &blen, &D1, tdm1, &N);
+}
+        } }
+        free(t1);
+}
+        free(kbuf);
+        free(bbuf);
+        free(cibuf);
+        free(clinka);
+        free(clinkb);
+}
+
+/*
+ * The sigma vector ci1 = H ci0 and the spin-traced 1- and 2-pdm of ci0 in
+ * one pass.  For each block of strings, the t1 intermediate of ci0 is
+ * gathered once (t1ci_sf) and is used by both the 2-pdm (dsyrk) and the
+ * sigma vector (dgemm with eri).
+ * eri is the 4-fold symmetric 2e hamiltonian from absorb_h1e.  Since eri is
+ * symmetric in the pair index, t1 is folded to the lower triangular pair
+ * index before the dgemm, as prog_a_t1/prog0_b_t1 of fci_contract.c do.
+ * link_indexa/link_indexb are generated by gen_linkstr_index.  rdm1 and rdm2
+ * have the order of FCIrdm12_drv with symm=BRAKETSYM.
+ */
+static void fold_t1_tril(double *t1tril, double *t1, int bcount, int norb)
+{
+        const int nnorb = norb * norb;
+        const int npair = norb * (norb+1)/2;
+        int i, j, k, ij;
+        for (k = 0; k < bcount; k++) {
+                for (ij = 0, i = 0; i < norb; i++) {
+                        for (j = 0; j < i; j++, ij++) {
+                                t1tril[ij] = t1[i*norb+j] + t1[j*norb+i];
+                        }
+                        t1tril[ij] = t1[i*norb+i];
+                        ij++;
+                }
+                t1tril += npair;
+                t1 += nnorb;
+        }
+}
+
+static void spread_b_tril(double *ci1, double *tbuf, int bcount, int stra_id,
+                          int strb_id, int norb, int nb, int nlinkb,
+                          _LinkT *clink_indexb)
+{
+        const int npair = norb * (norb+1)/2;
+        int j, i, a, ia, str0, str1, sign;
+        const _LinkT *tab = clink_indexb + strb_id * nlinkb;
+        double *pci = ci1 + stra_id * (size_t)nb;
+
+        for (str0 = 0; str0 < bcount; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        i    = EXTRACT_I   (tab[j]);
+                        a    = EXTRACT_A   (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
+                        ia = (a >= i) ? (a*(a+1)/2+i) : (i*(i+1)/2+a);
+                        pci[str1] += sign * tbuf[ia];
+                }
+                tbuf += npair;
+                tab += nlinkb;
+        }
+}
+
+/*
+ * Only the rows [row0:row1] of ci1 are updated
+ */
+static void spread_a_tril(double *ci1, double *tbuf, int bcount, int stra_id,
+                          int strb_id, int norb, int nb, int nlinka,
+                          _LinkT *clink_indexa, int row0, int row1)
+{
+        const int npair = norb * (norb+1)/2;
+        int j, k, i, a, ia, str1, sign;
+        const _LinkT *tab = clink_indexa + stra_id * nlinka;
+        double *cp0, *cp1;
+
+        for (j = 0; j < nlinka; j++) {
+                i    = EXTRACT_I   (tab[j]);
+                a    = EXTRACT_A   (tab[j]);
+                str1 = EXTRACT_ADDR(tab[j]);
+                sign = EXTRACT_SIGN(tab[j]);
+                if (sign == 0) {
+                        break;
+                }
+                if (str1 < row0 || str1 >= row1) {
+                        continue;
+                }
+                ia = (a >= i) ? (a*(a+1)/2+i) : (i*(i+1)/2+a);
+                cp0 = tbuf + ia;
+                cp1 = ci1 + str1 * (size_t)nb + strb_id;
+                if (sign > 0) {
+                        for (k = 0; k < bcount; k++) {
+                                cp1[k] += cp0[k*npair];
+                        }
+                } else {
+                        for (k = 0; k < bcount; k++) {
+                                cp1[k] -= cp0[k*npair];
+                        }
+                }
+        }
+}
+
+void FCIcontract_2e_rdm12_spin1(double *eri, double *ci0, double *ci1,
+                                double *rdm1, double *rdm2,
+                                int norb, int na, int nb,
+                                int nlinka, int nlinkb,
+                                int *link_indexa, int *link_indexb)
+{
+        int nnorb = norb * norb;
+        int npair = norb * (norb+1)/2;
+        int bufbase = MIN(BUFBASE, nb);
+        int bufa = MIN(BUFBASE, na);
+        double *buf = malloc(sizeof(double) * bufa*bufbase*npair);
+        _LinkT *clinka = malloc(sizeof(_LinkT) * nlinka * na);
+        _LinkT *clinkb = malloc(sizeof(_LinkT) * nlinkb * nb);
+        compress_link(clinka, link_indexa, norb, na, nlinka);
+        compress_link(clinkb, link_indexb, norb, nb, nlinkb);
+        memset(ci1, 0, sizeof(double) * na*nb);
+        memset(rdm1, 0, sizeof(double) * nnorb);
+        memset(rdm2, 0, sizeof(double) * nnorb*nnorb);
+
+#pragma omp parallel default(none) \
+        shared(eri, ci0, ci1, rdm1, rdm2, norb, na, nb, nlinka, nlinkb, \
+               clinka, clinkb, buf, nnorb, npair, bufbase, bufa)
+{
+        const int INC1 = 1;
+        const char UP = 'U';
+        const char TRANS_N = 'N';
+        const double D0 = 0;
+        const double D1 = 1;
+        int strk0, nstrk, strk, ic, ib, blen, i;
+        int row0, row1;
+        int nthread = 1;
+        int ithread = 0;
+        double csum;
+        double *pbuf;
+        double *t1 = malloc(sizeof(double) * nnorb*bufbase);
+        double *t1tril = malloc(sizeof(double) * npair*bufbase);
+        double *pdm1 = malloc(sizeof(double) * nnorb);
+        double *pdm2 = malloc(sizeof(double) * nnorb*nnorb);
+        memset(pdm1, 0, sizeof(double) * nnorb);
+        memset(pdm2, 0, sizeof(double) * nnorb*nnorb);
+#if defined HAVE_OPENMP
+        nthread = omp_get_num_threads();
+        ithread = omp_get_thread_num();
+#endif
+// the rows of ci1 owned by this thread in the scatter of the alpha strings
+        row0 = (int)((long)na * ithread / nthread);
+        row1 = (int)((long)na * (ithread+1) / nthread);
+        for (strk0 = 0; strk0 < na; strk0 += bufa) {
+                nstrk = MIN(bufa, na-strk0);
+                for (ib = 0; ib < nb; ib += bufbase) {
+                        blen = MIN(bufbase, nb-ib);
+#pragma omp for schedule(static)
+                        for (ic = 0; ic < nstrk; ic++) {
+                                strk = strk0 + ic;
+                                pbuf = buf + ic * blen * npair;
+                                csum = t1ci_sf(ci0, t1, blen, strk, ib,
+                                               norb, nb, nlinka, nlinkb,
+                                               clinka, clinkb);
+                                if (csum < CSUMTHR) {
+                                        memset(pbuf, 0, sizeof(double)*blen*npair);
+                                        continue;
+                                }
+                                dgemv_(&TRANS_N, &nnorb, &blen, &D1, t1, &nnorb,
+                                       ci0+strk*(size_t)nb+ib, &INC1,
+                                       &D1, pdm1, &INC1);
+                                dsyrk_(&UP, &TRANS_N, &nnorb, &blen,
+                                       &D1, t1, &nnorb, &D1, pdm2, &nnorb);
+                                fold_t1_tril(t1tril, t1, blen, norb);
+                                dgemm_(&TRANS_N, &TRANS_N, &npair, &blen, &npair,
+                                       &D1, eri, &npair, t1tril, &npair,
+                                       &D0, pbuf, &npair);
+// the beta excitations only change the row strk of ci1
+                                spread_b_tril(ci1, pbuf, blen, strk, ib,
+                                              norb, nb, nlinkb, clinkb);
+                        }
+                        for (ic = 0; ic < nstrk; ic++) {
+                                spread_a_tril(ci1, buf+ic*blen*npair, blen,
+                                              strk0+ic, ib, norb, nb, nlinka,
+                                              clinka, row0, row1);
+                        }
+// buf is overwritten by the next batch
+#pragma omp barrier
+                }
+        }
+#pragma omp critical
+{
+        for (i = 0; i < nnorb; i++) {
+                rdm1[i] += pdm1[i];
+        }
+        for (i = 0; i < nnorb*nnorb; i++) {
+                rdm2[i] += pdm2[i];
+        }
+}
+        free(t1);
+        free(t1tril);
+        free(pdm1);
+        free(pdm2);
+}
+        free(buf);
+        free(clinka);
+        free(clinkb);
+        _rdm12_braket_symm(rdm1, rdm2, norb);
+}
+
 /*
  * ***********************************************
  * 1-pdm
@@ -678,6 +1081,9 @@ void FCItrans_rdm1a(double *rdm1, double *bra, double *ket,
                         a    = EXTRACT_A   (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         pbra = bra + str1 * nb;
                         for (k = 0; k < nb; k++) {
                                 rdm1[a*norb+i] += sign*pbra[k]*pket[k];
@@ -711,6 +1117,9 @@ void FCItrans_rdm1b(double *rdm1, double *bra, double *ket,
                                 a    = EXTRACT_A   (tab[j]);
                                 str1 = EXTRACT_ADDR(tab[j]);
                                 sign = EXTRACT_SIGN(tab[j]);
+                                if (sign == 0) {
+                                        break;
+                                }
                                 rdm1[a*norb+i] += sign*pbra[str1]*tmp;
                         }
                 }
@@ -742,6 +1151,9 @@ void FCImake_rdm1a(double *rdm1, double *cibra, double *ciket,
                         a    = EXTRACT_A   (tab[j]);
                         str1 = EXTRACT_ADDR(tab[j]);
                         sign = EXTRACT_SIGN(tab[j]);
+                        if (sign == 0) {
+                                break;
+                        }
                         pci1 = ci0 + str1 * nb;
                         if (a >= i) {
                                 if (sign > 0) {
@@ -788,6 +1200,9 @@ void FCImake_rdm1b(double *rdm1, double *cibra, double *ciket,
                                 a    = EXTRACT_A   (tab[j]);
                                 str1 = EXTRACT_ADDR(tab[j]);
                                 sign = EXTRACT_SIGN(tab[j]);
+                                if (sign == 0) {
+                                        break;
+                                }
                                 if (a >= i) {
                                         if (sign > 0) {
                                                 rdm1[a*norb+i] += pci0[str1]*tmp;
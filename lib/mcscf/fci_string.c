@@ -70,14 +70,12 @@ static int binomial(int n, int m)
 {
         int i;
         unsigned long num = 1;
-        unsigned long div = 1;
+        // num*(m+i+1) is always divisible by (i+1), the intermediate
+        // products do not overflow for large n
         for (i = 0; i < n-m; i++) {
-                num *= m+i+1;
+                num = num * (m+i+1) / (i+1);
         }
-        for (i = 0; i < n-m; i++) {
-                div *= i+1;
-        }
-        return num / div;
+        return num;
 }
 
 int FCIstr2addr(int norb, int nelec, unsigned long string)
@@ -88,7 +86,7 @@ int FCIstr2addr(int norb, int nelec, unsigned long string)
         for (norb_left = norb - 1; norb_left >= 0; norb_left--) {
                 if (nelec_left == 0 || norb_left < nelec_left) {
                         break;
-                } else if ((1<<norb_left) & string) {
+                } else if ((1UL<<norb_left) & string) {
                         addr += binomial(norb_left, nelec_left);
                         nelec_left--;
                 }
@@ -96,6 +94,128 @@ int FCIstr2addr(int norb, int nelec, unsigned long string)
         return addr;
 }
 
+unsigned long FCIaddr2str(int norb, int nelec, int addr)
+{
+        unsigned long str1 = 0;
+        int nelec_left = nelec;
+        int norb_left;
+        if (addr == 0 || nelec == norb || nelec == 0) {
+                return (1UL<<nelec) - 1;
+        }
+        for (norb_left = norb - 1; norb_left >= 0; norb_left--) {
+                if (nelec_left == 0) {
+                        break;
+                } else if (addr == 0) {
+                        str1 |= (1UL<<nelec_left) - 1;
+                        break;
+                } else if (binomial(norb_left, nelec_left) <= addr) {
+                        str1 |= 1UL<<norb_left;
+                        addr -= binomial(norb_left, nelec_left);
+                        nelec_left--;
+                }
+        }
+        return str1;
+}
+
+/*
+ * Batched conversions between addresses and strings
+ */
+void FCIstrs2addr(int *addrs, unsigned long *strs, int count,
+                  int norb, int nelec)
+{
+        int i;
+#pragma omp parallel for default(none) \
+        shared(addrs, strs, count, norb, nelec) private(i)
+        for (i = 0; i < count; i++) {
+                addrs[i] = FCIstr2addr(norb, nelec, strs[i]);
+        }
+}
+
+void FCIaddrs2str(unsigned long *strs, int *addrs, int count,
+                  int norb, int nelec)
+{
+        int i;
+#pragma omp parallel for default(none) \
+        shared(addrs, strs, count, norb, nelec) private(i)
+        for (i = 0; i < count; i++) {
+                strs[i] = FCIaddr2str(norb, nelec, addrs[i]);
+        }
+}
+
+void FCIparity_strs(int *signs, unsigned long *strs0, unsigned long *strs1,
+                    int count)
+{
+        int i;
+#pragma omp parallel for default(none) \
+        shared(signs, strs0, strs1, count) private(i)
+        for (i = 0; i < count; i++) {
+                signs[i] = FCIparity(strs0[i], strs1[i]);
+        }
+}
+
+/*
+ * All strings of nelec electrons in norb orbitals, in lexical order.
+ * The next string is the next larger integer with the same number of
+ * bits (Gosper's hack).
+ */
+void FCIgen_strings(unsigned long *strs, int norb, int nelec, int count)
+{
+        int i;
+        unsigned long x = (1UL<<nelec) - 1;
+        unsigned long c, r;
+        strs[0] = x;
+        for (i = 1; i < count; i++) {
+                c = x & (~x + 1);
+                r = x + c;
+                x = (((r ^ x) >> 2) / c) | r;
+                strs[i] = x;
+        }
+}
+
+/*
+ * link_index[str0] = [i, i*(i+1)/2, str1, sign] for each orbital i which
+ * can be created in (cre_or_des = 1) or removed from (cre_or_des = 0)
+ * str0.  str1 is the address of the N+1 (or N-1) electron string.
+ */
+void FCIcre_des_str_index(int *link_index, int norb, int nelec, int count,
+                          unsigned long *strs, int cre_or_des)
+{
+        int nlink, nelec1;
+        if (cre_or_des) {
+                nlink = norb - nelec;
+                nelec1 = nelec + 1;
+        } else {
+                nlink = nelec;
+                nelec1 = nelec - 1;
+        }
+#pragma omp parallel default(none) \
+        shared(link_index, norb, count, strs, cre_or_des, nlink, nelec1)
+{
+        int str_id, i, k;
+        unsigned long str0, bit;
+        int *tab;
+#pragma omp for schedule(static)
+        for (str_id = 0; str_id < count; str_id++) {
+                str0 = strs[str_id];
+                tab = link_index + (size_t)str_id * nlink * 4;
+                for (i = 0, k = 0; i < norb; i++) {
+                        bit = 1UL << i;
+                        if ((cre_or_des && !(str0 & bit)) ||
+                            (!cre_or_des && (str0 & bit))) {
+                                tab[k*4+0] = i;
+                                tab[k*4+1] = i*(i+1)/2;
+                                tab[k*4+2] = FCIstr2addr(norb, nelec1, str0^bit);
+                                if (FCIpopcount_1(str0>>(i+1)) % 2) {
+                                        tab[k*4+3] = -1;
+                                } else {
+                                        tab[k*4+3] = 1;
+                                }
+                                k++;
+                        }
+                }
+        }
+}
+}
 
 void FCIlinkstr_index(int *link_index, int norb, int na, int nocc,
                       unsigned long *strs, int store_trilidx)
@@ -111,7 +231,7 @@ void FCIlinkstr_index(int *link_index, int norb, int na, int nocc,
         for (str_id = 0; str_id < na; str_id++) {
                 str0 = strs[str_id];
                 for (i = 0, io = 0, iv = 0; i < norb; i++) {
-                        if (str0 & (1<<i)) {
+                        if (str0 & (1UL<<i)) {
                                 occ[io] = i;
                                 io += 1;
                         } else {
@@ -129,7 +249,7 @@ void FCIlinkstr_index(int *link_index, int norb, int na, int nocc,
                         }
                         for (i = 0; i < nocc; i++) {
                                 for (a = 0; a < nvir; a++, k++) {
-                                        str1 = (str0^(1<<occ[i])) | (1<<vir[a]);
+                                        str1 = (str0^(1UL<<occ[i])) | (1UL<<vir[a]);
                                         if (vir[a] > occ[i]) {
                                                 ia = vir[a]*(vir[a]+1)/2+occ[i];
                                         } else {
@@ -152,7 +272,7 @@ void FCIlinkstr_index(int *link_index, int norb, int na, int nocc,
 
                         for (i = 0; i < nocc; i++) {
                                 for (a = 0; a < nvir; a++, k++) {
-                                        str1 = (str0^(1<<occ[i])) | (1<<vir[a]);
+                                        str1 = (str0^(1UL<<occ[i])) | (1UL<<vir[a]);
                                         tab[k*4+0] = vir[a];
                                         tab[k*4+1] = occ[i];
                                         tab[k*4+2] = FCIstr2addr(norb, nocc, str1);
@@ -162,3 +282,90 @@ void FCIlinkstr_index(int *link_index, int norb, int na, int nocc,
                 }
         }
 }
+
+
+static int bsearch_str(unsigned long *strs, int nstrs, unsigned long str1)
+{
+        int lo = 0;
+        int hi = nstrs - 1;
+        int mid;
+        while (lo <= hi) {
+                mid = (lo + hi) / 2;
+                if (strs[mid] == str1) {
+                        return mid;
+                } else if (strs[mid] < str1) {
+                        lo = mid + 1;
+                } else {
+                        hi = mid - 1;
+                }
+        }
+        return -1;
+}
+
+/*
+ * Link table of a selected (sorted) subset of the strings.  The excitations
+ * which lead to strings out of the subset are skipped.  The table of each
+ * string is padded with zeros (sign = 0) which terminate the loops of the
+ * contraction and RDM kernels.
+ */
+void FCIselect_linkstr_index(int *link_index, int norb, int nstrs, int nocc,
+                             unsigned long *strs, int store_trilidx)
+{
+        int nvir = norb - nocc;
+        int nlink = nocc * nvir + nocc;
+        memset(link_index, 0, sizeof(int) * nstrs * nlink * 4);
+#pragma omp parallel default(none) \
+        shared(link_index, norb, nstrs, nocc, strs, store_trilidx, nvir, nlink)
+{
+        int occ[64];
+        int vir[64];
+        int str_id, io, iv, i, a, k, addr;
+        unsigned long str0, str1;
+        int *tab;
+#pragma omp for schedule(dynamic, 4)
+        for (str_id = 0; str_id < nstrs; str_id++) {
+                str0 = strs[str_id];
+                for (i = 0, io = 0, iv = 0; i < norb; i++) {
+                        if (str0 & (1UL<<i)) {
+                                occ[io] = i;
+                                io += 1;
+                        } else {
+                                vir[iv] = i;
+                                iv += 1;
+                        }
+                }
+
+                tab = link_index + (size_t)str_id * nlink * 4;
+                for (k = 0; k < nocc; k++) {
+                        if (store_trilidx) {
+                                tab[k*4+0] = occ[k]*(occ[k]+1)/2+occ[k];
+                        } else {
+                                tab[k*4+0] = occ[k];
+                                tab[k*4+1] = occ[k];
+                        }
+                        tab[k*4+2] = str_id;
+                        tab[k*4+3] = 1;
+                }
+                for (i = 0; i < nocc; i++) {
+                        for (a = 0; a < nvir; a++) {
+                                str1 = (str0^(1UL<<occ[i])) | (1UL<<vir[a]);
+                                addr = bsearch_str(strs, nstrs, str1);
+                                if (addr < 0) {
+                                        continue;
+                                }
+                                if (!store_trilidx) {
+                                        tab[k*4+0] = vir[a];
+                                        tab[k*4+1] = occ[i];
+                                } else if (vir[a] > occ[i]) {
+                                        tab[k*4+0] = vir[a]*(vir[a]+1)/2+occ[i];
+                                } else {
+                                        tab[k*4+0] = occ[i]*(occ[i]+1)/2+vir[a];
+                                }
+                                tab[k*4+2] = addr;
+                                tab[k*4+3] = FCIparity(str1, str0);
+                                k++;
+                        }
+                }
+        }
+}
+}
@@ -9,6 +9,7 @@ import shutil
 import functools
 import math
 import ctypes
+import threading
 import numpy
 
 c_double_p = ctypes.POINTER(ctypes.c_double)
@@ -181,6 +182,37 @@ class quite_run:
         os.chdir(self.dirnow)
 
 
+class background_call(object):
+    '''Call func(*args, **kwargs) in a separate thread.  It is used to
+    overlap the disk I/O with the computation (the C functions called through
+    ctypes release the GIL).  Method get() waits for the thread and returns
+    the result of func.  The exception raised in the thread is re-raised in
+    get().
+
+    Examples
+    --------
+    >>> handler = background_call(numpy.load, 'a.npy')
+    >>> ... # do something else
+    >>> a = handler.get()
+    '''
+    def __init__(self, func, *args, **kwargs):
+        self._result = None
+        self._error = None
+        def run():
+            try:
+                self._result = func(*args, **kwargs)
+            except Exception:
+                self._error = sys.exc_info()[1]
+        self._thread = threading.Thread(target=run)
+        self._thread.start()
+
+    def get(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
 # from pygeocoder
 # this decorator lets me use methods as both static and instance methods
 # In contrast to classmethod, when obj.function() is called, the first
@@ -0,0 +1,21 @@
+/*
+ * OpenMP runtime helper
+ */
+
+#include "config.h"
+
+/*
+ * Set the number of threads for the subsequent parallel regions if
+ * nthreads > 0.  Return the max number of threads available.
+ */
+int NPomp_num_threads(int nthreads)
+{
+#if defined HAVE_OPENMP
+        if (nthreads > 0) {
+                omp_set_num_threads(nthreads);
+        }
+        return omp_get_max_threads();
+#else
+        return 1;
+#endif
+}
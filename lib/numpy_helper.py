@@ -224,6 +224,39 @@ def _dgemm(trans_a, trans_b, m, n, k, a, b, c, alpha=1, beta=0,
     return c
 
 
+def num_threads(n=None):
+    '''Set the number of OpenMP threads used by the C libraries (e.g. the
+    integral-direct J, K driver) if n is given.
+
+    Returns:
+        The number of threads which will be used in the C libraries
+    '''
+    if n is None:
+        n = 0
+    return _np_helper.NPomp_num_threads(ctypes.c_int(n))
+
+class with_omp_threads(object):
+    '''Temporarily set the number of OpenMP threads of the C libraries.  The
+    previous number of threads is restored when leaving the context.  Nothing
+    is changed if nthreads is None or 0.
+
+    Examples:
+
+    >>> with with_omp_threads(4):
+    ...     ci1 = fci.direct_spin1.contract_2e(eri, ci0, norb, nelec)
+    '''
+    def __init__(self, nthreads=None):
+        self.nthreads = nthreads
+        self.sys_threads = None
+    def __enter__(self):
+        if self.nthreads:
+            self.sys_threads = num_threads()
+            num_threads(self.nthreads)
+        return self
+    def __exit__(self, type, value, traceback):
+        if self.sys_threads is not None:
+            num_threads(self.sys_threads)
+
 
 if __name__ == '__main__':
     a = numpy.random.random((400,900))
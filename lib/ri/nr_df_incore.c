@@ -3,6 +3,8 @@
  */
 
 #include <stdlib.h>
+#include <string.h>
+#include <math.h>
 #include <assert.h>
 //#include <omp.h>
 #include "config.h"
@@ -31,8 +33,14 @@ struct _AO2MOEnvs {
         double *mo_coeff;
 };
 
+/*
+ * The (ij|k) blocks of the auxiliary shells k with qk[k] < qcut are screened
+ * (Schwarz inequality, qcut = cutoff / sqrt((ij|ij))).  The screened blocks
+ * and the blocks which are zero by symmetry are filled with zeros.
+ */
 void RIfill_s1_auxe2(int (*intor)(), double *eri,
                      int ish, int jsh, int bastart, int auxstart, int auxcount,
+                     double *qk, double qcut,
                      CINTOpt *cintopt, struct _VHFEnvs *envs)
 {
         const int nao = envs->nao;
@@ -54,27 +62,30 @@ void RIfill_s1_auxe2(int (*intor)(), double *eri,
         shls[1] = jsh;
         for (ksh = auxstart; ksh < nbasnaux; ksh++) {
                 shls[2] = ksh;
-                if ((*intor)(eribuf, shls, envs->atm, envs->natm,
-                             envs->bas, envs->nbas, envs->env, cintopt)) {
-                        dk = ao_loc[ksh+1] - ao_loc[ksh];
-                        i0 = ao_loc[ish] - ao_loc[bastart];
-                        for (i = 0; i < di; i++, i0++) {
-                        for (j0 = ao_loc[jsh], j = 0; j < dj; j++, j0++) {
-                                ij0 = i0 * nao + j0;
-                                k0 = ao_loc[ksh] - ao_loc[auxstart];;
-                                peri = eri + ij0 * naoaux + k0;
-                                pbuf = eribuf + j * di + i;
-                                for (k = 0; k < dk; k++) {
-                                        peri[k] = pbuf[k*dij];
-                                }
-                        } }
+                dk = ao_loc[ksh+1] - ao_loc[ksh];
+                if (qk[ksh-auxstart] < qcut ||
+                    !(*intor)(eribuf, shls, envs->atm, envs->natm,
+                              envs->bas, envs->nbas, envs->env, cintopt)) {
+                        memset(eribuf, 0, sizeof(double)*dij*dk);
                 }
+                i0 = ao_loc[ish] - ao_loc[bastart];
+                for (i = 0; i < di; i++, i0++) {
+                for (j0 = ao_loc[jsh], j = 0; j < dj; j++, j0++) {
+                        ij0 = i0 * nao + j0;
+                        k0 = ao_loc[ksh] - ao_loc[auxstart];
+                        peri = eri + ij0 * naoaux + k0;
+                        pbuf = eribuf + j * di + i;
+                        for (k = 0; k < dk; k++) {
+                                peri[k] = pbuf[k*dij];
+                        }
+                } }
         }
         free(eribuf);
 }
 
 void RIfill_s2ij_auxe2(int (*intor)(), double *eri,
                        int ish, int jsh, int bastart, int auxstart, int auxcount,
+                       double *qk, double qcut,
                        CINTOpt *cintopt, struct _VHFEnvs *envs)
 {
         if (ish < jsh) {
@@ -100,35 +111,94 @@ void RIfill_s2ij_auxe2(int (*intor)(), double *eri,
         shls[1] = jsh;
         for (ksh = auxstart; ksh < nbasnaux; ksh++) {
                 shls[2] = ksh;
-                if ((*intor)(eribuf, shls, envs->atm, envs->natm,
-                             envs->bas, envs->nbas, envs->env, cintopt)) {
-                        dk = ao_loc[ksh+1] - ao_loc[ksh];
-                        if (ish == jsh) {
-                                for (i0 = ao_loc[ish],i = 0; i < di; i++, i0++) {
-                                for (j0 = ao_loc[jsh],j = 0; j0 <= i0; j++, j0++) {
-                                        ij0 = i0*(i0+1)/2 + j0 - ijoff;
-                                        k0 = ao_loc[ksh] - ao_loc[auxstart];
-                                        peri = eri + ij0 * naoaux + k0;
-                                        pbuf = eribuf + j * di + i;
-                                        for (k = 0; k < dk; k++) {
-                                                peri[k] = pbuf[k*dij];
-                                        }
-                                } }
-                        } else {
-                                for (i0 = ao_loc[ish], i = 0; i < di; i++,i0++) {
-                                for (j0 = ao_loc[jsh], j = 0; j < dj; j++,j0++) {
-                                        ij0 = i0*(i0+1)/2 + j0 - ijoff;
-                                        k0 = ao_loc[ksh] - ao_loc[auxstart];
-                                        peri = eri + ij0 * naoaux + k0;
-                                        pbuf = eribuf + j * di + i;
-                                        for (k = 0; k < dk; k++) {
-                                                peri[k] = pbuf[k*dij];
-                                        }
+                dk = ao_loc[ksh+1] - ao_loc[ksh];
+                if (qk[ksh-auxstart] < qcut ||
+                    !(*intor)(eribuf, shls, envs->atm, envs->natm,
+                              envs->bas, envs->nbas, envs->env, cintopt)) {
+                        memset(eribuf, 0, sizeof(double)*dij*dk);
+                }
+                if (ish == jsh) {
+                        for (i0 = ao_loc[ish],i = 0; i < di; i++, i0++) {
+                        for (j0 = ao_loc[jsh],j = 0; j0 <= i0; j++, j0++) {
+                                ij0 = i0*(i0+1)/2 + j0 - ijoff;
+                                k0 = ao_loc[ksh] - ao_loc[auxstart];
+                                peri = eri + ij0 * naoaux + k0;
+                                pbuf = eribuf + j * di + i;
+                                for (k = 0; k < dk; k++) {
+                                        peri[k] = pbuf[k*dij];
+                                }
+                        } }
+                } else {
+                        for (i0 = ao_loc[ish], i = 0; i < di; i++,i0++) {
+                        for (j0 = ao_loc[jsh], j = 0; j < dj; j++,j0++) {
+                                ij0 = i0*(i0+1)/2 + j0 - ijoff;
+                                k0 = ao_loc[ksh] - ao_loc[auxstart];
+                                peri = eri + ij0 * naoaux + k0;
+                                pbuf = eribuf + j * di + i;
+                                for (k = 0; k < dk; k++) {
+                                        peri[k] = pbuf[k*dij];
+                                }
+                        } }
+                }
+        }
+        free(eribuf);
+}
+
+/*
+ * Schwarz bounds
+ *      qij[i*nbas+j] = sqrt(max|(ij|ij)|), i in [bastart,bastart+bascount)
+ *      qk[k] = sqrt(max|(k|k)|), k in [auxstart,auxstart+auxcount)
+ */
+static void schwarz_cond(double *qij, double *qk, int bastart, int bascount,
+                         int auxstart, int auxcount, int *ao_loc,
+                         int *atm, int natm, int *bas, int nbas, double *env)
+{
+        int nbasnaux = auxstart + auxcount;
+        int ish, jsh, ksh, i, j, di, dj, dk, shls[4];
+        double qtmp, *buf;
+#pragma omp parallel default(none) \
+        shared(qij, qk, bastart, bascount, auxstart, nbasnaux, ao_loc, \
+               atm, natm, bas, nbas, env) \
+        private(ish, jsh, ksh, i, j, di, dj, dk, shls, qtmp, buf)
+{
+#pragma omp for schedule(dynamic)
+        for (ish = bastart; ish < bastart+bascount; ish++) {
+                di = ao_loc[ish+1] - ao_loc[ish];
+                for (jsh = 0; jsh < nbas; jsh++) {
+                        dj = ao_loc[jsh+1] - ao_loc[jsh];
+                        buf = malloc(sizeof(double) * di*dj*di*dj);
+                        shls[0] = ish;
+                        shls[1] = jsh;
+                        shls[2] = ish;
+                        shls[3] = jsh;
+                        qtmp = 0;
+                        if (cint2e_sph(buf, shls, atm, natm, bas, nbas, env,
+                                       NULL)) {
+                                for (i = 0; i < di; i++) {
+                                for (j = 0; j < dj; j++) {
+                                        qtmp = MAX(qtmp, fabs(buf[i+di*j+di*dj*i+di*dj*di*j]));
                                 } }
                         }
+                        qij[(ish-bastart)*nbas+jsh] = sqrt(qtmp);
+                        free(buf);
                 }
         }
-        free(eribuf);
+#pragma omp for schedule(dynamic)
+        for (ksh = auxstart; ksh < nbasnaux; ksh++) {
+                dk = ao_loc[ksh+1] - ao_loc[ksh];
+                buf = malloc(sizeof(double) * dk*dk);
+                shls[0] = ksh;
+                shls[1] = ksh;
+                qtmp = 0;
+                if (cint2c2e_sph(buf, shls, atm, natm, bas, nbas, env, NULL)) {
+                        for (i = 0; i < dk; i++) {
+                                qtmp = MAX(qtmp, fabs(buf[i*dk+i]));
+                        }
+                }
+                qk[ksh-auxstart] = sqrt(qtmp);
+                free(buf);
+        }
+}
 }
 
 
@@ -139,11 +209,16 @@ void RIfill_s2ij_auxe2(int (*intor)(), double *eri,
  * bastart and bascount to fill a range of basis;
  * auxstart is the end of normal basis, so it equals to the number of
  * normal basis
+ * The integrals are screened by the Schwarz inequality
+ *      |(ij|k)| <= sqrt((ij|ij)) sqrt((k|k)) < cutoff
+ * which only holds for the Coulomb integrals cint3c2e_sph.  Set cutoff to 0
+ * to disable the screening for other integrals.
  */
 void RInr_3c2e_auxe2_drv(int (*intor)(), void (*fill)(), double *eri,
                          int bastart, int bascount, int auxstart, int auxcount,
                          int ncomp, CINTOpt *cintopt,
-                         int *atm, int natm, int *bas, int nbas, double *env)
+                         int *atm, int natm, int *bas, int nbas, double *env,
+                         double cutoff)
 {
         const int nbasnaux = auxstart + auxcount;
         int *ao_loc = malloc(sizeof(int)*(nbasnaux+1));
@@ -153,21 +228,50 @@ void RInr_3c2e_auxe2_drv(int (*intor)(), void (*fill)(), double *eri,
 
         struct _VHFEnvs envs = {natm, nbas, atm, bas, env, nao, ao_loc};
 
-        int i, j, ij;
+        double *qij = malloc(sizeof(double) * bascount*nbas);
+        double *qk = malloc(sizeof(double) * auxcount);
+        int i, j, ij, npair;
+        if (cutoff > 0) {
+                schwarz_cond(qij, qk, bastart, bascount, auxstart, auxcount,
+                             ao_loc, atm, natm, bas, nbas, env);
+        } else {
+                for (ij = 0; ij < bascount*nbas; ij++) {
+                        qij[ij] = 1;
+                }
+                for (i = 0; i < auxcount; i++) {
+                        qk[i] = 1;
+                }
+        }
+
+// Task list of the shell pairs.  The pairs (i<j) which are not referred by
+// the s2ij fill are dropped for a better load balance
+        int *pairs = malloc(sizeof(int) * bascount*nbas * 2);
+        npair = 0;
+        for (i = bastart; i < bastart+bascount; i++) {
+                for (j = 0; j < nbas; j++) {
+                        if (fill != (void (*)())RIfill_s2ij_auxe2 || i >= j) {
+                                pairs[npair*2  ] = i;
+                                pairs[npair*2+1] = j;
+                                npair++;
+                        }
+                }
+        }
 
 #pragma omp parallel default(none) \
         shared(eri, intor, fill, bastart, bascount, auxstart, auxcount, \
-               nbas, envs, cintopt) \
+               nbas, envs, cintopt, qij, qk, cutoff, pairs, npair) \
         private(ij, i, j)
 #pragma omp for nowait schedule(dynamic, 2)
-        for (ij = bastart*nbas; ij < (bastart+bascount)*nbas; ij++) {
-                i = ij / nbas;
-                j = ij - i * nbas;
-                (*fill)(intor, eri,
-                        i, j, bastart, auxstart, auxcount,
-                        cintopt, &envs);
+        for (ij = 0; ij < npair; ij++) {
+                i = pairs[ij*2  ];
+                j = pairs[ij*2+1];
+                (*fill)(intor, eri, i, j, bastart, auxstart, auxcount,
+                        qk, cutoff/qij[(i-bastart)*nbas+j], cintopt, &envs);
         }
 
+        free(pairs);
+        free(qij);
+        free(qk);
         free(ao_loc);
 }
 
@@ -322,3 +426,95 @@ int RImmm_nr_s2_copy(double *vout, double *vin, struct _AO2MOEnvs *envs,
         }
         return 0;
 }
+
+/*
+ * Diagonal (ij|ij) of the ERI matrix, i >= j, in the packed (s2) order
+ */
+void RInr_eri_diag(double *diag, int *atm, int natm, int *bas, int nbas,
+                   double *env)
+{
+        int *ao_loc = malloc(sizeof(int)*(nbas+1));
+        CINTshells_spheric_offset(ao_loc, bas, nbas);
+        ao_loc[nbas] = ao_loc[nbas-1] + CINTcgto_spheric(nbas-1, bas);
+
+        int ish, jsh, i, j, i0, j0, di, dj, shls[4];
+        double *buf;
+#pragma omp parallel default(none) \
+        shared(diag, atm, natm, bas, nbas, env, ao_loc) \
+        private(ish, jsh, i, j, i0, j0, di, dj, shls, buf)
+#pragma omp for schedule(dynamic)
+        for (ish = 0; ish < nbas; ish++) {
+                di = ao_loc[ish+1] - ao_loc[ish];
+                for (jsh = 0; jsh <= ish; jsh++) {
+                        dj = ao_loc[jsh+1] - ao_loc[jsh];
+                        buf = malloc(sizeof(double) * di*dj*di*dj);
+                        shls[0] = ish;
+                        shls[1] = jsh;
+                        shls[2] = ish;
+                        shls[3] = jsh;
+                        if (!cint2e_sph(buf, shls, atm, natm, bas, nbas, env,
+                                        NULL)) {
+                                memset(buf, 0, sizeof(double)*di*dj*di*dj);
+                        }
+                        for (i0 = ao_loc[ish], i = 0; i < di; i++, i0++) {
+                        for (j0 = ao_loc[jsh], j = 0; j < dj; j++, j0++) {
+                                if (j0 <= i0) {
+                                        diag[i0*(i0+1)/2+j0] =
+                                                buf[i+di*j+di*dj*i+di*dj*di*j];
+                                }
+                        } }
+                        free(buf);
+                }
+        }
+        free(ao_loc);
+}
+
+/*
+ * The rows (kl|ij) of the ERI matrix for all i >= j and the AO pairs kl of
+ * the shell pair (ksh,lsh).  eri[kl,ij], the rows are ordered as kl = l*dk+k
+ * and the columns are in the packed (s2) order of ij.
+ */
+void RInr_eri_shellpair_rows(double *eri, int ksh, int lsh,
+                             int *atm, int natm, int *bas, int nbas,
+                             double *env)
+{
+        int *ao_loc = malloc(sizeof(int)*(nbas+1));
+        CINTshells_spheric_offset(ao_loc, bas, nbas);
+        ao_loc[nbas] = ao_loc[nbas-1] + CINTcgto_spheric(nbas-1, bas);
+        size_t nao_pair = (size_t)ao_loc[nbas] * (ao_loc[nbas]+1) / 2;
+        int dkl = (ao_loc[ksh+1] - ao_loc[ksh]) * (ao_loc[lsh+1] - ao_loc[lsh]);
+
+        int ish, jsh, i, j, i0, j0, di, dj, kl, shls[4];
+        double *buf, *pbuf;
+#pragma omp parallel default(none) \
+        shared(eri, ksh, lsh, atm, natm, bas, nbas, env, ao_loc, \
+               nao_pair, dkl) \
+        private(ish, jsh, i, j, i0, j0, di, dj, kl, shls, buf, pbuf)
+#pragma omp for schedule(dynamic)
+        for (ish = 0; ish < nbas; ish++) {
+                di = ao_loc[ish+1] - ao_loc[ish];
+                for (jsh = 0; jsh <= ish; jsh++) {
+                        dj = ao_loc[jsh+1] - ao_loc[jsh];
+                        buf = malloc(sizeof(double) * di*dj*dkl);
+                        shls[0] = ish;
+                        shls[1] = jsh;
+                        shls[2] = ksh;
+                        shls[3] = lsh;
+                        if (!cint2e_sph(buf, shls, atm, natm, bas, nbas, env,
+                                        NULL)) {
+                                memset(buf, 0, sizeof(double)*di*dj*dkl);
+                        }
+                        for (kl = 0; kl < dkl; kl++) {
+                                pbuf = buf + kl * di*dj;
+                                for (i0 = ao_loc[ish], i = 0; i < di; i++, i0++) {
+                                for (j0 = ao_loc[jsh], j = 0; j < dj; j++, j0++) {
+                                        if (j0 <= i0) {
+                                                eri[kl*nao_pair+i0*(i0+1)/2+j0] = pbuf[j*di+i];
+                                        }
+                                } }
+                        }
+                        free(buf);
+                }
+        }
+        free(ao_loc);
+}
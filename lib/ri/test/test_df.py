@@ -68,7 +68,7 @@ class KnowValues(unittest.TestCase):
              ctypes.c_int(0), nbas, nbas, nbas, ctypes.c_int(1), cintopt,
              r_atm.ctypes.data_as(ctypes.c_void_p), natm,
              r_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-             c_env.ctypes.data_as(ctypes.c_void_p))
+             c_env.ctypes.data_as(ctypes.c_void_p), ctypes.c_double(0))
         self.assertTrue(numpy.allclose(eriref, eri1))
 
         fill = f1pointer('RIfill_s2ij_auxe2')
@@ -78,10 +78,19 @@ class KnowValues(unittest.TestCase):
              ctypes.c_int(0), nbas, nbas, nbas, ctypes.c_int(1), cintopt,
              r_atm.ctypes.data_as(ctypes.c_void_p), natm,
              r_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-             c_env.ctypes.data_as(ctypes.c_void_p))
+             c_env.ctypes.data_as(ctypes.c_void_p), ctypes.c_double(0))
         idx = numpy.tril_indices(nao)
         self.assertTrue(numpy.allclose(eriref[idx[0],idx[1]], eri1))
 
+        eri1 = numpy.empty((naopair,nao))
+        fdrv(intor, fill,
+             eri1.ctypes.data_as(ctypes.c_void_p),
+             ctypes.c_int(0), nbas, nbas, nbas, ctypes.c_int(1), cintopt,
+             r_atm.ctypes.data_as(ctypes.c_void_p), natm,
+             r_bas.ctypes.data_as(ctypes.c_void_p), nbas,
+             c_env.ctypes.data_as(ctypes.c_void_p), ctypes.c_double(1e-12))
+        self.assertTrue(abs(eriref[idx[0],idx[1]]-eri1).max() < 1e-12)
+
 
 
 if __name__ == '__main__':
@@ -22,6 +22,11 @@ void dgemm_(const char*, const char*,
             const double*, const double*, const int*,
             const double*, const int*,
             const double*, double*, const int*);
+void sgemm_(const char*, const char*,
+            const int*, const int*, const int*,
+            const float*, const float*, const int*,
+            const float*, const int*,
+            const float*, float*, const int*);
 void dgemv_(const char*, const int*, const int*,
             const double*, const double*, const int*,
             const double*, const int*,
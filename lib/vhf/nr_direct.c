@@ -463,6 +463,11 @@ void CVHFfill_dot_nrs1(int (*intor)(), void (*funpack)(), void (**fjk)(),
  * 
  * n_dm is the number of dms for one [array(ij|kl)],
  * ncomp is the number of components that produced by intor
+ *
+ * The shell pairs (ksh,lsh) are dynamically distributed over the OpenMP
+ * threads.  Each thread accumulates J, K in its private buffer (thread 0
+ * writes to vjk directly).  The private buffers are summed up in parallel
+ * over the matrix elements at the end, in the order of thread Id.
  */
 void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), void (*funpack)(),
                        void (**fjk)(), double **dms, double *vjk,
@@ -470,22 +475,45 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), void (*funpack)(),
                        int *atm, int natm, int *bas, int nbas, double *env)
 {
         const int nao = CINTtot_cgto_spheric(bas, nbas);
-        double *v_priv;
+        size_t nv = (size_t)nao * nao * n_dm * ncomp;
+        int nthread = 1;
+        double **v_bufs;
         int k, l, kl;
+        size_t i;
         int *ao_loc = malloc(sizeof(int)*(nbas+1));
         struct _VHFEnvs envs = {natm, nbas, atm, bas, env, nao, ao_loc};
 
-        memset(vjk, 0, sizeof(double)*nao*nao*n_dm*ncomp);
+        memset(vjk, 0, sizeof(double)*nv);
         CINTshells_spheric_offset(ao_loc, bas, nbas);
         ao_loc[nbas] = nao;
 
+#if defined HAVE_OPENMP
+        nthread = omp_get_max_threads();
+#endif
+        v_bufs = malloc(sizeof(double *) * nthread);
+        for (k = 0; k < nthread; k++) {
+                v_bufs[k] = NULL;
+        }
+
 #pragma omp parallel default(none) \
-        shared(intor, funpack, fdot, fjk, \
-               dms, vjk, n_dm, ncomp, nbas, cintopt, vhfopt, envs) \
-        private(kl, k, l, v_priv)
+        shared(intor, funpack, fdot, fjk, dms, vjk, v_bufs, nv, \
+               n_dm, ncomp, nbas, cintopt, vhfopt, envs) \
+        private(kl, k, l, i)
         {
-                v_priv = malloc(sizeof(double)*nao*nao*n_dm*ncomp);
-                memset(v_priv, 0, sizeof(double)*nao*nao*n_dm*ncomp);
+                int it = 0;
+                int nt = 1;
+                double *v_priv;
+#if defined HAVE_OPENMP
+                it = omp_get_thread_num();
+                nt = omp_get_num_threads();
+#endif
+                if (it == 0) {
+                        v_priv = vjk;
+                } else {
+                        v_priv = malloc(sizeof(double)*nv);
+                        memset(v_priv, 0, sizeof(double)*nv);
+                }
+                v_bufs[it] = v_priv;
 #pragma omp for nowait schedule(dynamic, 2)
                 for (kl = 0; kl < nbas*nbas; kl++) {
                         k = kl / nbas;
@@ -494,15 +522,18 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), void (*funpack)(),
                                 dms, v_priv, n_dm, ncomp, k, l,
                                 cintopt, vhfopt, &envs);
                 }
-#pragma omp critical
-                {
-                        for (k = 0; k < nao*nao*n_dm*ncomp; k++) {
-                                vjk[k] += v_priv[k];
+#pragma omp barrier
+#pragma omp for schedule(static)
+                for (i = 0; i < nv; i++) {
+                        for (k = 1; k < nt; k++) {
+                                vjk[i] += v_bufs[k][i];
                         }
                 }
-                free(v_priv);
+                if (it != 0) {
+                        free(v_priv);
+                }
         }
 
+        free(v_bufs);
         free(ao_loc);
 }
-
@@ -794,3 +794,74 @@ void CVHFnrs1_incore_drv(double *eri, double *dmj, double *vj,
         }
 }
 
+
+/*
+ * Contract the incore eri against n_dm density matrices in one pass.
+ * Each row (ij|**) of eri is loaded once and used by all density matrices.
+ * dmj[i] and dmk[i] are the pointers to the i-th density matrix for J and
+ * K.  vj and vk are the arrays of shape (n_dm,n,n).
+ */
+static void nr_incore_ndm_drv(double *eri, double **dmj, double *vj,
+                              double **dmk, double *vk, int n_dm, int n,
+                              void (*const fvj)(), void (*const fvk)(),
+                              int s8)
+{
+        const unsigned long npair = n*(n+1)/2;
+        const unsigned long nn = n * n;
+        const unsigned long nv = nn * n_dm;
+        double *vj_priv, *vk_priv;
+        int i, j, idm;
+        unsigned long ij, off, k;
+
+        memset(vj, 0, sizeof(double)*nv);
+        memset(vk, 0, sizeof(double)*nv);
+
+#pragma omp parallel default(none) \
+        shared(eri, dmj, dmk, vj, vk, n, n_dm, s8) \
+        private(ij, i, j, k, idm, off, vj_priv, vk_priv)
+        {
+                vj_priv = malloc(sizeof(double)*nv);
+                vk_priv = malloc(sizeof(double)*nv);
+                memset(vj_priv, 0, sizeof(double)*nv);
+                memset(vk_priv, 0, sizeof(double)*nv);
+#pragma omp for nowait schedule(dynamic, 4)
+                for (ij = 0; ij < npair; ij++) {
+                        i = (int)(sqrt(2*ij+.25) - .5 + 1e-7);
+                        j = ij - i*(i+1)/2;
+                        if (s8) {
+                                off = ij*(ij+1)/2;
+                        } else {
+                                off = ij * npair;
+                        }
+                        for (idm = 0; idm < n_dm; idm++) {
+                                (*fvj)(eri+off, dmj[idm], vj_priv+nn*idm,
+                                       n, i, j);
+                                (*fvk)(eri+off, dmk[idm], vk_priv+nn*idm,
+                                       n, i, j);
+                        }
+                }
+#pragma omp critical
+                {
+                        for (k = 0; k < nv; k++) {
+                                vj[k] += vj_priv[k];
+                                vk[k] += vk_priv[k];
+                        }
+                }
+                free(vj_priv);
+                free(vk_priv);
+        }
+}
+
+void CVHFnrs8_incore_ndm_drv(double *eri, double **dmj, double *vj,
+                             double **dmk, double *vk, int n_dm, int n,
+                             void (*const fvj)(), void (*const fvk)())
+{
+        nr_incore_ndm_drv(eri, dmj, vj, dmk, vk, n_dm, n, fvj, fvk, 1);
+}
+
+void CVHFnrs4_incore_ndm_drv(double *eri, double **dmj, double *vj,
+                             double **dmk, double *vk, int n_dm, int n,
+                             void (*const fvj)(), void (*const fvk)())
+{
+        nr_incore_ndm_drv(eri, dmj, vj, dmk, vk, n_dm, n, fvj, fvk, 0);
+}
@@ -180,6 +180,17 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(vk0,vk1[2]))
         self.assertTrue(numpy.allclose(vk0,vk1[3]))
 
+    def test_direct_jk_nthreads(self):
+        numpy.random.seed(15)
+        dm1 = numpy.random.random((nao,nao))
+        dm1 = dm1 + dm1.T
+        vj0, vk0 = scf._vhf.direct(dm1, mol._atm, mol._bas, mol._env, hermi=1)
+        nthreads = lib.num_threads()
+        lib.num_threads(1)
+        vj1, vk1 = scf._vhf.direct(dm1, mol._atm, mol._bas, mol._env, hermi=1)
+        lib.num_threads(nthreads)
+        self.assertTrue(abs(vj0-vj1).max() < 1e-12)
+        self.assertTrue(abs(vk0-vk1).max() < 1e-12)
 
 if __name__ == '__main__':
     print 'Full Tests for nrvhf'
@@ -329,6 +329,8 @@ def kernel(casscf, mo_coeff, tol=1e-7, macro=30, micro=8, \
 
     t2m = t1m = log.timer('Initializing 1-step CASSCF', *cput0)
     for imacro in range(macro):
+# With fcisolver.rdm12_from_kernel, the 2-pdm of fcivec was computed by
+# casscf.casci in the same pass as the CI energy and is not recomputed here
         casdm1, casdm2 = casscf.fcisolver.make_rdm12(fcivec, ncas, casscf.nelecas)
         u, dx, g_orb, ninner = casscf.rotate_orb(mo, casdm1, casdm2, eris, 0)
         norm_gorb = numpy.linalg.norm(g_orb)
@@ -8,10 +8,12 @@ from functools import reduce
 import numpy
 import h5py
 
+import pyscf.lib
 import pyscf.ao2mo
 from pyscf.ao2mo import _ao2mo
 import pyscf.lib.logger as logger
 
+BLOCKDIM = 160
 
 '''
 spin-adapted MP2
@@ -19,22 +21,62 @@ t2[i,j,b,a] = (ia|jb) / D_ij^ab
 '''
 
 def kernel(mp, mo_energy, mo_coeff, nocc, auxbasis='weigend', verbose=None):
+    if nocc == 0:
+        return 0, None
     cderi = mp.ao2mo(mo_coeff, nocc)
+    naux = cderi.shape[0]
     nvir = len(mo_energy) - nocc
     eia = mo_energy[:nocc,None] - mo_energy[None,nocc:]
     t2 = None #numpy.empty((nocc,nocc,nvir,nvir))
+
+    blksize = _occ_blksize(naux, nocc, nvir, mp.max_memory)
+    # (i,j) pairs of the occupied blocks, j-block <= i-block.  The diagonal
+    # block comes first so that Li is loaded once for each i-block.
+    tasks = []
+    for i0, i1 in prange(0, nocc, blksize):
+        tasks.append((i0, i1, i0, i1))
+        tasks.extend([(i0, i1, j0, j1) for j0, j1 in prange(0, i0, blksize)])
+    def load(p0, p1):
+        return numpy.ascontiguousarray(cderi[:,p0*nvir:p1*nvir])
+
     emp2 = 0
-    for i in range(nocc):
-        djba = (eia.reshape(-1,1) + eia[i].reshape(1,-1)).ravel()
-        gi = numpy.einsum('pa,pjb->jba', cderi[:,i], cderi)
-        t2i = (gi.ravel()/djba).reshape(nocc,nvir,nvir)
-        #t2[i] = t2i
+    prefetch = pyscf.lib.background_call(load, *tasks[0][2:])
+    for k, (i0, i1, j0, j1) in enumerate(tasks):
+        buf = prefetch.get()
+        if k+1 < len(tasks):
+            prefetch = pyscf.lib.background_call(load, *tasks[k+1][2:])
+        if j0 == i0:
+            Li = Lj = buf
+        else:
+            Lj = buf
+        # gi[i,a,j,b] = (ia|jb)
+        gi = pyscf.lib.dot(Li.T, Lj).reshape(i1-i0,nvir,j1-j0,nvir)
+        djba = eia[i0:i1].reshape(i1-i0,nvir,1,1) + eia[j0:j1]
+        t2i = gi / djba
         # 2*ijab-ijba
-        theta = gi*2 - gi.transpose(0,2,1)
-        emp2 += numpy.einsum('jab,jab', t2i, theta)
+        theta = gi*2 - gi.transpose(0,3,2,1)
+        if j0 == i0:
+            emp2 += numpy.dot(t2i.ravel(), theta.ravel())
+        else:
+            emp2 += numpy.dot(t2i.ravel(), theta.ravel()) * 2
 
+    if isinstance(cderi, h5py.Dataset):
+        cderi.file.close()
     return emp2, t2
 
+def _occ_blksize(naux, nocc, nvir, max_memory):
+    '''Number of occupied orbitals in one block.  Two blocks of (L|ia), one
+    being prefetched, and three (ia|jb) intermediates are held in memory.'''
+    blksize = nocc
+    while blksize > 1 and \
+            (naux*blksize*nvir*3 + blksize**2*nvir**2*3)*8e-6 > max_memory*.5:
+        blksize = (blksize+1) // 2
+    return blksize
+
+def prange(start, end, step):
+    for i in range(start, end, step):
+        yield i, min(i+step, end)
+
 
 class MP2(object):
     def __init__(self, mf):
@@ -44,6 +86,10 @@ class MP2(object):
         self.stdout = self.mol.stdout
         self.max_memory = mf.max_memory
         self.auxbasis = 'weigend'
+# Threshold of the pivoted Cholesky decomposition when auxbasis is None
+        self.cholesky_tol = getattr(mf, 'cholesky_tol', 1e-6)
+        self._cderi = None
+        self._cderimo_file = None
 
         self.emp2 = None
         self.t2 = None
@@ -61,23 +107,49 @@ class MP2(object):
         logger.log(self, 'RMP2 energy = %.15g', self.emp2)
         return self.emp2, self.t2
 
-    # Note return cderi_pov array[auxbas,nocc*nvir]
+    # Note return cderi_pov array[auxbas,nocc*nvir].  It is an HDF5 dataset
+    # if the array does not fit in max_memory.
     def ao2mo(self, mo_coeff, nocc):
         import pyscf.df
+        import pyscf.scf.dfhf
         log = logger.Logger(self.stdout, self.verbose)
         time0 = (time.clock(), time.time())
         log.debug('transform (L|ia)')
         nmo = mo_coeff.shape[1]
-        if hasattr(self._scf, '_cderi') and self._scf._cderi is not None:
-            cderi = self._scf._cderi
+        nvir = nmo - nocc
+# Reuse the integrals (and the opened integral file) of the DF-SCF object.
+        if getattr(self._scf, '_cderi', None) is not None:
+            feri = pyscf.scf.dfhf.load_cderi(self._scf)
         else:
-            cderi = pyscf.df.incore.cholesky_eri(mol, auxbasis=self.auxbasis,
-                                                 verbose=self.verbose)
-        klshape = (0, nocc, nocc, nmo-nocc)
-        cderimo = _ao2mo.nr_e2_(cderi, mo_coeff, klshape, aosym='s2kl', mosym='s1')
+            if self._cderi is None and self.auxbasis is None:
+                self._cderi = pyscf.df.cholesky.cholesky_eri(self.mol,
+                                                             self.cholesky_tol,
+                                                             verbose=self.verbose,
+                                                             max_memory=self.max_memory)
+            elif self._cderi is None:
+                self._cderi = pyscf.df.incore.cholesky_eri(self.mol,
+                                                           auxbasis=self.auxbasis,
+                                                           verbose=self.verbose)
+            feri = pyscf.df.addons.load(self._cderi)
+        klshape = (0, nocc, nocc, nvir)
+        if feri.nrow*nocc*nvir*8e-6 < self.max_memory*.4:
+            cderimo = numpy.empty((feri.nrow,nocc*nvir))
+            for b0, b1, eri1 in feri.loop(BLOCKDIM):
+                _ao2mo.nr_e2_(eri1, mo_coeff, klshape, aosym='s2kl', mosym='s1',
+                              vout=cderimo[b0:b1])
+        else:
+            if self._cderimo_file is None:
+                self._cderimo_file = tempfile.NamedTemporaryFile()
+            log.debug('(L|ia) is saved in %s', self._cderimo_file.name)
+            h5mo = h5py.File(self._cderimo_file.name, 'w')
+            cderimo = h5mo.create_dataset('cderimo', (feri.nrow,nocc*nvir), 'f8')
+            buf = numpy.empty((BLOCKDIM,nocc*nvir))
+            for b0, b1, eri1 in feri.loop(BLOCKDIM):
+                _ao2mo.nr_e2_(eri1, mo_coeff, klshape, aosym='s2kl', mosym='s1',
+                              vout=buf[:b1-b0])
+                cderimo[b0:b1] = buf[:b1-b0]
         time1 = log.timer('Integral transformation', *time0)
-        return cderimo.reshape(-1,nocc,nmo-nocc)
-
+        return cderimo
 
 if __name__ == '__main__':
     from pyscf import scf
@@ -22,21 +22,36 @@ t2[i,j,b,a] = (ia|jb) / D_ij^ab
 # (ij|kl) => (ij|ol) => (ol|ij) => (ol|oj) => (ol|ov) => (ov|ov)
 #   or    => (ij|ol) => (oj|ol) => (oj|ov) => (ov|ov)
 
-def kernel(mp, mo_energy, mo_coeff, nocc, verbose=None):
+def kernel(mp, mo_energy, mo_coeff, nocc, verbose=None, with_t2=True,
+           t2file=None):
+    '''MP2 energy and the amplitudes t2[i,j,a,b].  t2 is not computed if
+    with_t2 is False.  If t2file is given, t2 is saved in the dataset "t2" of
+    the HDF5 file t2file, and the dataset is returned.'''
     ovov = mp.ao2mo(mo_coeff, nocc)
 
     nvir = len(mo_energy) - nocc
     eia = mo_energy[:nocc,None] - mo_energy[None,nocc:]
-    t2 = numpy.empty((nocc,nocc,nvir,nvir))
+    if not with_t2:
+        t2 = None
+    elif t2file is not None:
+        if mp._ft2 is not None:
+            mp._ft2.close()
+        mp._ft2 = h5py.File(t2file, 'w')
+        t2 = mp._ft2.create_dataset('t2', (nocc,nocc,nvir,nvir), 'f8',
+                                    chunks=(1,1,nvir,nvir))
+    else:
+        t2 = numpy.empty((nocc,nocc,nvir,nvir))
     emp2 = 0
     for i in range(nocc):
         djba = (eia.reshape(-1,1) + eia[i].reshape(1,-1)).ravel()
         gi = numpy.array(ovov[i*nvir:(i+1)*nvir], copy=False)
         gi = gi.reshape(nvir,nocc,nvir).transpose(1,2,0)
-        t2[i] = (gi.ravel()/djba).reshape(nocc,nvir,nvir)
+        t2i = (gi.ravel()/djba).reshape(nocc,nvir,nvir)
+        if t2 is not None:
+            t2[i] = t2i
         # 2*ijab-ijba
         theta = gi*2 - gi.transpose(0,2,1)
-        emp2 += numpy.einsum('jab,jab', t2[i], theta)
+        emp2 += numpy.einsum('jab,jab', t2i, theta)
 
     return emp2, t2
 
@@ -78,11 +93,22 @@ class MP2(object):
         self.stdout = self.mol.stdout
         self.max_memory = mf.max_memory
 
+        # Set with_t2 to False to compute the energy only.  If t2file is
+        # given, t2 is saved in the HDF5 file than in memory.
+        self.with_t2 = True
+        self.t2file = None
+
         self.emp2 = None
         self.t2 = None
         # hold h5file, to prevent the dataset being closed in self.ao2mo()
         # than in memory
         self._feri = None
+        self._ft2 = None
+        # (key, AO eri, mo_coeff, eri_ovov) of the last call of self.ao2mo().
+        # Note the full (ia|jb) array (or the HDF5 dataset) is held by the
+        # object until the next transformation.  Set it to None to release
+        # the memory.
+        self._ovov = None
 
     def kernel(self, mo_energy=None, mo_coeff=None, nocc=None):
         if mo_coeff is None:
@@ -93,12 +119,21 @@ class MP2(object):
             nocc = self.mol.nelectron // 2
 
         self.emp2, self.t2 = \
-                kernel(self, mo_energy, mo_coeff, nocc, verbose=self.verbose)
+                kernel(self, mo_energy, mo_coeff, nocc, verbose=self.verbose,
+                       with_t2=self.with_t2, t2file=self.t2file)
         logger.log(self, 'RMP2 energy = %.15g', self.emp2)
         return self.emp2, self.t2
 
-    # return eri_ovov array[nocc*nvir,nocc*nvir]
+    # return eri_ovov array[nocc*nvir,nocc*nvir].  The integrals are reused
+    # by the next call with the same orbitals, AO integrals and max_memory,
+    # eg kernel and make_rdm1.
     def ao2mo(self, mo_coeff, nocc):
+        key = (nocc, self.max_memory)
+        if (self._ovov is not None and self._ovov[0] == key and
+            self._ovov[1] is self._scf._eri and
+            numpy.array_equal(self._ovov[2], mo_coeff)):
+            return self._ovov[3]
+
         log = logger.Logger(self.stdout, self.verbose)
         time0 = (time.clock(), time.time())
         log.debug('transform (ia|jb)')
@@ -118,6 +153,7 @@ class MP2(object):
             # return the dataset, so it does not use too much memory.
             eri = self._feri['eri_mo']
         time1 = log.timer('Integral transformation', *time0)
+        self._ovov = (key, self._scf._eri, mo_coeff.copy(), eri)
         return eri
 
 
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy
+from pyscf import scf
+from pyscf import gto
+from pyscf import mp
+from pyscf.mp import dfmp2
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = None
+mol.atom = [
+    [8 , (0. , 0.     , 0.)],
+    [1 , (0. , -0.757 , 0.587)],
+    [1 , (0. , 0.757  , 0.587)]]
+
+mol.basis = 'cc-pvdz'
+mol.build()
+mf = scf.density_fit(scf.RHF(mol))
+mf.scf()
+
+
+class KnowValues(unittest.TestCase):
+    def test_dfmp2(self):
+        pt = dfmp2.MP2(mf)
+        emp2 = pt.kernel()[0]
+        self.assertAlmostEqual(emp2, -0.204019967288338, 3)
+
+        # (L|ia) on disk and one occupied orbital per block
+        pt1 = dfmp2.MP2(mf)
+        pt1.max_memory = 1e-3
+        self.assertAlmostEqual(pt1.kernel()[0], emp2, 12)
+
+        self.assertEqual(dfmp2.kernel(pt, mf.mo_energy, mf.mo_coeff, 0)[0], 0)
+
+    def test_dfmp2_cholesky(self):
+        mf0 = scf.RHF(mol)
+        mf0.scf()
+        emp2 = mp.MP2(mf0).kernel()[0]
+        pt = dfmp2.MP2(mf0)
+        pt.auxbasis = None
+        pt.cholesky_tol = 1e-9
+        self.assertAlmostEqual(pt.kernel()[0], emp2, 6)
+
+    def test_occ_blksize(self):
+        self.assertEqual(dfmp2._occ_blksize(100, 5, 20, 4000), 5)
+        self.assertEqual(dfmp2._occ_blksize(100, 5, 20, 1e-3), 1)
+
+
+if __name__ == "__main__":
+    print("Full Tests for dfmp2")
+    unittest.main()
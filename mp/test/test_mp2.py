@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import unittest
+import tempfile
 from functools import reduce
 import numpy
 from pyscf import scf
@@ -58,6 +59,30 @@ class KnowValues(unittest.TestCase):
         rdm1 = mp.mp2.make_rdm1(pt, mf.mo_energy, mf.mo_coeff, nocc)
         self.assertTrue(numpy.allclose(rdm1, dm1ref))
 
+    def test_mp2_without_t2(self):
+        nocc = mol.nelectron//2
+        pt = mp.MP2(mf)
+        emp2, t2 = pt.kernel()
+        ovov = pt.ao2mo(mf.mo_coeff, nocc)
+        self.assertTrue(pt._ovov[3] is ovov)
+
+        pt.with_t2 = False
+        emp2_only, t2_only = pt.kernel()
+        self.assertTrue(t2_only is None)
+        self.assertAlmostEqual(emp2_only, emp2, 12)
+        self.assertTrue(pt.ao2mo(mf.mo_coeff, nocc) is ovov)
+
+        ftmp = tempfile.NamedTemporaryFile()
+        pt.with_t2 = True
+        pt.t2file = ftmp.name
+        emp2_h5, t2_h5 = pt.kernel()
+        self.assertAlmostEqual(emp2_h5, emp2, 12)
+        self.assertTrue(numpy.allclose(t2_h5[:], t2))
+
+        # the cache is not used with a different max_memory
+        pt.max_memory = 1
+        self.assertTrue(pt.ao2mo(mf.mo_coeff, nocc) is not ovov)
+
 
 
 if __name__ == "__main__":
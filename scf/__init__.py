@@ -40,6 +40,9 @@ to control the SCF method.
         Direct SCF is used by default.
     direct_scf_tol : float
         Direct SCF cutoff threshold.  Default is 1e-13.
+    rebuild_nsteps : int
+        Rebuild the incrementally updated HF potential from scratch every
+        rebuild_nsteps cycles.  Default is 5.
 
     nelectron_alpha : int, for UHF class only
         number of alpha electrons.  By default it is determined by the orbital
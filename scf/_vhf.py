@@ -105,14 +105,21 @@ def make_cintopt(atm, bas, env, intor):
 # hermi = 2 : anti-hermitian
 ################################################
 def incore(eri, dm, hermi=0):
+    '''J, K matrices of incore eri for one density matrix or a stack of
+    density matrices.  The eri array is traversed only once for all density
+    matrices.
+    '''
     eri = numpy.ascontiguousarray(eri)
-    dm = numpy.ascontiguousarray(dm)
-    nao = dm.shape[0]
-    vj = numpy.empty((nao,nao))
-    vk = numpy.empty((nao,nao))
+    dm = numpy.asarray(dm, order='C')
+    dm_shape = dm.shape
+    nao = dm_shape[-1]
+    dms = dm.reshape(-1,nao,nao)
+    n_dm = dms.shape[0]
+    vj = numpy.empty((n_dm,nao,nao))
+    vk = numpy.empty((n_dm,nao,nao))
     npair = nao*(nao+1)//2
     if eri.ndim == 2 and npair*npair == eri.size: # 4-fold symmetry eri
-        fdrv = getattr(libcvhf, 'CVHFnrs4_incore_drv')
+        fdrv = getattr(libcvhf, 'CVHFnrs4_incore_ndm_drv')
         # 'ijkl,kl->ij'
         fvj = _fpointer('CVHFnrs4_kl_s2ij')
         # 'ijkl,il->jk'
@@ -123,29 +130,36 @@ def incore(eri, dm, hermi=0):
         ## 'ijkl,jk->il'
         #fvk = _fpointer('CVHFnrs4_jk_s1il')
 
-        tridm = dm
+        tridms = dms
     else: # 8-fold symmetry eri
-        fdrv = getattr(libcvhf, 'CVHFnrs8_incore_drv')
+        fdrv = getattr(libcvhf, 'CVHFnrs8_incore_ndm_drv')
         fvj = _fpointer('CVHFnrs8_tridm_vj')
         if hermi == 1:
             fvk = _fpointer('CVHFnrs8_jk_s2il')
         else:
             fvk = _fpointer('CVHFnrs8_jk_s1il')
-        tridm = pyscf.lib.pack_tril(pyscf.lib.transpose_sum(dm))
-        for i in range(nao):
-            tridm[i*(i+1)//2+i] *= .5
+        tridms = numpy.empty((n_dm,npair))
+        diagidx = numpy.arange(nao)
+        diagidx = diagidx*(diagidx+1)//2 + diagidx
+        for i in range(n_dm):
+            tridms[i] = pyscf.lib.pack_tril(pyscf.lib.transpose_sum(dms[i]))
+            tridms[i,diagidx] *= .5
+    dmj = (ctypes.c_void_p*n_dm)()
+    dmk = (ctypes.c_void_p*n_dm)()
+    for i in range(n_dm):
+        dmj[i] = tridms[i].ctypes.data_as(ctypes.c_void_p)
+        dmk[i] = dms[i].ctypes.data_as(ctypes.c_void_p)
     fdrv(eri.ctypes.data_as(ctypes.c_void_p),
-         tridm.ctypes.data_as(ctypes.c_void_p),
-         vj.ctypes.data_as(ctypes.c_void_p),
-         dm.ctypes.data_as(ctypes.c_void_p),
-         vk.ctypes.data_as(ctypes.c_void_p),
-         ctypes.c_int(nao), fvj, fvk)
-    if hermi != 0:
-        vj = pyscf.lib.hermi_triu(vj, hermi)
-        vk = pyscf.lib.hermi_triu(vk, hermi)
-    else:
-        vj = pyscf.lib.hermi_triu(vj, 1)
-    return vj, vk
+         dmj, vj.ctypes.data_as(ctypes.c_void_p),
+         dmk, vk.ctypes.data_as(ctypes.c_void_p),
+         ctypes.c_int(n_dm), ctypes.c_int(nao), fvj, fvk)
+    for i in range(n_dm):
+        if hermi != 0:
+            vj[i] = pyscf.lib.hermi_triu(vj[i], hermi)
+            vk[i] = pyscf.lib.hermi_triu(vk[i], hermi)
+        else:
+            vj[i] = pyscf.lib.hermi_triu(vj[i], 1)
+    return vj.reshape(dm_shape), vk.reshape(dm_shape)
 
 # use cint2e_sph as cintor, CVHFnrs8_ij_s2kl, CVHFnrs8_jk_s2il as fjk to call
 # direct_mapdm
@@ -19,6 +19,12 @@ def density_fit(mf, auxbasis='weigend'):
 
     Kwargs:
         auxbasis : str
+            The auxiliary basis.  "auto" generates the even-tempered basis
+            from the orbital basis (see :func:`df.incore.etb_auxbasis`).
+            If it is None, the pivoted Cholesky vectors
+            of the ERI matrix (see :func:`df.cholesky.cholesky_eri`) are used
+            in place of the auxiliary basis.  The accuracy is controlled by
+            the attribute cholesky_tol.
 
     Returns:
         An SCF object with a modified J, K matrix constructor which uses density
@@ -43,9 +49,10 @@ def density_fit(mf, auxbasis='weigend'):
         def __init__(self):
             self.__dict__.update(mf.__dict__)
             self.auxbasis = auxbasis
+            self.cholesky_tol = CHOLESKY_TOL
             self._cderi = None
             self.direct_scf = False
-            self._keys = self._keys.union(['auxbasis'])
+            self._keys = self._keys.union(['auxbasis', 'cholesky_tol'])
 
         def get_jk(self, mol=None, dm=None, hermi=1):
             if mol is None: mol = self.mol
@@ -54,6 +61,15 @@ def density_fit(mf, auxbasis='weigend'):
                 return r_get_jk_(self, mol, dm, hermi)
             else:
                 return get_jk_(self, mol, dm, hermi)
+
+        def make_rdm1(self, mo_coeff=None, mo_occ=None):
+            if mo_coeff is None: mo_coeff = self.mo_coeff
+            if mo_occ is None: mo_occ = self.mo_occ
+            dm = mf.__class__.make_rdm1(self, mo_coeff, mo_occ)
+            if isinstance(self, pyscf.scf.dhf.UHF):
+                return dm
+            else:
+                return tag_occ_coeff(dm, mo_coeff, mo_occ)
     return HF()
 
 def density_fit_(mf, auxbasis='weigend'):
@@ -67,16 +83,29 @@ def density_fit_(mf, auxbasis='weigend'):
             return r_get_jk_(mf, mol, dm, hermi)
         else:
             return get_jk_(mf, mol, dm, hermi)
+    make_rdm1_orig = mf.make_rdm1
+    def make_rdm1(mo_coeff=None, mo_occ=None):
+        if mo_coeff is None: mo_coeff = mf.mo_coeff
+        if mo_occ is None: mo_occ = mf.mo_occ
+        dm = make_rdm1_orig(mo_coeff, mo_occ)
+        if isinstance(mf, pyscf.scf.dhf.UHF):
+            return dm
+        else:
+            return tag_occ_coeff(dm, mo_coeff, mo_occ)
     mf.get_jk = get_jk
+    mf.make_rdm1 = make_rdm1
     mf.auxbasis = auxbasis
+    mf.cholesky_tol = CHOLESKY_TOL
     mf._cderi = None
     mf.direct_scf = False
-    mf._keys = mf._keys.union(['auxbasis'])
+    mf._keys = mf._keys.union(['auxbasis', 'cholesky_tol'])
     return mf
 
 
 OCCDROP = 1e-12
 BLOCKDIM = 160
+# Threshold of the pivoted Cholesky decomposition when auxbasis is None
+CHOLESKY_TOL = 1e-6
 def get_jk_(mf, mol, dms, hermi=1):
     from pyscf import df
     from pyscf.ao2mo import _ao2mo
@@ -84,109 +113,204 @@ def get_jk_(mf, mol, dms, hermi=1):
     if not hasattr(mf, '_cderi') or mf._cderi is None:
         log = logger.Logger(mf.stdout, mf.verbose)
         nao = mol.nao_nr()
-        auxmol = df.incore.format_aux_basis(mol, mf.auxbasis)
-        mf._naoaux = auxmol.nao_nr()
-        if nao*(nao+1)/2*mf._naoaux*8 < mf.max_memory*1e6:
-            mf._cderi = df.incore.cholesky_eri(mol, auxbasis=mf.auxbasis,
-                                               verbose=log)
+        if mf.auxbasis is None:
+            mf._cderi = df.cholesky.cholesky_eri(mol, mf.cholesky_tol,
+                                                 verbose=log,
+                                                 max_memory=mf.max_memory)
+            mf._naoaux = mf._cderi.shape[0]
         else:
-            mf._cderi_file = tempfile.NamedTemporaryFile()
-            mf._cderi = mf._cderi_file.name
-            mf._cderi = df.outcore.cholesky_eri(mol, mf._cderi,
-                                                auxbasis=mf.auxbasis,
-                                                verbose=log)
+            auxmol = df.incore.format_aux_basis(mol, mf.auxbasis)
+            mf._naoaux = auxmol.nao_nr()
+            if nao*(nao+1)/2*mf._naoaux*8 < mf.max_memory*1e6:
+                mf._cderi = df.incore.cholesky_eri(mol, auxbasis=mf.auxbasis,
+                                                   verbose=log)
+            else:
+                mf._cderi_file = tempfile.NamedTemporaryFile()
+                mf._cderi = mf._cderi_file.name
+                mf._cderi = df.outcore.cholesky_eri(mol, mf._cderi,
+                                                    auxbasis=mf.auxbasis,
+                                                    verbose=log)
 
-    cderi = mf._cderi
+    cderi = load_cderi(mf)
     nao = mol.nao_nr()
+    fmmm = df.incore._fpointer('RIhalfmmm_nr_s2_bra')
+    fdrv = _ao2mo.libao2mo.AO2MOnr_e2_drv
+    ftrans = _ao2mo._fpointer('AO2MOtranse2_nr_s2kl')
 
-    def fjk(dm):
-        #:vj = reduce(numpy.dot, (cderi.reshape(-1,nao*nao), dm.reshape(-1),
-        #:                        cderi.reshape(-1,nao*nao))).reshape(nao,nao)
-        fmmm = df.incore._fpointer('RIhalfmmm_nr_s2_bra')
-        fdrv = _ao2mo.libao2mo.AO2MOnr_e2_drv
-        ftrans = _ao2mo._fpointer('AO2MOtranse2_nr_s2kl')
-        vj = numpy.zeros_like(dm)
-        vk = numpy.zeros_like(dm)
-        if hermi == 1:
+# The occupied orbitals (see tag_occ_coeff) are dropped by reshape
+    occ_coeff = getattr(dms, 'occ_coeff', None)
+    if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
+        dms = dms.reshape(1,nao,nao)
+        single_dm = True
+    else:
+        single_dm = False
+    nset = len(dms)
+    if occ_coeff is not None and not _occ_coeff_consistent(dms, occ_coeff):
+        logger.debug(mf, 'occ_coeff does not match dm, it is ignored')
+        occ_coeff = None
+    vj = numpy.empty((nset,nao,nao))
+    vk = numpy.zeros((nset,nao,nao))
+    vjtril = numpy.zeros((nset,nao*(nao+1)//2))
+    if hermi != 1 or occ_coeff is None:
+        diagidx = numpy.arange(nao)
+        diagidx = diagidx*(diagidx+1)//2 + diagidx
+        dmtril = numpy.empty((nset,nao*(nao+1)//2))
+        for k in range(nset):
+            dmtril[k] = pyscf.lib.pack_tril(dms[k]+dms[k].T)
+            dmtril[k,diagidx] *= .5
+
+    if hermi == 1:
+        #:vk = numpy.einsum('pij,jk->kpi', cderi, c[:,abs(e)>OCCDROP])
+        #:vk = numpy.einsum('kpi,kpj->ij', vk, vk)
+        if occ_coeff is not None:
+# dm[k] = c[k] c[k]^T.  J is contracted with the half-transformed integrals
+# of K, so that each block is only used in one pass.
+            cposs = [numpy.asfortranarray(c) for c in occ_coeff]
+            cnegs = [numpy.zeros((nao,0))] * nset
+        else:
 # I cannot assume dm is positive definite because it might be the density
 # matrix difference when the mf.direct_scf flag is set.
-            e, c = scipy.linalg.eigh(dm)
-            pos = e > OCCDROP
-            neg = e < -OCCDROP
-            if sum(pos)+sum(neg) > 0:
-                dmtril = pyscf.lib.pack_tril(dm+dm.T)
-                for i in range(nao):
-                    dmtril[i*(i+1)//2+i] *= .5
-
-                #:vk = numpy.einsum('pij,jk->kpi', cderi, c[:,abs(e)>OCCDROP])
-                #:vk = numpy.einsum('kpi,kpj->ij', vk, vk)
+            cposs = []
+            cnegs = []
+            for dm in dms:
+                e, c = scipy.linalg.eigh(dm)
+                pos = e > OCCDROP
+                neg = e < -OCCDROP
                 cpos = numpy.einsum('ij,j->ij', c[:,pos], numpy.sqrt(e[pos]))
-                cpos = numpy.asfortranarray(cpos)
                 cneg = numpy.einsum('ij,j->ij', c[:,neg], numpy.sqrt(-e[neg]))
-                cneg = numpy.asfortranarray(cneg)
-                cposargs = (ctypes.c_int(nao),
-                            ctypes.c_int(0), ctypes.c_int(cpos.shape[1]),
-                            ctypes.c_int(0), ctypes.c_int(0))
-                cnegargs = (ctypes.c_int(nao),
-                            ctypes.c_int(0), ctypes.c_int(cneg.shape[1]),
-                            ctypes.c_int(0), ctypes.c_int(0))
-                for b0, b1 in prange(0, mf._naoaux, BLOCKDIM):
-                    eri1 = df.load_buf(cderi, b0, b1-b0)
-                    buf = reduce(numpy.dot, (eri1, dmtril, eri1))
-                    vj += pyscf.lib.unpack_tril(buf, hermi)
-                    if cpos.shape[1] > 0:
-                        buf = numpy.empty(((b1-b0)*cpos.shape[1],nao))
-                        fdrv(ftrans, fmmm,
-                             buf.ctypes.data_as(ctypes.c_void_p),
-                             eri1.ctypes.data_as(ctypes.c_void_p),
-                             cpos.ctypes.data_as(ctypes.c_void_p),
-                             ctypes.c_int(b1-b0), *cposargs)
-                        vk += numpy.dot(buf.T, buf)
-                    if cneg.shape[1] > 0:
-                        buf = numpy.empty(((b1-b0)*cneg.shape[1],nao))
-                        fdrv(ftrans, fmmm,
-                             buf.ctypes.data_as(ctypes.c_void_p),
-                             eri1.ctypes.data_as(ctypes.c_void_p),
-                             cneg.ctypes.data_as(ctypes.c_void_p),
-                             ctypes.c_int(b1-b0), *cnegargs)
-                        vk -= numpy.dot(buf.T, buf)
-        else:
-            #:vk = numpy.einsum('pij,jk->pki', cderi, dm)
-            #:vk = numpy.einsum('pki,pkj->ij', cderi, vk)
-            fcopy = df.incore._fpointer('RImmm_nr_s2_copy')
-            rargs = (ctypes.c_int(nao),
-                     ctypes.c_int(0), ctypes.c_int(nao),
-                     ctypes.c_int(0), ctypes.c_int(0))
-            dm = numpy.asarray(dm, order='F')
-            for b0, b1 in prange(0, mf._naoaux, BLOCKDIM):
-                eri1 = df.load_buf(cderi, b0, b1-b0)
-                buf = numpy.empty((b1-b0,nao,nao))
+                cposs.append(numpy.asfortranarray(cpos))
+                cnegs.append(numpy.asfortranarray(cneg))
+        ncmax = max([c.shape[1] for c in cposs+cnegs])
+
+        def fvk(eri1, c, vk, sign):
+            nc = c.shape[1]
+            if nc > 0:
+                naux = eri1.shape[0]
+                buf = numpy.empty((naux*nc,nao))
                 fdrv(ftrans, fmmm,
                      buf.ctypes.data_as(ctypes.c_void_p),
                      eri1.ctypes.data_as(ctypes.c_void_p),
-                     dm.ctypes.data_as(ctypes.c_void_p),
-                     ctypes.c_int(b1-b0), *rargs)
-                rho = numpy.einsum('kii->k', buf)
-                vj += pyscf.lib.unpack_tril(numpy.dot(rho, eri1), 1)
+                     c.ctypes.data_as(ctypes.c_void_p),
+                     ctypes.c_int(naux), ctypes.c_int(nao),
+                     ctypes.c_int(0), ctypes.c_int(nc),
+                     ctypes.c_int(0), ctypes.c_int(0))
+                if sign > 0:
+                    vk += numpy.dot(buf.T, buf)
+                else:
+                    vk -= numpy.dot(buf.T, buf)
+                return buf
+
+# Each block of the 3-index tensor is loaded once and contracted with all
+# density matrices
+        for b0, b1, eri1 in cderi.loop(_blockdim(mf, nao, ncmax*nao)):
+            if occ_coeff is None:
+                rho = numpy.dot(eri1, dmtril.T)
+            else:
+                rho = numpy.zeros((b1-b0,nset))
+            for k in range(nset):
+                buf = fvk(eri1, cposs[k], vk[k],  1)
+                fvk(eri1, cnegs[k], vk[k], -1)
+                if occ_coeff is not None and buf is not None:
+                    #:rho[:,k] = numpy.einsum('pij,ji->p', buf, cposs[k])
+                    rho[:,k] = numpy.dot(buf.reshape(b1-b0,-1),
+                                         cposs[k].T.ravel())
+            vjtril += numpy.dot(rho.T, eri1)
+    else:
+        #:vk = numpy.einsum('pij,jk->pki', cderi, dm)
+        #:vk = numpy.einsum('pki,pkj->ij', cderi, vk)
+        fcopy = df.incore._fpointer('RImmm_nr_s2_copy')
+        rargs = (ctypes.c_int(nao),
+                 ctypes.c_int(0), ctypes.c_int(nao),
+                 ctypes.c_int(0), ctypes.c_int(0))
+        dms = [numpy.asarray(dm, order='F') for dm in dms]
+        for b0, b1, eri1 in cderi.loop(_blockdim(mf, nao, nao*nao*2)):
+            rho = numpy.dot(eri1, dmtril.T)
+            vjtril += numpy.dot(rho.T, eri1)
 
-                buf1 = numpy.empty((b1-b0,nao,nao))
-                fdrv(ftrans, fcopy,
-                     buf1.ctypes.data_as(ctypes.c_void_p),
+            buf1 = numpy.empty((b1-b0,nao,nao))
+            fdrv(ftrans, fcopy,
+                 buf1.ctypes.data_as(ctypes.c_void_p),
+                 eri1.ctypes.data_as(ctypes.c_void_p),
+                 dms[0].ctypes.data_as(ctypes.c_void_p),
+                 ctypes.c_int(b1-b0), *rargs)
+            buf1 = buf1.reshape(-1,nao)
+            buf = numpy.empty((b1-b0,nao,nao))
+            for k in range(nset):
+                fdrv(ftrans, fmmm,
+                     buf.ctypes.data_as(ctypes.c_void_p),
                      eri1.ctypes.data_as(ctypes.c_void_p),
-                     dm.ctypes.data_as(ctypes.c_void_p),
+                     dms[k].ctypes.data_as(ctypes.c_void_p),
                      ctypes.c_int(b1-b0), *rargs)
-                vk += numpy.dot(buf.reshape(-1,nao).T, buf1.reshape(-1,nao))
-        return vj, vk
+                vk[k] += numpy.dot(buf.reshape(-1,nao).T, buf1)
 
-    if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
-        vj, vk = fjk(dms)
-    else:
-        vjk = [fjk(dm) for dm in dms]
-        vj = numpy.array([x[0] for x in vjk])
-        vk = numpy.array([x[1] for x in vjk])
+    for k in range(nset):
+        vj[k] = pyscf.lib.unpack_tril(vjtril[k], 1)
+    if single_dm:
+        vj = vj[0]
+        vk = vk[0]
     logger.timer(mf, 'vj and vk', *t0)
     return vj, vk
 
+def _blockdim(mf, nao, ncol):
+    '''Number of auxiliary basis functions in one block of the 3-index
+    tensor for the given max_memory.  ncol is the size of the intermediates
+    of one auxiliary basis function.  Two blocks of the integrals are held in
+    memory when the next block is read in the background.'''
+    naux = getattr(mf, '_naoaux', None) or BLOCKDIM
+    unit = (nao*(nao+1)//2 * 2 + ncol) * 8e-6
+    blksize = int(mf.max_memory*.5 / unit)
+    return max(1, min(naux, blksize))
+
+
+class OccDM(numpy.ndarray):
+    '''Density matrix which carries the occupied orbitals occ_coeff, one
+    (nao,nocc) array for each density matrix, dm[k] = c[k] c[k]^T.  The
+    orbitals are not passed on to the arrays derived from the density matrix.
+    get_jk_ ignores the orbitals if the density matrix was modified in place.
+    '''
+    def __array_finalize__(self, obj):
+        self.occ_coeff = None
+
+def tag_occ_coeff(dm, mo_coeff, mo_occ):
+    '''Attach the occupied orbitals of RHF, UHF or ROHF to the density
+    matrix, so that get_jk_ can skip the eigen-decomposition of the density
+    matrix.'''
+    mo_occ = numpy.asarray(mo_occ)
+    if mo_occ.ndim == 2:  # UHF
+        occ_coeff = [mo_coeff[k][:,mo_occ[k]>0] * numpy.sqrt(mo_occ[k][mo_occ[k]>0])
+                     for k in range(2)]
+    elif dm.ndim == 3:  # ROHF
+        occ_coeff = [mo_coeff[:,mo_occ>0], mo_coeff[:,mo_occ==2]]
+    else:
+        occ_coeff = [mo_coeff[:,mo_occ>0] * numpy.sqrt(mo_occ[mo_occ>0])]
+    dm = numpy.asarray(dm).view(OccDM)
+    dm.occ_coeff = occ_coeff
+    return dm
+
+def _occ_coeff_consistent(dms, occ_coeff):
+    '''Whether dm[k] = c[k] c[k]^T still holds, eg the tagged dm might be
+    modified in place.  The check costs nao^2*nocc, which is negligible
+    compared to K.'''
+    if len(occ_coeff) != len(dms):
+        return False
+    for k, c in enumerate(occ_coeff):
+        if not numpy.allclose(numpy.dot(c, c.T), dms[k], atol=1e-10):
+            return False
+    return True
+
+
+def load_cderi(mf):
+    '''The persistent handle (:class:`df.addons.load`) of mf._cderi.  The
+    integral file is opened at the first call and reused by the following SCF
+    iterations and post-HF methods until mf._cderi is changed.'''
+    from pyscf import df
+    store = getattr(mf, '_cderi_store', None)
+    if store is None or store.cderi is not mf._cderi:
+        if store is not None:
+            store.close()
+        store = mf._cderi_store = df.addons.load(mf._cderi)
+    return store
+
 
 def r_get_jk_(mf, mol, dms, hermi=1):
     '''Relativistic density fitting JK'''
@@ -24,28 +24,79 @@ class DIIS:
 # to minimize the error in the least square sense.
     '''
 diis.space is the maximum of the allowed space
-diis.min_space is the minimal number of vectors to store before damping'''
+diis.min_space is the minimal number of vectors to store before damping
+
+The vectors and the error vectors are held in a ring buffer.  The overlap of
+the error vectors is cached, only the overlap between the new error vector and
+the stored ones (one matrix-vector multiplication) is computed in each update.
+If the error vector is not given by push_err_vec, the difference between two
+successive vectors is used as the error.'''
     def __init__(self, dev):
         self.verbose = dev.verbose
         self.stdout = dev.stdout
-        self._vec_stack = []
         self.conv_tol = 1e-6
         self.space = 6
         self.min_space = 1
+        self._reset()
+
+    def _reset(self):
+        self._xs = None
+        self._errs = None
+        self._H = None
+        self._head = 0
+        self._nd = 0
+        self._xprev = None
+        self._err_pending = None
+
+    def _alloc(self, x, xerr):
+        self._xs = numpy.empty((self.space,x.size), x.dtype)
+        self._errs = numpy.empty((self.space,xerr.size), xerr.dtype)
+        self._H = numpy.zeros((self.space,self.space),
+                              numpy.result_type(xerr.dtype, x.dtype))
+
+    def _store(self, slot, x, xerr):
+        '''Save x, xerr in the slot of the ring buffer and return the
+        overlap between xerr and the error vectors in slots [0:nd]'''
+        self._xs[slot] = x
+        self._errs[slot] = xerr
+        return numpy.dot(self._errs[:self._nd].conj(), xerr)
+
+    def _extrapolate(self, c):
+        return numpy.dot(c, self._xs[:self._nd])
+
+    def push_err_vec(self, xerr):
+        self._err_pending = numpy.asarray(xerr).ravel()
 
     def push_vec(self, x):
-        self._vec_stack.append(x)
-        if self._vec_stack.__len__() > self.space:
-            self._vec_stack.pop(0)
+        x = numpy.asarray(x).ravel()
+        if self._err_pending is None:
+            if self._xprev is None:
+                self._xprev = x.copy()
+                return
+            xerr = x - self._xprev
+            self._xprev = x.copy()
+        else:
+            xerr = self._err_pending
+            self._err_pending = None
+
+        if self._H is None or self._H.shape[0] != self.space:
+            self._nd = self._head = 0
+            self._alloc(x, xerr)
+        slot = self._head
+        self._head = (self._head + 1) % self.space
+        self._nd = min(self._nd+1, self.space)
+        row = self._store(slot, x, xerr)
+        self._H[:self._nd,slot] = row
+        self._H[slot,:self._nd] = row.conj()
 
     def get_err_vec(self, idx):
-        return self._vec_stack[idx+1] - self._vec_stack[idx]
+        return self._errs[idx]
 
     def get_vec(self, idx):
-        return self._vec_stack[idx+1]
+        return self._xs[idx]
 
     def get_num_diis_vec(self):
-        return self._vec_stack.__len__() - 1
+        return self._nd
 
     def update(self, x):
         '''use DIIS method to solve Eq.  operator(x) = x.'''
@@ -55,17 +106,11 @@ diis.min_space is the minimal number of vectors to store before damping'''
         if nd <= self.min_space:
             return x
 
-        H = numpy.ones((nd+1,nd+1), x.dtype)
+        H = numpy.ones((nd+1,nd+1), self._H.dtype)
         H[0,0] = 0
-        G = numpy.zeros(nd+1, x.dtype)
+        H[1:,1:] = self._H[:nd,:nd]
+        G = numpy.zeros(nd+1, self._H.dtype)
         G[0] = 1
-        for i in range(nd):
-            dti = self.get_err_vec(i)
-            for j in range(i+1):
-                dtj = self.get_err_vec(j)
-                H[i+1,j+1] = numpy.dot(numpy.array(dti).ravel(), \
-                                       numpy.array(dtj).ravel())
-                H[j+1,i+1] = H[i+1,j+1].conj()
 
         try:
             c = numpy.linalg.solve(H, G)
@@ -73,21 +118,19 @@ diis.min_space is the minimal number of vectors to store before damping'''
             log.warn(self, 'singularity in diis')
             #c = pyscf.lib.solve_lineq_by_SVD(H, G)
             ## damp diagonal elements to avoid singularity
-            #for i in range(H.shape[0]):
-            #    H[i,i] = H[i,i] + 1e-9
-            #c = numpy.linalg.solve(H, G)
-            for i in range(1,nd):
+            for i in range(1,nd+1):
                 H[i,i] = H[i,i] + 1e-11
             c = numpy.linalg.solve(H, G)
-            #c = numpy.linalg.solve(H[:nd,:nd], G[:nd])
         log.debug1(self, 'diis-c %s', c)
 
-        x = numpy.zeros_like(x)
-        for i, ci in enumerate(c[1:]):
-            x += self.get_vec(i) * ci
-        return x
+        return self._extrapolate(c[1:]).reshape(numpy.shape(x))
 
 class DIISLarge(DIIS):
+    '''DIIS with the vectors and error vectors stored in HDF5 file.  The
+    overlap matrix of the error vectors is cached.  Each update streams the
+    stored error vectors once, in blocks of blksize elements, to compute the
+    overlap with the new error vector.  The extrapolated vector is assembled
+    block by block, reading each stored vector once.'''
     def __init__(self, dev, filename=None):
         import h5py
         DIIS.__init__(self, dev)
@@ -95,78 +138,97 @@ class DIISLarge(DIIS):
             self._tmpfile = tempfile.NamedTemporaryFile(suffix='.h5')
             filename = self._tmpfile.name
         self.diisfile = h5py.File(filename, 'w')
-        self._count = 0
-        self._head = 0
-        self._is_tmpfile_reused = False
-
-    def push_vec(self, x):
-        key = 'x%d' % (self._count % self.space)
-        if self._count < self.space:
-            self.diisfile[key] = x
-        else:
-            self.diisfile[key][:] = x
-        self._count += 1
+        self.blksize = 4000000
+
+    def _alloc(self, x, xerr):
+        self._H = numpy.zeros((self.space,self.space),
+                              numpy.result_type(xerr.dtype, x.dtype))
+
+    def _store(self, slot, x, xerr):
+        for key, v in (('x%d'%slot, x), ('e%d'%slot, xerr)):
+            if key in self.diisfile and self.diisfile[key].shape == v.shape:
+                self.diisfile[key][:] = v
+            else:
+                if key in self.diisfile:
+                    del(self.diisfile[key])
+                self.diisfile[key] = v
+
+        nd = self._nd
+        row = numpy.zeros(nd, self._H.dtype)
+        others = [i for i in range(nd) if i != slot]
+        dsets = [self.diisfile['e%d'%i] for i in others]
+        for p0, p1 in _prange(0, xerr.size, self.blksize):
+            xblk = xerr[p0:p1]
+            for k, i in enumerate(others):
+                row[i] += numpy.dot(dsets[k][p0:p1].conj(), xblk)
+        row[slot] = numpy.dot(xerr.conj(), xerr)
+        return row
+
+    def _extrapolate(self, c):
+        dsets = [self.diisfile['x%d'%i] for i in range(self._nd)]
+        n = dsets[0].shape[0]
+        x = numpy.empty(n, numpy.result_type(c.dtype, dsets[0].dtype))
+        for p0, p1 in _prange(0, n, self.blksize):
+            x[p0:p1] = 0
+            for i, dset in enumerate(dsets):
+                x[p0:p1] += dset[p0:p1] * c[i]
+        return x
 
     def get_err_vec(self, idx):
-        if self._count < self.space:
-            return numpy.array(self.diisfile['x%d'%(idx+1)]) \
-                 - numpy.array(self.diisfile['x%d'%idx])
-        else:
-# the previous vector may refer to the last one in circular store
-            last_id = (idx+self.space-1) % self.space
-            return numpy.array(self.diisfile['x%d'%idx]) \
-                 - numpy.array(self.diisfile['x%d'%last_id])
+        return numpy.array(self.diisfile['e%d'%idx])
 
     def get_vec(self, idx):
-        if self._count < self.space:
-            return numpy.array(self.diisfile['x%d'%(idx+1)])
-        else:
-            return numpy.array(self.diisfile['x%d'%idx])
+        return numpy.array(self.diisfile['x%d'%idx])
 
-    def get_num_diis_vec(self):
-        return len(self.diisfile.keys()) - 1
+def _prange(start, end, step):
+    for i in range(start, end, step):
+        yield i, min(i+step, end)
 
 
 # error vector = SDF-FDS
 # error vector = F_ai ~ (S-SDS)*S^{-1}FDS = FDS - SDFDS ~ FDS-SDF in converge
 class SCF_DIIS(DIIS):
+    '''DIIS for SCF.  The error vector is FDS-SDF.  If orth_err is set, the
+    error vector is transformed to the orthogonal basis, X^+(FDS-SDF)X with
+    X = S^{-1/2}'''
     def __init__(self, dev):
         DIIS.__init__(self, dev)
-        self.err_vec_stack = []
         self.start_cycle = 3
         self.space = 8
+        self.orth_err = False
+        self._orth = (None, None)
 
     def clear_diis_space(self):
-        self._vec_stack = []
-        self.err_vec_stack = []
+        self._reset()
 
-    def push_err_vec(self, s, d, f):
+    def get_sdf_err(self, s, d, f):
         sdf = reduce(numpy.dot, (s,d,f))
         errvec = sdf.T.conj() - sdf
-        log.debug1(self, 'diis-norm(errvec) = %g', numpy.linalg.norm(errvec))
-
-        self.err_vec_stack.append(errvec)
-        if self.err_vec_stack.__len__() > self.space:
-            self.err_vec_stack.pop(0)
+        if self.orth_err:
+            if self._orth[0] is not s:
+                e, v = numpy.linalg.eigh(s)
+                self._orth = (s, numpy.dot(v/numpy.sqrt(e), v.T.conj()))
+            x = self._orth[1]
+            errvec = reduce(numpy.dot, (x.T.conj(), errvec, x))
+        return errvec
 
-    def get_err_vec(self, idx):
-        return self.err_vec_stack[idx]
-
-    def get_vec(self, idx):
-        return self._vec_stack[idx]
-
-    def get_num_diis_vec(self):
-        return self._vec_stack.__len__()
+    def push_err_vec(self, s, d, f):
+        errvec = self.get_sdf_err(s, d, f)
+        log.debug1(self, 'diis-norm(errvec) = %g', numpy.linalg.norm(errvec))
+        DIIS.push_err_vec(self, errvec)
 
     def update(self, s, d, f):
         self.push_err_vec(s, d, f)
         return DIIS.update(self, f)
 
-#TODO
 def with_inits(inits, DiisClass):
+    '''Return a constructor of DiisClass whose ring buffer is seeded with the
+    vectors in inits.  Without the error vectors, the differences between
+    successive vectors of inits are used as the errors.'''
     def fn(*args):
-        adiis = DiisClass(args)
-        adiis._vec_stack = inits
+        adiis = DiisClass(*args)
+        for x in inits:
+            adiis.push_vec(x)
         return adiis
     return fn
 
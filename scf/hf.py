@@ -18,6 +18,9 @@ from pyscf.scf import chkfile
 from pyscf.scf import diis
 from pyscf.scf import _vhf
 
+# The loosest integral screening threshold allowed in the incremental Fock
+# build.  See :func:`incremental_direct_scf_tol`
+INCR_SCF_TOL_MAX = 1e-9
 
 
 def kernel(mf, conv_tol=1e-10, dump_chk=True, init_dm=None):
@@ -89,6 +92,11 @@ def kernel(mf, conv_tol=1e-10, dump_chk=True, init_dm=None):
     dm_last = 0
     log.debug(mf, 'start scf_cycle')
     while not scf_conv and cycle < max(1, mf.max_cycle):
+        if mf.rebuild_nsteps > 0 and cycle % mf.rebuild_nsteps == 0:
+# rebuild the HF potential from scratch to remove the numerical noise
+# accumulated in the incremental Fock build
+            dm_last = 0
+            vhf = 0
         vhf = mf.get_veff(mol, dm, dm_last=dm_last, vhf_last=vhf)
         fock = mf.get_fock(h1e, s1e, vhf, dm, cycle, adiis)
 
@@ -408,7 +416,8 @@ def dot_eri_dm(eri, dm, hermi=0):
     Returns:
         Depending on the given dm, the function returns one J and one K matrix,
         or a list of J matrices and a list of K matrices, corresponding to the
-        input density matrices.
+        input density matrices.  For a list of density matrices, the ERIs are
+        traversed only once.
 
     Examples:
 
@@ -421,12 +430,7 @@ def dot_eri_dm(eri, dm, hermi=0):
     >>> print(j.shape)
     (3, 2, 2)
     '''
-    if isinstance(dm, numpy.ndarray) and dm.ndim == 2:
-        vj, vk = _vhf.incore(eri, dm, hermi=hermi)
-    else:
-        vjk = [_vhf.incore(eri, dmi, hermi=hermi) for dmi in dm]
-        vj = numpy.array([v[0] for v in vjk])
-        vk = numpy.array([v[1] for v in vjk])
+    vj, vk = _vhf.incore(eri, numpy.asarray(dm), hermi=hermi)
     return vj, vk
 
 def get_jk(mol, dm, hermi=1, vhfopt=None):
@@ -518,6 +522,18 @@ def get_veff(mol, dm, dm_last=0, vhf_last=0, hermi=1, vhfopt=None):
     vj, vk = get_jk(mol, ddm, hermi=hermi, vhfopt=vhfopt)
     return numpy.array(vhf_last, copy=False) + vj - vk * .5
 
+def incremental_direct_scf_tol(ddm, direct_scf_tol=1e-13, dm_last=0):
+    '''Integral screening threshold for the incremental Fock build.  The
+    threshold is loosened (up to :data:`INCR_SCF_TOL_MAX`) when the density
+    matrix changes a lot, and tightened towards ``direct_scf_tol`` as the
+    density change shrinks.  When the HF potential is built from scratch
+    (``dm_last`` is 0), the tight threshold ``direct_scf_tol`` is used.
+    '''
+    if not isinstance(dm_last, numpy.ndarray):
+        return direct_scf_tol
+    dm_change = min(abs(numpy.asarray(ddm)).max(), 1)
+    return max(direct_scf_tol, dm_change * INCR_SCF_TOL_MAX)
+
 def analyze(mf, verbose=logger.DEBUG):
     '''Analyze the given SCF object:  print orbital energies, occupancies;
     print orbital coefficients; Mulliken population analysis
@@ -631,6 +647,11 @@ class SCF(object):
             Direct SCF is used by default.
         direct_scf_tol : float
             Direct SCF cutoff threshold.  Default is 1e-13.
+        rebuild_nsteps : int
+            When direct_scf is set, the HF potential is updated incrementally
+            from the density matrix change.  It is rebuilt from scratch every
+            rebuild_nsteps cycles to remove the accumulated numerical noise.
+            Default is 5.  Set it to 0 to turn off the rebuild.
 
     Saved results
 
@@ -677,6 +698,7 @@ class SCF(object):
         self.level_shift_factor = 0
         self.direct_scf = True
         self.direct_scf_tol = 1e-13
+        self.rebuild_nsteps = 5
 ##################################################
 # don't modify the following attributes, they are not input options
         self.mo_energy = None
@@ -717,6 +739,8 @@ class SCF(object):
         if self.direct_scf:
             log.info(self, 'direct_scf_tol = %g', \
                      self.direct_scf_tol)
+            log.info(self, 'rebuild HF potential every %d cycles', \
+                     self.rebuild_nsteps)
         if self.chkfile:
             log.info(self, 'chkfile to save SCF result = %s', self.chkfile)
 
@@ -916,18 +940,31 @@ class SCF(object):
         '''Hartree-Fock potential matrix for the given density matrix.
         See :func:`scf.hf.get_veff`
 
-        Note the effects of :attr:`SCF.direct_scf` on this function
+        Note the effects of :attr:`SCF.direct_scf` on this function.  When it
+        is set, the HF potential is computed incrementally from the density
+        matrix change for both the incore and the integral-direct J, K builds.
         '''
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
         if self.direct_scf:
             ddm = numpy.array(dm, copy=False) - numpy.array(dm_last, copy=False)
+            self.set_direct_scf_tol_(ddm, dm_last)
             vj, vk = self.get_jk(mol, ddm, hermi=hermi)
             return numpy.array(vhf_last, copy=False) + vj - vk * .5
         else:
             vj, vk = self.get_jk(mol, dm, hermi=hermi)
             return vj - vk * .5
 
+    def set_direct_scf_tol_(self, ddm, dm_last=0):
+        '''Adjust the screening threshold of the integral-direct J, K builder
+        for the given density matrix change.
+        See :func:`scf.hf.incremental_direct_scf_tol`
+        '''
+        if self.opt is not None:
+            tol = incremental_direct_scf_tol(ddm, self.direct_scf_tol, dm_last)
+            self.opt.direct_scf_tol = tol
+            log.debug1(self, 'direct_scf_tol for incremental Fock = %g', tol)
+
     def dump_energy(self, hf_energy=None, converged=None):
         if hf_energy is None: hf_energy = self.hf_energy
         if converged is None: converged = self.converged
@@ -1003,18 +1040,6 @@ class RHF(SCF):
         log.timer(self, 'vj and vk', *t0)
         return vj, vk
 
-    def get_veff(self, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
-        '''Hartree-Fock potential matrix for the given density matrix.
-        See :func:`scf.hf.get_veff`
-        '''
-        if mol is None: mol = self.mol
-        if dm is None: dm = self.make_rdm1()
-        if self._eri is not None or self._is_mem_enough():
-            vj, vk = self.get_jk(mol, dm, hermi)
-            return vj - vk * .5
-        else:
-            return SCF.get_veff(self, mol, dm, dm_last, vhf_last, hermi)
-
 
 # use UHF init_guess, get_veff, diis, and intermediates such as fock, vhf, dm
 # keep mo_energy, mo_coeff, mo_occ as RHF structure
@@ -1200,11 +1225,9 @@ class ROHF(RHF):
         if isinstance(dm, numpy.ndarray) and dm.ndim == 2:
             dm = numpy.array((dm*.5,dm*.5))
         nset = len(dm) // 2
-        if self._eri is not None or self._is_mem_enough():
-            vj, vk = self.get_jk(mol, dm, hermi)
-            vhf = pyscf.scf.uhf._makevhf(vj, vk, nset)
         if self.direct_scf:
             ddm = numpy.array(dm, copy=False) - numpy.array(dm_last,copy=False)
+            self.set_direct_scf_tol_(ddm, dm_last)
             vj, vk = self.get_jk(mol, ddm, hermi)
             vhf = pyscf.scf.uhf._makevhf(vj, vk, nset) \
                 + numpy.array(vhf_last, copy=False)
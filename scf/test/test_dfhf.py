@@ -4,6 +4,7 @@
 
 import numpy
 import unittest
+import tempfile
 from pyscf import lib
 from pyscf import gto
 from pyscf import scf
@@ -93,6 +94,64 @@ class KnowValues(unittest.TestCase):
         vhf0 = vj1 - vk1 * .5
         self.assertTrue(numpy.allclose(vhf0, vhf1))
 
+    def test_get_jk_ndm(self):
+        nao = mol.nao_nr()
+        numpy.random.seed(1)
+        dm = numpy.random.random((3,nao,nao))
+        dm = dm + dm.transpose(0,2,1)
+        mf = scf.density_fit(scf.RHF(mol))
+        vj1, vk1 = scf.dfhf.get_jk_(mf, mol, dm, 1)
+        for i in range(3):
+            vj0, vk0 = scf.dfhf.get_jk_(mf, mol, dm[i], 1)
+            self.assertTrue(numpy.allclose(vj0, vj1[i]))
+            self.assertTrue(numpy.allclose(vk0, vk1[i]))
+
+    def test_get_jk_occ_coeff(self):
+        nao = mol.nao_nr()
+        numpy.random.seed(1)
+        mo = numpy.random.random((nao,nao))
+        mo_occ = numpy.zeros(nao)
+        mo_occ[:5] = 2
+        mo_occ[5] = 1
+        mf = scf.density_fit(scf.RHF(mol))
+        dm = mf.make_rdm1(mo, mo_occ)
+        self.assertTrue(dm.occ_coeff is not None)
+        vj0, vk0 = scf.dfhf.get_jk_(mf, mol, numpy.asarray(dm), 1)
+        vj1, vk1 = scf.dfhf.get_jk_(mf, mol, dm, 1)
+        self.assertTrue(numpy.allclose(vj0, vj1))
+        self.assertTrue(numpy.allclose(vk0, vk1))
+
+        # the stale orbitals of the modified dm are not used
+        dm *= .5
+        self.assertTrue(dm.occ_coeff is not None)
+        vj0, vk0 = scf.dfhf.get_jk_(mf, mol, numpy.asarray(dm), 1)
+        vj1, vk1 = scf.dfhf.get_jk_(mf, mol, dm, 1)
+        self.assertTrue(numpy.allclose(vj0, vj1))
+        self.assertTrue(numpy.allclose(vk0, vk1))
+
+        mf = scf.density_fit(scf.UHF(mol))
+        dm = mf.make_rdm1((mo,mo), (mo_occ*.5,(mo_occ>0)*1.))
+        vj0, vk0 = scf.dfhf.get_jk_(mf, mol, numpy.asarray(dm), 1)
+        vj1, vk1 = scf.dfhf.get_jk_(mf, mol, dm, 1)
+        self.assertTrue(numpy.allclose(vj0, vj1))
+        self.assertTrue(numpy.allclose(vk0, vk1))
+
+    def test_load_cderi(self):
+        from pyscf import df
+        ftmp1 = tempfile.NamedTemporaryFile()
+        ftmp2 = tempfile.NamedTemporaryFile()
+        df.outcore.cholesky_eri(mol, ftmp1.name)
+        df.outcore.cholesky_eri(mol, ftmp2.name)
+        mf = scf.density_fit(scf.RHF(mol))
+        mf._cderi = ftmp1.name
+        store1 = dfhf.load_cderi(mf)
+        self.assertTrue(dfhf.load_cderi(mf) is store1)
+        mf._cderi = ftmp2.name
+        store2 = dfhf.load_cderi(mf)
+        self.assertTrue(store1.feri is None)
+        self.assertEqual(store2.nrow, store1.nrow)
+        store2.close()
+
     def test_uhf_veff(self):
         mf = scf.density_fit(scf.UHF(mol))
         nao = mol.nao_nr()
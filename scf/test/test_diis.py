@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf.scf import diis
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = '/dev/null'
+mol.atom = [
+    ["O" , (0. , 0.     , 0.)],
+    [1   , (0. , -0.757 , 0.587)],
+    [1   , (0. , 0.757  , 0.587)] ]
+
+mol.basis = '6-31g'
+mol.build()
+
+def diis_ref(xs, errs):
+    nd = len(xs)
+    H = numpy.ones((nd+1,nd+1))
+    H[0,0] = 0
+    for i in range(nd):
+        for j in range(nd):
+            H[i+1,j+1] = numpy.dot(errs[i], errs[j])
+    G = numpy.zeros(nd+1)
+    G[0] = 1
+    c = numpy.linalg.solve(H, G)
+    return numpy.einsum('i,ij->j', c[1:], numpy.array(xs))
+
+class KnowValues(unittest.TestCase):
+    def test_ring_buffer(self):
+        numpy.random.seed(1)
+        adiis = diis.DIIS(mol)
+        adiis.space = 4
+        xs = []
+        errs = []
+        for i in range(9):
+            x = numpy.random.random(10)
+            e = numpy.random.random(10)
+            xs.append(x)
+            errs.append(e)
+            adiis.push_err_vec(e)
+            x1 = adiis.update(x)
+        self.assertEqual(adiis.get_num_diis_vec(), 4)
+        self.assertTrue(numpy.allclose(x1, diis_ref(xs[-4:], errs[-4:])))
+
+    def test_implicit_err(self):
+        numpy.random.seed(1)
+        adiis = diis.DIIS(mol)
+        adiis.space = 3
+        xs = [numpy.random.random((3,4)) for i in range(6)]
+        for x in xs:
+            x1 = adiis.update(x)
+        errs = [(xs[i+1]-xs[i]).ravel() for i in range(5)]
+        ref = diis_ref([x.ravel() for x in xs[-3:]], errs[-3:])
+        self.assertTrue(numpy.allclose(x1, ref.reshape(3,4)))
+
+    def test_with_inits(self):
+        numpy.random.seed(1)
+        adiis = diis.DIIS(mol)
+        xs = [numpy.random.random(8) for i in range(5)]
+        for x in xs:
+            x1 = adiis.update(x)
+        bdiis = diis.with_inits(xs[:4], diis.DIIS)(mol)
+        self.assertEqual(bdiis.get_num_diis_vec(), 3)
+        self.assertTrue(numpy.allclose(bdiis.update(xs[4]), x1))
+
+    def test_diis_large(self):
+        numpy.random.seed(1)
+        adiis = diis.DIIS(mol)
+        adiis.space = 3
+        ddiis = diis.DIISLarge(mol)
+        ddiis.space = 3
+        ddiis.blksize = 7
+        for i in range(7):
+            x = numpy.random.random(20)
+            x1 = adiis.update(x)
+            x2 = ddiis.update(x)
+        self.assertTrue(numpy.allclose(x1, x2))
+
+    def test_orth_err(self):
+        mf = scf.RHF(mol)
+        mf.DIIS = diis.SCF_DIIS
+        e0 = mf.scf()
+        class SCF_DIIS(diis.SCF_DIIS):
+            def __init__(self, dev):
+                diis.SCF_DIIS.__init__(self, dev)
+                self.orth_err = True
+        mf = scf.RHF(mol)
+        mf.DIIS = SCF_DIIS
+        self.assertAlmostEqual(mf.scf(), e0, 9)
+
+
+if __name__ == "__main__":
+    print("Full Tests for DIIS")
+    unittest.main()
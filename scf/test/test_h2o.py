@@ -104,6 +104,30 @@ class KnowValues(unittest.TestCase):
         uhf.direct_scf = False
         self.assertAlmostEqual(uhf.scf(), -75.98394849812, 9)
 
+    def test_nr_rhf_rebuild(self):
+        rhf = scf.RHF(mol)
+        rhf.conv_tol = 1e-11
+        rhf.rebuild_nsteps = 2
+        self.assertAlmostEqual(rhf.scf(), -75.98394849812, 9)
+        rhf.max_memory = 0
+        rhf.rebuild_nsteps = 0
+        self.assertAlmostEqual(rhf.scf(), -75.98394849812, 9)
+
+    def test_nr_uhf_rebuild(self):
+        uhf = scf.UHF(mol)
+        uhf.conv_tol = 1e-11
+        uhf.max_memory = 0
+        uhf.rebuild_nsteps = 3
+        self.assertAlmostEqual(uhf.scf(), -75.98394849812, 9)
+
+    def test_incremental_direct_scf_tol(self):
+        ddm = numpy.ones((2,2)) * 1e-3
+        self.assertAlmostEqual(scf.hf.incremental_direct_scf_tol(ddm, 1e-13), 1e-13, 15)
+        tol = scf.hf.incremental_direct_scf_tol(ddm, 1e-13, ddm)
+        self.assertAlmostEqual(tol, 1e-12, 15)
+        tol = scf.hf.incremental_direct_scf_tol(ddm*1e-3, 1e-13, ddm)
+        self.assertAlmostEqual(tol, 1e-13, 15)
+
     def test_r_uhf(self):
         uhf = dhf.UHF(mol)
         self.assertAlmostEqual(uhf.scf(), -76.038520472820863, 9)
@@ -34,6 +34,20 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(vj0,vj1))
         self.assertTrue(numpy.allclose(vk0,vk1))
 
+    def test_incore_ndm(self):
+        numpy.random.seed(1)
+        dms = numpy.random.random((3,nao,nao))
+        dms = dms + dms.transpose(0,2,1)
+        vj1, vk1 = _vhf.incore(mf._eri, dms, hermi=1)
+        eri4 = ao2mo.restore(4, mf._eri, nmo)
+        vj2, vk2 = _vhf.incore(eri4, dms, hermi=1)
+        for i in range(3):
+            vj0, vk0 = _vhf.incore(mf._eri, dms[i], hermi=1)
+            self.assertTrue(numpy.allclose(vj0,vj1[i]))
+            self.assertTrue(numpy.allclose(vk0,vk1[i]))
+            self.assertTrue(numpy.allclose(vj0,vj2[i]))
+            self.assertTrue(numpy.allclose(vk0,vk2[i]))
+
     def test_direct_mapdm(self):
         numpy.random.seed(1)
         dm = numpy.random.random((nao,nao))
@@ -490,11 +490,9 @@ class UHF(hf.SCF):
         if isinstance(dm, numpy.ndarray) and dm.ndim == 2:
             dm = numpy.array((dm*.5,dm*.5))
         nset = len(dm) // 2
-        if self._is_mem_enough() or self._eri is not None:
-            vj, vk = self.get_jk(mol, dm, hermi)
-            vhf = _makevhf(vj, vk, nset)
         if self.direct_scf:
             ddm = numpy.array(dm, copy=False) - numpy.array(dm_last,copy=False)
+            self.set_direct_scf_tol_(ddm, dm_last)
             vj, vk = self.get_jk(mol, ddm, hermi)
             vhf = _makevhf(vj, vk, nset) + numpy.array(vhf_last, copy=False)
         else:
@@ -548,14 +546,10 @@ class UHF(hf.SCF):
 
 class UHF_DIIS(diis.SCF_DIIS):
     def push_err_vec(self, s, d, f):
-        sdf_a = reduce(numpy.dot, (s, d[0], f[0]))
-        sdf_b = reduce(numpy.dot, (s, d[1], f[1]))
-        errvec = numpy.hstack((sdf_a.T.conj() - sdf_a, \
-                               sdf_b.T.conj() - sdf_b))
+        errvec = numpy.hstack((self.get_sdf_err(s, d[0], f[0]),
+                               self.get_sdf_err(s, d[1], f[1])))
         log.debug1(self, 'diis-norm(errvec) = %g', numpy.linalg.norm(errvec))
-        self.err_vec_stack.append(errvec)
-        if self.err_vec_stack.__len__() > self.space:
-            self.err_vec_stack.pop(0)
+        diis.DIIS.push_err_vec(self, errvec)
 
 def _makevhf(vj, vk, nset):
     if nset == 1: